@@ -0,0 +1,926 @@
+"""
+OA流程接口异步客户端
+"""
+
+import asyncio
+import copy
+import functools
+import json
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+from requests.exceptions import ConnectionError
+from requests.exceptions import Timeout
+from rest_framework.exceptions import APIException
+
+from drf_oa_workflow import choices
+from drf_oa_workflow.db.task_list import db_task_list_provider
+from drf_oa_workflow.models import HRMResource
+from drf_oa_workflow.settings import SETTING_PREFIX
+from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.tokens import token_manager
+from drf_oa_workflow.transport import MultipartStream
+from drf_oa_workflow.transport import RateLimiter
+from drf_oa_workflow.transport import circuit_breaker
+from drf_oa_workflow.transport import get_executor
+from drf_oa_workflow.transport import get_session
+from drf_oa_workflow.transport import get_timeout
+from drf_oa_workflow.utils import OaTokenExpired
+from drf_oa_workflow.utils import OaWorkFlow
+
+__all__ = [
+    "AsyncOaWorkFlow",
+    "HttpxAsyncBackend",
+    "ThreadAsyncBackend",
+    "get_async_backend",
+]
+
+
+class ThreadAsyncBackend:
+    """
+    在线程池中使用requests连接池发送请求, 不需要额外依赖
+    并发量受 CONCURRENT_MAX_WORKERS 限制
+    """
+
+    CONNECT_ERRORS = (ConnectionError,)
+    TIMEOUT_ERRORS = (Timeout,)
+
+    async def request(self, method, url, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_executor(), functools.partial(self._send, method, url, **kwargs)
+        )
+
+    @staticmethod
+    def _send(method, url, **kwargs):
+        # 在执行请求的线程中获取Session, 每个线程使用自己的Session
+        return getattr(get_session(), method)(url, **kwargs)
+
+
+class HttpxAsyncBackend:
+    """
+    使用httpx.AsyncClient发送请求, 需要安装httpx
+    每个事件循环使用一个连接池, 连接数上限为 ASYNC_MAX_CONNECTIONS,
+    同时也限制了同时请求OA的数量
+    """
+
+    def __init__(self):
+        import httpx
+
+        self.httpx = httpx
+        self.CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+        self.TIMEOUT_ERRORS = (httpx.TimeoutException,)
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            limits = self.httpx.Limits(
+                max_connections=api_settings.ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=api_settings.REQUESTS_POOL_MAXSIZE,
+                keepalive_expiry=api_settings.REQUESTS_POOL_KEEP_ALIVE,
+            )
+            client = self.httpx.AsyncClient(limits=limits)
+            self._clients[loop] = client
+        return client
+
+    async def request(self, method, url, **kwargs):
+        timeout = kwargs.get("timeout")
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            kwargs["timeout"] = self.httpx.Timeout(
+                read_timeout, connect=connect_timeout
+            )
+        data = kwargs.get("data")
+        if isinstance(data, MultipartStream):
+            # httpx的AsyncClient需要异步迭代的请求体
+            kwargs.pop("data")
+            kwargs["content"] = self._aiter(data)
+            if getattr(data, "len", None) is not None:
+                kwargs["headers"] = {
+                    **kwargs["headers"],
+                    "Content-Length": str(data.len),
+                }
+        return await self._get_client().request(method.upper(), url, **kwargs)
+
+    @staticmethod
+    async def _aiter(stream):
+        for chunk in stream:
+            yield chunk
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_async_backend():
+    """
+    获取异步请求后端, ASYNC_HTTP_BACKEND 未配置时:
+    安装了httpx使用HttpxAsyncBackend, 否则使用ThreadAsyncBackend
+    """
+    global _backend  # noqa: PLW0603
+    with _backend_lock:
+        if _backend is None:
+            if api_settings.ASYNC_HTTP_BACKEND:
+                _backend = import_string(api_settings.ASYNC_HTTP_BACKEND)()
+            else:
+                try:
+                    _backend = HttpxAsyncBackend()
+                except ImportError:
+                    _backend = ThreadAsyncBackend()
+        return _backend
+
+
+def reload_async_backend(*args, **kwargs):
+    global _backend  # noqa: PLW0603
+    if kwargs["setting"] == SETTING_PREFIX:
+        _backend = None
+
+
+setting_changed.connect(reload_async_backend)
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight的异步版本, 按事件循环合并相同的并发请求
+    每个调用方(包括发起请求的调用方)得到结果的深拷贝
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, fn, *args, **kwargs):
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is not None:
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+        try:
+            # shield: 发起方被取消时不影响其他等待该请求的调用方
+            return copy.deepcopy(await asyncio.shield(task))
+        finally:
+            if calls.get(key) is task:
+                del calls[key]
+
+
+_async_flight = AsyncSingleFlight()
+
+
+class AsyncOaWorkFlow(OaWorkFlow):
+    """
+    OaWorkFlow的异步版本, 方法与OaWorkFlow相同, 需使用await调用
+    Token、SPK加密、账号信息以及分页总数缓存与同步客户端共用,
+    访问django cache在线程中执行, 不阻塞事件循环
+
+    workflow = AsyncOaWorkFlow()
+    await workflow.register_user(oa_user_id)
+    data, page, total_count = await workflow.get_todo_list(12345, 1, 10)
+    """
+
+    @property
+    def _request_headers(self):
+        # Token在发送请求前由_request异步刷新
+        return self._user_headers()
+
+    def _load_cached_token(self):
+        # 不在事件循环中读取cache, Token在发送请求前由_request异步获取
+        return None
+
+    async def register_user(self, oa_user_id: str):
+        oa_user_id = str(oa_user_id)
+        if str(self.user["userid"]) == oa_user_id:
+            return
+
+        self.oa_user_id = oa_user_id
+        self.encrypt_userid = self._spk_encryptor.encrypt(oa_user_id)
+        self._user = await self.get_userinfo(oa_user_id)
+
+    async def register_user_with_job_code(self, job_code: str):
+        oa_user = await sync_to_async(
+            HRMResource.objects.filter(LOGINID=job_code).first
+        )()
+        if not oa_user:
+            raise APIException(f"Oa中未查询到工号为'{job_code}'的账号")
+
+        await self.register_user(oa_user.ID)
+
+    async def get_userinfo(self, oa_user_id: str) -> dict:
+        cache_key = self._userinfo_cache_key(oa_user_id)
+        user_info = await sync_to_async(cache.get)(cache_key)
+        if user_info is not None:
+            return user_info
+
+        if api_settings.USERINFO_SOURCE == "db":
+            user_info = await sync_to_async(self.userinfo_from_db)(oa_user_id)
+        if not user_info:
+            user_info = await self.userinfo()
+        await sync_to_async(cache.set)(
+            cache_key, user_info, timeout=api_settings.USERINFO_CACHE_TIMEOUT
+        )
+        return user_info
+
+    @classmethod
+    async def ainvalidate_page_count(cls, *oa_user_ids):
+        """
+        异步清除用户的分页数据总数缓存, 同invalidate_page_count
+        """
+        await sync_to_async(cls.invalidate_page_count)(*oa_user_ids)
+
+    async def userinfo(self) -> dict:
+        api_path = "/api/hrm/login/getAccountList"
+        user_info = await self._get_oa(api_path)
+        return user_info["data"]
+
+    async def get_token(self, expr=None):
+        stale_token = self.token
+        if stale_token is None:
+            stale_token = await sync_to_async(token_manager.cached_token)()
+        self.token = await token_manager.arefresh(
+            self._apply_token, expire=expr, stale_token=stale_token
+        )
+        return self.token
+
+    async def _apply_token(self, expr):
+        api_path = "/api/ec/dev/auth/applytoken"
+        res = await self._post_oa(api_path, headers=self._apply_token_headers(expr))
+        return res[self.TOKEN_KEY]
+
+    async def get_sso_token(self, staff_code, use_cache=True):  # noqa: FBT002
+        cache_key = self._sso_token_cache_key(staff_code) if use_cache else None
+        if cache_key:
+            token = await sync_to_async(cache.get)(cache_key)
+            if token:
+                return token
+
+        api_path = "/ssologin/getToken"
+        headers = {"Content-Type": self.REQUEST_CONTENTTYPE}
+        post_data = self._sso_token_data(staff_code)
+        token = await self._post_oa(
+            api_path, post_data=post_data, headers=headers, need_json=False
+        )
+        token = self._check_sso_token(token)
+        if cache_key:
+            await sync_to_async(cache.set)(
+                cache_key, token, timeout=api_settings.SSO_TOKEN_CACHE_TIMEOUT
+            )
+        return token
+
+    async def _request(
+        self,
+        api_path,
+        method: str,
+        headers: dict = None,  # noqa: RUF013 PEP 484
+        need_json=True,  # noqa: FBT002
+        **kwargs,
+    ):
+        url = f"{self.oa_host}{api_path}"
+        if not headers:
+            headers = self._request_headers
+            self.token = await token_manager.aget(self._apply_token)
+            headers[self.TOKEN_KEY] = self.token
+
+        backend = get_async_backend()
+        retries = 0
+        while True:
+            circuit_breaker.before_request()
+            try:
+                resp = await backend.request(
+                    method, url, headers=headers, timeout=get_timeout(), **kwargs
+                )
+            except backend.CONNECT_ERRORS as e:
+                circuit_breaker.record_failure()
+                raise APIException(f"系统无法连接到OA服务: {e}")
+            except backend.TIMEOUT_ERRORS as e:
+                circuit_breaker.record_failure()
+                raise APIException(f"OA服务响应超时: {e}")
+            except Exception as e:
+                raise APIException(str(e))
+            circuit_breaker.record_response(resp.status_code)
+
+            try:
+                return self._parse_response(resp, need_json=need_json)
+            except OaTokenExpired as e:
+                if retries >= self.maximum_recursion:
+                    raise APIException(str(e))
+                retries += 1
+                # 以本次请求使用的Token判断是否已被其他协程刷新
+                self.token = await token_manager.arefresh(
+                    self._apply_token, stale_token=headers.get(self.TOKEN_KEY)
+                )
+                headers[self.TOKEN_KEY] = self.token
+
+    async def _get_oa(  # noqa: PLR0913
+        self,
+        api: str,
+        params: dict = None,  # noqa: RUF013 PEP 484
+        headers: dict = None,  # noqa: RUF013 PEP 484
+        need_json=True,  # noqa: FBT002
+        coalesce=None,
+    ):
+        if coalesce is None:
+            coalesce = api_settings.REQUESTS_COALESCE_GET
+        if coalesce and not headers:
+            return await _async_flight.do(
+                self._coalesce_key(api, params, need_json),
+                self._get_oa,
+                api,
+                params=params,
+                need_json=need_json,
+                coalesce=False,
+            )
+
+        return await self._request(
+            api, "get", params=params, headers=headers, need_json=need_json
+        )
+
+    async def _post_oa(
+        self,
+        api: str,
+        post_data: dict = None,  # noqa: RUF013 PEP 484
+        headers: dict = None,  # noqa: RUF013 PEP 484
+        need_json=True,  # noqa: FBT002
+        **kwargs,
+    ):
+        return await self._request(
+            api,
+            "post",
+            data=post_data,
+            headers=headers,
+            need_json=need_json,
+            **kwargs,
+        )
+
+    async def _page_count(self, page_count_path, search_conditions: dict) -> int:
+        count = await self._cached_page_count(page_count_path, search_conditions)
+        if count is None:
+            count = await self._request_page_count(page_count_path, search_conditions)
+        return count
+
+    async def _cached_page_count(self, page_count_path, search_conditions: dict):
+        if not api_settings.PAGE_COUNT_CACHE_TIMEOUT:
+            return None
+        cache_key = await sync_to_async(self._page_count_cache_key)(
+            page_count_path, search_conditions
+        )
+        return await sync_to_async(cache.get)(cache_key)
+
+    async def _request_page_count(self, page_count_path, search_conditions: dict):
+        resp = await self._post_oa(
+            page_count_path, post_data=search_conditions, need_json=False
+        )
+        count = int(resp)
+        timeout = api_settings.PAGE_COUNT_CACHE_TIMEOUT
+        if timeout:
+            cache_key = await sync_to_async(self._page_count_cache_key)(
+                page_count_path, search_conditions
+            )
+            await sync_to_async(cache.set)(cache_key, count, timeout=timeout)
+        return count
+
+    async def _page_data(  # noqa: PLR0913
+        self,
+        page_count_path,
+        page_data_path,
+        workflow_id,
+        page=1,
+        page_size=10,
+        conditions: dict = None,  # noqa: RUF013 PEP 484
+        concurrent=None,
+    ):
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        post_data = {
+            "pageNo": str(page),
+            "pageSize": str(page_size),
+            **search_conditions,
+        }
+        if concurrent is None:
+            concurrent = api_settings.PAGE_DATA_CONCURRENT
+
+        todo_count = await self._cached_page_count(page_count_path, search_conditions)
+        if todo_count is None and concurrent:
+            todo_count, res = await asyncio.gather(
+                self._request_page_count(page_count_path, search_conditions),
+                self._post_oa(page_data_path, post_data=post_data),
+            )
+            if (page - 1) * page_size >= todo_count:
+                return [], page, todo_count
+            return res, page, todo_count
+
+        if todo_count is None:
+            todo_count = await self._request_page_count(
+                page_count_path, search_conditions
+            )
+        if (page - 1) * page_size >= todo_count:
+            return [], page, todo_count
+        res: list = await self._post_oa(page_data_path, post_data=post_data)
+        return res, page, todo_count
+
+    async def _iter_page_data(  # noqa: PLR0913
+        self,
+        page_count_path,
+        page_data_path,
+        workflow_id,
+        page_size=100,
+        conditions: dict = None,  # noqa: RUF013 PEP 484
+        prefetch=True,  # noqa: FBT002
+    ):
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        total_count = await self._page_count(page_count_path, search_conditions)
+        total_pages = (total_count + page_size - 1) // page_size
+
+        def fetch(page):
+            post_data = {
+                "pageNo": str(page),
+                "pageSize": str(page_size),
+                **search_conditions,
+            }
+            return self._post_oa(page_data_path, post_data=post_data)
+
+        task = None
+        try:
+            for page in range(1, total_pages + 1):
+                data = await task if task else await fetch(page)
+                task = None
+                if prefetch and page < total_pages and len(data) >= page_size:
+                    task = asyncio.ensure_future(fetch(page + 1))
+                for item in data:
+                    yield item
+                if len(data) < page_size:
+                    break
+        finally:
+            if task:
+                task.cancel()
+
+    async def get_list(  # noqa: PLR0913
+        self,
+        list_type,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        if self._use_db_task_list(list_type, conditions, source):
+            return await sync_to_async(db_task_list_provider.page)(
+                list_type,
+                self.oa_user_id,
+                workflow_id,
+                page=page,
+                page_size=page_size,
+                conditions=conditions,
+            )
+
+        count_api_path, data_api_path = self.PAGE_DATA_APIS[list_type]
+        return await self._page_data(
+            count_api_path,
+            data_api_path,
+            workflow_id,
+            page=page,
+            page_size=page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+        )
+
+    async def get_todo_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        return await self.get_list(
+            "todo",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+
+    async def get_doing_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        return await self.get_list(
+            "doing",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+
+    async def get_unread_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        return await self.get_list(
+            "unread",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+
+    async def get_rejected_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        return await self.get_list(
+            "rejected",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+
+    async def get_handled_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        return await self.get_list(
+            "handled",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+
+    async def get_dashboard(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page=1,
+        page_size=10,
+        conditions=None,
+        list_types=None,
+        timeout=None,
+        source=None,
+    ):
+        list_types = list_types or list(self.PAGE_DATA_APIS)
+        db_list_types = [
+            i for i in list_types if self._use_db_task_list(i, conditions, source)
+        ]
+        result = {}
+        if db_list_types:
+            result = await sync_to_async(self._db_dashboard)(
+                db_list_types, workflow_id, page, page_size, conditions
+            )
+        api_list_types = [i for i in list_types if i not in result]
+        if timeout is None:
+            timeout = api_settings.DASHBOARD_TIMEOUT
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        post_data = {
+            "pageNo": str(page),
+            "pageSize": str(page_size),
+            **search_conditions,
+        }
+
+        async def load(list_type):
+            count_api_path, data_api_path = self.PAGE_DATA_APIS[list_type]
+            bucket = {"data": [], "page": page, "total_count": 0, "error": None}
+            try:
+                total_count, data = await asyncio.wait_for(
+                    asyncio.gather(
+                        self._page_count(count_api_path, search_conditions),
+                        self._post_oa(data_api_path, post_data=post_data),
+                    ),
+                    timeout or None,
+                )
+                bucket["total_count"] = total_count
+                if (page - 1) * page_size < total_count:
+                    bucket["data"] = data
+            except asyncio.TimeoutError:
+                bucket["error"] = "OA服务响应超时"
+            except Exception as e:
+                bucket["error"] = str(e)
+            return list_type, bucket
+
+        result.update(await asyncio.gather(*(load(t) for t in api_list_types)))
+        return {list_type: result[list_type] for list_type in list_types}
+
+    async def _run_batch(  # noqa: PLR0913
+        self,
+        func,
+        batch_kwargs,
+        concurrency=None,
+        rate_limit=None,
+        start=0,
+        callback=None,
+    ):
+        concurrency = concurrency or api_settings.BATCH_CONCURRENCY
+        if rate_limit is None:
+            rate_limit = api_settings.BATCH_RATE_LIMIT
+        limiter = RateLimiter(rate_limit)
+        self.token = await token_manager.aget(self._apply_token)
+        results = {}
+
+        async def run(index, kwargs):
+            result = {
+                "request_id": kwargs.get("request_id"),
+                "success": True,
+                "result": None,
+                "error": None,
+            }
+            await asyncio.sleep(limiter.reserve())
+            try:
+                result["result"] = await func(**kwargs)
+            except Exception as e:
+                result["success"] = False
+                result["error"] = str(e)
+            results[index] = result
+            if callback:
+                callback(index, result)
+
+        pending = set()
+        for index, kwargs in enumerate(batch_kwargs, start):
+            if len(pending) >= concurrency:
+                _, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            pending.add(asyncio.ensure_future(run(index, kwargs)))
+        if pending:
+            await asyncio.wait(pending)
+        return [results[i] for i in sorted(results)]
+
+    async def get_create_list(self):
+        api_path = "/api/workflow/paService/getCreateWorkflowList"
+        post_data = {"conditions": json.dumps({"wfTypeIds": "1"})}
+        res: list = await self._post_oa(api_path, post_data=post_data)
+        return self._group_create_list(res)
+
+    async def upload_file(
+        self,
+        oa_category_id: str,
+        file_source,
+        file_name,
+        return_fileid_only=True,  # noqa: FBT002
+    ):
+        api_path = "/api/doc/upload/uploadFile2Doc"
+        body = {"category": oa_category_id, "name": file_name}
+        stream = MultipartStream(body, "file", file_source, file_name)
+        headers = self._request_headers.copy()
+        headers["Content-Type"] = stream.content_type
+        headers[self.TOKEN_KEY] = await token_manager.aget(self._apply_token)
+        resp = await self._post_oa(api_path, post_data=stream, headers=headers)
+        if return_fileid_only:
+            return resp["data"]["fileid"]
+        return resp["data"]
+
+    async def get_workflow_chart_url(self, staff_code: str, oa_workflow_id):
+        get_chat_path = (
+            "/workflow/workflowDesign/readOnly-index.html"
+            "?isFree=0&isAllowNodeFreeFlow=0&isReadOnlyModel=true"
+            "&isFlowModel=0&hasFreeNode=0&showE9Pic=1&isFromWfForm=true"
+            f"&workflowId={oa_workflow_id}"
+        )
+        oa_sso_token = await self.get_sso_token(staff_code)
+        return f"{api_settings.OA_HOST}{get_chat_path}&ssoToken={oa_sso_token}"
+
+    async def get_workflow_chart_xml(self, oa_workflow_id):
+        version = await sync_to_async(self.get_workflow_version)(oa_workflow_id)
+        cache_key = self._chart_xml_cache_key(oa_workflow_id, version)
+        if cache_key:
+            xml_content = await sync_to_async(cache.get)(cache_key)
+            if xml_content is not None:
+                return xml_content
+
+        get_xml_path = "/api/workflow/layout/getXml"
+        post_data = {"workflowId": oa_workflow_id, "backstageReadOnly": True}
+        res = await self._post_oa(get_xml_path, post_data=post_data)
+        xml_content = self._decode_chart_xml(res.get("xml", ""))
+        if cache_key:
+            await sync_to_async(cache.set)(
+                cache_key, xml_content, timeout=api_settings.CHART_XML_CACHE_TIMEOUT
+            )
+        return xml_content
+
+    async def submit(self, post_data: dict):
+        api_path = "/api/workflow/paService/doCreateRequest"
+        res: dict = await self._post_oa(api_path, post_data=post_data)
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res["data"]["requestid"]
+
+    async def submit_new(  # noqa: PLR0913
+        self,
+        workflow_id,
+        main_data: list,
+        detail_data: list = None,  # noqa: RUF013 PEP 484
+        title="",
+        remark="",
+        request_level="",
+        submit_type=choices.SubmitTypes.SUBMIT,
+        del_when_failed=choices.SubmitFailedDoes.DELETE,
+    ):
+        post_data = self._submit_new_data(
+            workflow_id,
+            main_data,
+            detail_data=detail_data,
+            title=title,
+            remark=remark,
+            request_level=request_level,
+            submit_type=submit_type,
+            del_when_failed=del_when_failed,
+        )
+        return await self.submit(post_data)
+
+    async def review(
+        self,
+        request_id: str,
+        remark="",
+        review_type=choices.ReviewTypes.SUBMIT,
+        extras: dict = None,  # noqa: RUF013
+    ):
+        api_path = "/api/workflow/paService/submitRequest"
+        post_data = {
+            "otherParams": json.dumps({"src": review_type.SUBMIT}),
+            "remark": remark,
+            "requestId": request_id,
+        }
+        if extras:
+            post_data.update(extras)
+        res = await self._post_oa(api_path, post_data=post_data)
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res
+
+    async def reject(
+        self,
+        request_id: str,
+        node_id: str = "",
+        handle_submit: int = None,  # noqa: RUF013 PEP 484
+        remark="",
+    ):
+        api_path = "/api/workflow/paService/rejectRequest"
+        post_data = self._reject_data(
+            request_id, node_id=node_id, handle_submit=handle_submit, remark=remark
+        )
+        res = await self._post_oa(api_path, post_data=post_data)
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res
+
+    async def get_chart_url(self, request_id: str, staff_code):
+        sso_token = await self.get_sso_token(staff_code)
+        return await self._request_chart_url(request_id, sso_token)
+
+    async def _request_chart_url(self, request_id, sso_token):
+        api_path = "/api/workflow/paService/getRequestFlowChart"
+        resp = await self._get_oa(
+            api_path, params={"requestid": request_id}, coalesce=False
+        )
+        return self._with_sso_token(resp, sso_token)
+
+    async def get_chart_urls(self, request_ids: list, staff_code, concurrency=None):
+        sso_token = await self.get_sso_token(staff_code)
+        return await self._run_batch(
+            self._request_chart_url,
+            [{"request_id": i, "sso_token": sso_token} for i in request_ids],
+            concurrency=concurrency,
+        )
+
+    async def get_status(self, request_id: str, coalesce=None):
+        api_path = "/api/workflow/paService/getRequestStatus"
+        params = {"requestId": request_id}
+        return await self._get_oa(api_path, params=params, coalesce=coalesce)
+
+    async def get_operator_info(self, request_id, coalesce=None):
+        api_path = "/api/workflow/paService/getRequestOperatorInfo"
+        params = {"requestId": request_id}
+        return await self._get_oa(api_path, params=params, coalesce=coalesce)
+
+    async def get_resources(self, request_id, coalesce=None):
+        api_path = "/api/workflow/paService/getRequestResources"
+        params = {"requestId": request_id}
+        result = await self._get_oa(api_path, params=params, coalesce=coalesce)
+        return self._handle_resources(result)
+
+    async def get_remark(self, request_id, page=1, page_size=10, coalesce=None):
+        api_path = "/api/workflow/paService/getRequestLog"
+        params = {
+            "requestId": request_id,
+            "otherParams": json.dumps({"pageSize": page_size, "pageNumber": page}),
+        }
+        return await self._get_oa(api_path, params=params, coalesce=coalesce)
+
+    async def get_info(self, request_id, coalesce=None):
+        api_path = "/api/workflow/paService/getWorkflowRequest"
+        params = {"requestId": request_id}
+        return await self._get_oa(api_path, params=params, coalesce=coalesce)
+
+    async def transmit(  # noqa: PLR0913
+        self,
+        request_id,
+        trans_type,
+        user_id: str,
+        remark: str = "",
+        remind_type: str = "",
+    ):
+        api_path = "/api/workflow/paService/forwardRequest"
+        post_data = self._transmit_data(
+            request_id, trans_type, user_id, remark=remark, remind_type=remind_type
+        )
+        res = await self._post_oa(api_path, post_data=post_data)
+        await self.ainvalidate_page_count(self.oa_user_id, *str(user_id).split(","))
+        return res
+
+    async def recover(self, request_id):
+        api_path = "/api/workflow/paService/doForceDrawBack"
+        res = await self._post_oa(api_path, post_data={"requestId": request_id})
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res
+
+    async def withdraw(self, request_id, remind="0", remark: str = ""):
+        api_path = "/api/workflow/paService/withdrawRequest"
+        post_data = {"isremind": remind, "remark": remark, "requestId": request_id}
+        res = await self._post_oa(api_path, post_data=post_data)
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res
+
+    async def delete(self, request_id):
+        api_path = "/api/workflow/paService/deleteRequest"
+        res = await self._post_oa(api_path, post_data={"requestId": request_id})
+        await self.ainvalidate_page_count(self.oa_user_id)
+        return res
+
+    async def get_operate_buttons(self, request_id):
+        version = await sync_to_async(self.get_request_version)(request_id)
+        return await self._cached_operate_buttons(request_id, version)
+
+    async def _cached_operate_buttons(self, request_id, version):
+        cache_key = self._buttons_cache_key(request_id, version)
+        if cache_key:
+            right_menu_data = await sync_to_async(cache.get)(cache_key)
+            if right_menu_data is not None:
+                return right_menu_data
+
+        load_form_api = "/api/workflow/reqform/loadForm"
+        load_form_data = await self._post_oa(
+            load_form_api, post_data=self._load_form_body(request_id)
+        )
+        right_menu_api = "/api/workflow/reqform/rightMenu"
+        right_menu_data = await self._post_oa(
+            right_menu_api, post_data=self._right_menu_body(request_id, load_form_data)
+        )
+        if right_menu_data.get("verifyFailMsg"):
+            raise APIException(right_menu_data["verifyFailMsg"])
+
+        if cache_key:
+            await sync_to_async(cache.set)(
+                cache_key, right_menu_data, timeout=api_settings.BUTTONS_CACHE_TIMEOUT
+            )
+        return right_menu_data
+
+    async def get_detail(self, request_id, remark_page=1, remark_page_size=10):
+        version = await sync_to_async(self.get_request_version)(request_id)
+        names = ["info", "status", "remark", "resources", "buttons"]
+        values = await asyncio.gather(
+            self.get_info(request_id),
+            self.get_status(request_id),
+            self.get_remark(request_id, remark_page, remark_page_size),
+            self.get_resources(request_id),
+            self._cached_operate_buttons(request_id, version),
+            return_exceptions=True,
+        )
+        result = {"errors": {}}
+        for name, value in zip(names, values):
+            if isinstance(value, Exception):
+                result[name] = None
+                result["errors"][name] = str(value)
+            else:
+                result[name] = value
+        return result
@@ -1,29 +1,209 @@
+import datetime
+
 from django.db.models import DateTimeField
+from django.db.models import Lookup
+from django.db.models import lookups
 from django.db.models.expressions import F
 from django.db.models.expressions import Func
-from django.db.models.expressions import Value
-from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# OA数据库中的日期、时间为东八区时间
+OA_DB_UTC_OFFSET = datetime.timedelta(hours=8)
+
+
+def to_oa_db_datetime(value) -> tuple:
+    """
+    转换为OA数据库中的(日期, 时间)字符串, 与ConvertOADbDatetime的结果对应
+    -- 带时区的时间先转换为UTC时间
+    -- 不带时区的时间视为UTC时间(与ConvertOADbDatetime减去8小时后的值一致)
+    -- 日期视为UTC时间0点
+    :param value: datetime、date或可解析的时间字符串
+    :return: ("YYYY-MM-DD", "HH:MM:SS")
+    """
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"无效的时间: {value}")
+        value = parsed
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value += OA_DB_UTC_OFFSET
+    return value.strftime("%Y-%m-%d"), value.strftime("%H:%M:%S")
+
+
+class OADbDatetimeLookup(Lookup):
+    """
+    ConvertOADbDatetime的比较条件直接比较原始日期、时间字符串字段, 可以使用索引
+    例: receiveTime__gte=value 转换为
+        RECEIVEDATE >= d AND (RECEIVEDATE > d OR RECEIVETIME >= t)
+    比较值为表达式(如Now()、F("createTime"))时无法转换, 使用django的条件比较转换后的时间
+    """
+
+    prepare_rhs = False
+    # (日期比较符, 日期相同时时间的比较符)
+    operators = None
+    # 比较值为表达式时使用的django条件
+    fallback_lookup = None
+
+    def as_sql(self, compiler, connection):
+        if self.rhs_is_expression():
+            fallback = self.fallback_lookup(self.lhs, self.rhs)
+            return fallback.as_sql(compiler, connection)
+        return self.oa_db_sql(compiler, connection)
+
+    def rhs_is_expression(self):
+        values = self.rhs if isinstance(self.rhs, (list, tuple)) else [self.rhs]
+        return any(hasattr(i, "resolve_expression") for i in values)
+
+    def oa_db_sql(self, compiler, connection):
+        date_sql, time_sql, params = self.compile_lhs(compiler, connection)
+        date, time = to_oa_db_datetime(self.rhs)
+        return self.compare(date_sql, time_sql, params, date, time, self.operators)
+
+    def compile_lhs(self, compiler, connection):
+        date_expression, time_expression = self.lhs.get_source_expressions()
+        date_sql, date_params = compiler.compile(date_expression)
+        time_sql, time_params = compiler.compile(time_expression)
+        return date_sql, time_sql, (date_params, time_params)
+
+    @staticmethod
+    def compare(date_sql, time_sql, params, date, time, operators):  # noqa: PLR0913
+        date_params, time_params = params
+        date_operator, time_operator = operators
+        sql = (
+            f"({date_sql} {date_operator}= %s AND "
+            f"({date_sql} {date_operator} %s OR {time_sql} {time_operator} %s))"
+        )
+        return sql, [
+            *date_params,
+            date,
+            *date_params,
+            date,
+            *time_params,
+            time,
+        ]
+
+
+class OADbDatetimeGreaterThan(OADbDatetimeLookup):
+    lookup_name = "gt"
+    operators = (">", ">")
+    fallback_lookup = lookups.GreaterThan
+
+
+class OADbDatetimeGreaterThanOrEqual(OADbDatetimeLookup):
+    lookup_name = "gte"
+    operators = (">", ">=")
+    fallback_lookup = lookups.GreaterThanOrEqual
+
+
+class OADbDatetimeLessThan(OADbDatetimeLookup):
+    lookup_name = "lt"
+    operators = ("<", "<")
+    fallback_lookup = lookups.LessThan
+
+
+class OADbDatetimeLessThanOrEqual(OADbDatetimeLookup):
+    lookup_name = "lte"
+    operators = ("<", "<=")
+    fallback_lookup = lookups.LessThanOrEqual
+
+
+class OADbDatetimeExact(OADbDatetimeLookup):
+    lookup_name = "exact"
+    fallback_lookup = lookups.Exact
+
+    def oa_db_sql(self, compiler, connection):
+        date_sql, time_sql, (date_params, time_params) = self.compile_lhs(
+            compiler, connection
+        )
+        date, time = to_oa_db_datetime(self.rhs)
+        return (
+            f"({date_sql} = %s AND {time_sql} = %s)",
+            [*date_params, date, *time_params, time],
+        )
+
+
+class OADbDatetimeRange(OADbDatetimeLookup):
+    lookup_name = "range"
+    fallback_lookup = lookups.Range
+
+    def oa_db_sql(self, compiler, connection):
+        date_sql, time_sql, params = self.compile_lhs(compiler, connection)
+        start, end = self.rhs
+        start_sql, start_params = self.compare(
+            date_sql, time_sql, params, *to_oa_db_datetime(start), (">", ">=")
+        )
+        end_sql, end_params = self.compare(
+            date_sql, time_sql, params, *to_oa_db_datetime(end), ("<", "<=")
+        )
+        return f"({start_sql} AND {end_sql})", [*start_params, *end_params]
+
+
+class OADbDatetimeIsNull(OADbDatetimeLookup):
+    lookup_name = "isnull"
+
+    def oa_db_sql(self, compiler, connection):
+        date_sql, time_sql, (date_params, time_params) = self.compile_lhs(
+            compiler, connection
+        )
+        if self.rhs:
+            sql = f"({date_sql} IS NULL OR {time_sql} IS NULL)"
+        else:
+            sql = f"({date_sql} IS NOT NULL AND {time_sql} IS NOT NULL)"
+        return sql, [*date_params, *time_params]
 
 
 class ConvertOADbDatetime(Func):
     """
     处理OA Oracle数据库 时间（字符串）和日期（字符串）字段，输出为DateTime类型
+    -- 日期或时间为空时结果为空
+    -- gt/gte/lt/lte/exact/range/isnull条件直接比较原始字段, 不对每行转换, 可以使用索引
+    -- 结果仅用于展示, 排序使用WorkflowQuerySet.order_by_datetime
     """
 
     function = "TO_DATE"
+    arg_joiner = " || ' ' || "
     template = (
-        "%(function)s(%(expressions)s, 'YYYY-MM-DD HH24:MI:SS') - INTERVAL '8' HOUR"
+        "CASE WHEN %(date)s IS NULL OR %(time)s IS NULL THEN NULL "
+        "ELSE %(function)s(%(expressions)s, 'YYYY-MM-DD HH24:MI:SS') "
+        "- INTERVAL '8' HOUR END"
     )
+    lookups = {
+        lookup.lookup_name: lookup
+        for lookup in (
+            OADbDatetimeGreaterThan,
+            OADbDatetimeGreaterThanOrEqual,
+            OADbDatetimeLessThan,
+            OADbDatetimeLessThanOrEqual,
+            OADbDatetimeExact,
+            OADbDatetimeRange,
+            OADbDatetimeIsNull,
+        )
+    }
 
     def __init__(
         self,
         date_field,
         time_field,
-        *expressions,
         output_field=DateTimeField(),
         **extra,
     ):
-        base_expressions = Concat(F(date_field), Value(" "), F(time_field))
         super().__init__(
-            base_expressions, *expressions, output_field=output_field, extra=extra
+            F(date_field), F(time_field), output_field=output_field, **extra
         )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        date_expression, time_expression = self.get_source_expressions()
+        date_sql, date_params = compiler.compile(date_expression)
+        time_sql, time_params = compiler.compile(time_expression)
+        sql, params = super().as_sql(
+            compiler, connection, date=date_sql, time=time_sql, **extra_context
+        )
+        # 模板中日期、时间字段依次出现在CASE条件及TO_DATE参数中
+        return sql, (*date_params, *time_params, *params)
+
+    def get_lookup(self, lookup):
+        return self.lookups.get(lookup) or super().get_lookup(lookup)
@@ -1,9 +1,9 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from django.db.models import Case
 from django.db.models import F
 from django.db.models import Q
-from django.db.models import Value
-from django.db.models import When
 
 from drf_oa_workflow.db.function import ConvertOADbDatetime
 from drf_oa_workflow.settings import api_settings
@@ -19,6 +19,9 @@ class BaseOADbManager(models.Manager):
 
 
 class CurrentOperatorManager(BaseOADbManager):
+    # Oracle IN条件最多1000项
+    IN_LIST_MAX_SIZE = 1000
+
     def wf_un_operators(self):
         """
         流程当前节点未操作人
@@ -49,6 +52,46 @@ class CurrentOperatorManager(BaseOADbManager):
             .distinct()
         )
 
+    def wf_un_operators_map(self, request_ids):
+        """
+        批量查询流程当前节点未操作人, 只有一次查询
+        流程ID超过IN_LIST_MAX_SIZE时拆分为多个IN条件(OR)
+        :param request_ids: OA流程ID列表
+        :return: {request_id: [(user_id, name), ...]}, 没有未操作人的流程为空列表
+        """
+        request_ids = list(dict.fromkeys(int(i) for i in request_ids))
+        result = {request_id: [] for request_id in request_ids}
+        if not request_ids:
+            return result
+
+        size = self.IN_LIST_MAX_SIZE
+        condition = Q()
+        for i in range(0, len(request_ids), size):
+            condition |= Q(REQUESTID__in=request_ids[i : i + size])
+        rows = (
+            self.wf_un_operators()
+            .filter(condition)
+            .values_list("request_id", "un_operator_id", "un_operator_name")
+            .order_by("request_id", "un_operator_id")
+        )
+        for request_id, user_id, name in rows:
+            result[request_id].append((user_id, name))
+        return result
+
+    def attach_un_operators(self, requests, to_attr="un_operators"):
+        """
+        为流程(WorkflowRequestBase)批量设置当前节点未操作人, 额外一次查询
+        在取数后调用, 如分页后的一页数据
+        例: WorkflowCurrentOperator.objects.attach_un_operators(queryset[:50])
+        :param requests: WorkflowRequestBase列表或查询集(会被取数)
+        :param to_attr: 设置的属性名, 值为[(user_id, name), ...]
+        """
+        requests = list(requests)
+        un_operators = self.wf_un_operators_map(i.pk for i in requests)
+        for request in requests:
+            setattr(request, to_attr, un_operators[request.pk])
+        return requests
+
 
 class WorkflowQuerySet(models.QuerySet):
     def build_fields(self):
@@ -64,61 +107,192 @@ class WorkflowQuerySet(models.QuerySet):
             # receiveTime=Concat(F("current_operators__RECEIVEDATE"), Value(" "), F("current_operators__RECEIVETIME")),  # noqa: E501
             # lastOperateTime=Concat(F("LASTOPERATEDATE"), Value(" "), F("LASTOPERATETIME")),  # noqa: E501
             createTime=ConvertOADbDatetime("CREATEDATE", "CREATETIME"),
-            receiveTime=Case(
-                When(
-                    Q(
-                        current_operators__RECEIVEDATE__isnull=False,
-                        current_operators__RECEIVETIME__isnull=False,
-                    ),
-                    then=ConvertOADbDatetime(
-                        "current_operators__RECEIVEDATE",
-                        "current_operators__RECEIVETIME",
-                    ),
-                ),
-                default=Value(None),
-            ),
-            lastOperateTime=Case(
-                When(
-                    Q(LASTOPERATEDATE__isnull=False, LASTOPERATETIME__isnull=False),
-                    then=ConvertOADbDatetime("LASTOPERATEDATE", "LASTOPERATETIME"),
-                ),
-                default=Value(None),
+            receiveTime=ConvertOADbDatetime(
+                "current_operators__RECEIVEDATE", "current_operators__RECEIVETIME"
             ),
+            lastOperateTime=ConvertOADbDatetime("LASTOPERATEDATE", "LASTOPERATETIME"),
         )
 
-    def todo(self, oa_user_id, workflow_ids):
+    # build_fields中转换后的时间字段对应的原始(日期, 时间)字段
+    DATETIME_FIELDS = {
+        "createTime": ("CREATEDATE", "CREATETIME"),
+        "receiveTime": (
+            "current_operators__RECEIVEDATE",
+            "current_operators__RECEIVETIME",
+        ),
+        "lastOperateTime": ("LASTOPERATEDATE", "LASTOPERATETIME"),
+    }
+
+    def order_by_datetime(self, *field_names):
         """
-        待办查询
-        0：未操作;
-        1：转发;
-        2：已操作;
-        4：归档;
-        5：超时;
-        6:自动审批（审批中）
-        8：抄送(不需提交);
-        9：抄送(需提交);
-        11:传阅;
-        """
-        queryset = self.filter(
+        同order_by, 转换后的时间字段(createTime等)使用原始日期、时间字段排序,
+        不需要对每行做时间转换
+        :param field_names: 排序字段, 如 "-receiveTime", "REQUESTID"
+        """
+        ordering = []
+        for field_name in field_names:
+            prefix = "-" if field_name.startswith("-") else ""
+            fields = self.DATETIME_FIELDS.get(field_name.lstrip("-"))
+            if fields:
+                ordering.extend(f"{prefix}{field}" for field in fields)
+            else:
+                ordering.append(field_name)
+        return self.order_by(*ordering)
+
+    # 列表类型对应的当前操作人条件, 与原有的todo/handled查询条件一致
+    # 待处理、待阅、被退回在OA中的判断条件未经核实, 只能请求OA接口
+    # ISREMARK:
+    #   0：未操作;
+    #   1：转发;
+    #   2：已操作;
+    #   4：归档;
+    #   5：超时;
+    #   6:自动审批（审批中）
+    #   8：抄送(不需提交);
+    #   9：抄送(需提交);
+    #   11:传阅;
+    TASK_LIST_FILTERS = {
+        # 待办
+        "todo": {"current_operators__ISREMARK__in": [0, 1, 5, 7, 8, 9]},
+        # 已办
+        "handled": {"current_operators__ISREMARK__in": [2, 4]},
+    }
+
+    def task_list(self, list_type, oa_user_id, workflow_ids):
+        """
+        用户作为当前操作人(最后一次)的流程, 不添加额外字段
+        :param list_type: 列表类型 todo/handled
+        :param oa_user_id: OA用户ID
+        :param workflow_ids: OA流程ID
+        """
+        return self.filter(
             current_operators__USERTYPE=0,
-            current_operators__ISREMARK__in=[0, 1, 5, 7, 8, 9],
             current_operators__ISLASTTIMES=1,
             current_operators__USERID=oa_user_id,
             WORKFLOWID__in=workflow_ids,
+            **self.TASK_LIST_FILTERS[list_type],
         )
-        return queryset.build_fields()
+
+    # 键集分页的排序字段(均为倒序), 待办按接收时间, 已办按操作时间
+    TODO_KEYSET_FIELDS = (
+        "current_operators__RECEIVEDATE",
+        "current_operators__RECEIVETIME",
+        "REQUESTID",
+    )
+    HANDLED_KEYSET_FIELDS = (
+        "current_operators__OPERATEDATE",
+        "current_operators__OPERATETIME",
+        "REQUESTID",
+    )
+
+    def seek(self, fields, after=None, reverse=False):  # noqa: FBT002
+        """
+        键集(seek)分页: 按fields倒序排列, 从after之后开始取数据
+        条件只比较原始字段, 可以使用索引, 任意页的查询耗时相同
+        -- 排序字段为空视为最小值, 排在最后
+        -- 查询结果附带keyset_0、keyset_1...字段, 为每行的排序字段值
+        :param fields: 排序字段, 最后一个字段需唯一且不为空(如REQUESTID)
+        :param after: 上一页最后一行的排序字段值, 为空时从第一行开始
+        :param reverse: 是否反向(向前翻页), 返回after之前的数据且按正序排列
+        """
+        # 过滤及排序使用注解字段, 复用已有的当前操作人关联
+        annotations = {f"keyset_{i}": F(field) for i, field in enumerate(fields)}
+        names = list(annotations)
+        queryset = self.annotate(**annotations)
+        if after is not None:
+            queryset = queryset.filter(self._seek_condition(names, after, reverse))
+        if reverse:
+            ordering = [F(name).asc(nulls_first=True) for name in names]
+        else:
+            ordering = [F(name).desc(nulls_last=True) for name in names]
+        return queryset.order_by(*ordering)
+
+    @classmethod
+    def _seek_condition(cls, names, values, reverse):
+        """
+        (a, b, c) < (x, y, z) 展开为
+        a <= x AND (a < x OR (b <= y AND (b < y OR c < z)))
+        首个字段的范围条件可以直接使用索引
+        """
+        lt, lte = ("gt", "gte") if reverse else ("lt", "lte")
+        *heads, last = zip(names, values)
+        condition = cls._seek_compare(*last, lt)
+        for name, value in reversed(heads):
+            condition = cls._seek_compare(name, value, lte) & (
+                cls._seek_compare(name, value, lt) | condition
+            )
+        return condition
+
+    @staticmethod
+    def _seek_compare(name, value, lookup):
+        """
+        单个字段的比较条件, 空值视为最小值
+        """
+        isnull = f"{name}__isnull"
+        if lookup in ("lt", "lte"):
+            if value is None:
+                # 没有比空值更小的值
+                return Q(**{isnull: True}) if lookup == "lte" else Q(pk__in=[])
+            return Q(**{f"{name}__{lookup}": value}) | Q(**{isnull: True})
+        if value is None:
+            return Q(**{isnull: False}) if lookup == "gt" else Q()
+        return Q(**{f"{name}__{lookup}": value})
+
+    def todo(self, oa_user_id, workflow_ids):
+        """
+        待办查询
+        """
+        return self.task_list("todo", oa_user_id, workflow_ids).build_fields()
 
     def handled(self, oa_user_id, workflow_ids):
-        queryset = self.filter(
-            current_operators__USERTYPE=0,
-            current_operators__ISREMARK__in=[2, 4],
-            current_operators__ISLASTTIMES=1,
-            current_operators__USERID=oa_user_id,
-            WORKFLOWID__in=workflow_ids,
-        )
-        return queryset.build_fields()
+        return self.task_list("handled", oa_user_id, workflow_ids).build_fields()
 
 
 class WorkflowManager(BaseOADbManager):
     def get_queryset(self):
         return WorkflowQuerySet(self.model, using=self._db, hints=self._hints)
+
+
+class SrmExportQuerySet(models.QuerySet):
+    """
+    批量导出流程元数据(流程、节点、出口)的SRM数据, 结构同模型的into_srm_dict
+    模型需定义:
+    -- SRM_VALUES: values()查询的字段(关联表字段通过JOIN查询)
+    -- SRM_ORDERING: 导出顺序
+    -- SRM_WORKFLOW_LOOKUP: 按流程ID过滤的查询字段
+    -- srm_dict_from_values(row): values()的一行转换为SRM数据
+    """
+
+    SRM_CHUNK_SIZE = 2000
+
+    def srm_dicts(self, workflow_ids=None, chunk_size=None):
+        """
+        逐行生成SRM数据, 无论流程数量多少都只有一次查询, 结果不缓存在内存中
+        :param workflow_ids: OA流程ID列表或子查询, 为空时导出全部
+        :param chunk_size: 每次从数据库读取的行数
+        """
+        model = self.model
+        queryset = self
+        if workflow_ids is not None:
+            queryset = queryset.filter(**{model.SRM_WORKFLOW_LOOKUP: workflow_ids})
+        rows = queryset.order_by(*model.SRM_ORDERING).values(*model.SRM_VALUES)
+        for row in rows.iterator(chunk_size=chunk_size or self.SRM_CHUNK_SIZE):
+            yield model.srm_dict_from_values(row)
+
+    def srm_ndjson(self, workflow_ids=None, chunk_size=None):
+        """
+        逐行生成NDJSON(每行一个SRM数据), 可直接用于StreamingHttpResponse
+        """
+        for data in self.srm_dicts(workflow_ids, chunk_size):
+            yield json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder) + "\n"
+
+
+class WorkflowMetadataManager(BaseOADbManager):
+    def get_queryset(self):
+        return SrmExportQuerySet(self.model, using=self._db, hints=self._hints)
+
+    def srm_dicts(self, workflow_ids=None, chunk_size=None):
+        return self.get_queryset().srm_dicts(workflow_ids, chunk_size)
+
+    def srm_ndjson(self, workflow_ids=None, chunk_size=None):
+        return self.get_queryset().srm_ndjson(workflow_ids, chunk_size)
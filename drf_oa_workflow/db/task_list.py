@@ -0,0 +1,228 @@
+"""
+直接查询OA数据库的待办/已办列表, 返回结构与paService列表接口一致
+(字段见 DbTaskListProvider.to_api_data)
+"""
+
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from rest_framework.exceptions import APIException
+
+from drf_oa_workflow.db.manager import WorkflowQuerySet
+from drf_oa_workflow.models import WorkflowFlowNode
+from drf_oa_workflow.models import WorkflowRequestBase
+
+__all__ = [
+    "DbTaskListProvider",
+    "db_task_list_provider",
+]
+
+
+class DbTaskListProvider:
+    # 待办按接收时间倒序, 已办按操作时间倒序
+    ORDERINGS = {
+        "handled": (
+            "-current_operators__OPERATEDATE",
+            "-current_operators__OPERATETIME",
+            "-REQUESTID",
+        ),
+    }
+    DEFAULT_ORDERING = (
+        "-current_operators__RECEIVEDATE",
+        "-current_operators__RECEIVETIME",
+        "-REQUESTID",
+    )
+
+    # 支持的查询条件: (查询字段, 是否以','分隔)
+    CONDITIONS = {
+        "workflowTypes": ("WORKFLOWID__WORKFLOWTYPE_id__in", True),
+        "requestlevel": ("REQUESTLEVEL", False),
+    }
+
+    FIELDS = (
+        "REQUESTID",
+        "REQUESTNAME",
+        "REQUESTMARK",
+        "REQUESTLEVEL",
+        "STATUS",
+        "CREATEDATE",
+        "CREATETIME",
+        "CREATER_id",
+        "CREATER__LASTNAME",
+        "CREATER__DEPARTMENTID_id",
+        "CREATER__DEPARTMENTID__DEPARTMENTNAME",
+        "CURRENTNODEID_id",
+        "CURRENTNODEID__NODENAME",
+        "current_node_type",
+        "LASTOPERATEDATE",
+        "LASTOPERATETIME",
+        "LASTOPERATOR_id",
+        "LASTOPERATOR__LASTNAME",
+        "WORKFLOWID_id",
+        "WORKFLOWID__WORKFLOWNAME",
+        "WORKFLOWID__FORMID",
+        "WORKFLOWID__WORKFLOWTYPE_id",
+        "WORKFLOWID__WORKFLOWTYPE__TYPENAME",
+        "current_operators__ID",
+        "current_operators__NODEID",
+        "current_operators__ISREMARK",
+        "current_operators__ISBEREJECT",
+        "current_operators__VIEWTYPE",
+        "current_operators__RECEIVEDATE",
+        "current_operators__RECEIVETIME",
+        "current_operators__OPERATEDATE",
+        "current_operators__OPERATETIME",
+        "current_operators__USERID_id",
+        "current_operators__USERID__LASTNAME",
+        "current_operators__USERID__DEPARTMENTID_id",
+        "current_operators__USERID__DEPARTMENTID__DEPARTMENTNAME",
+        "current_operators__USERTYPE",
+        "current_operators__AGENTTYPE",
+        "current_operators__AGENTORBYAGENTID",
+    )
+
+    @classmethod
+    def supports(cls, list_type, conditions=None):
+        """
+        是否支持从数据库查询该列表及查询条件, 不支持时应请求OA接口
+        """
+        return list_type in WorkflowQuerySet.TASK_LIST_FILTERS and all(
+            key in cls.CONDITIONS for key in (conditions or {})
+        )
+
+    def queryset(self, list_type, oa_user_id, workflow_id, conditions=None):
+        """
+        列表查询集, 未排序、未分页
+        :param list_type: 列表类型 todo/handled
+        :param oa_user_id: OA用户ID
+        :param workflow_id: OA流程ID, 多个以','分隔
+        :param conditions: 查询条件, 支持 workflowTypes、requestlevel
+        """
+        if list_type not in WorkflowQuerySet.TASK_LIST_FILTERS:
+            raise APIException(f"不支持的列表类型: {list_type}")
+
+        queryset = WorkflowRequestBase.objects.get_queryset().task_list(
+            list_type, oa_user_id, self._split(workflow_id)
+        )
+        filters = {}
+        for key, value in (conditions or {}).items():
+            if key not in self.CONDITIONS:
+                raise APIException(f"数据库任务列表不支持查询条件: {key}")
+            lookup, multiple = self.CONDITIONS[key]
+            filters[lookup] = self._split(value) if multiple else value
+        return queryset.filter(**filters)
+
+    def page(  # noqa: PLR0913
+        self,
+        list_type,
+        oa_user_id,
+        workflow_id,
+        page=1,
+        page_size=10,
+        conditions=None,
+    ):
+        """
+        分页查询, 分页及总数均在数据库中完成
+        :return: (data, page, total_count), 同OaWorkFlow.get_todo_list
+        """
+        queryset = self.queryset(list_type, oa_user_id, workflow_id, conditions)
+        total_count = queryset.count()
+        offset = (page - 1) * page_size
+        if offset >= total_count:
+            return [], page, total_count
+
+        ordering = self.ORDERINGS.get(list_type, self.DEFAULT_ORDERING)
+        current_node_type = WorkflowFlowNode.objects.filter(
+            NODEID=OuterRef("CURRENTNODEID")
+        ).values("NODETYPE")[:1]
+        rows = (
+            queryset.annotate(current_node_type=Subquery(current_node_type))
+            .order_by(*ordering)
+            .values(*self.FIELDS)[offset : offset + page_size]
+        )
+        return [self.to_api_data(row) for row in rows], page, total_count
+
+    @staticmethod
+    def _split(value):
+        if isinstance(value, (list, tuple, set)):
+            return list(value)
+        return [i for i in str(value).split(",") if i]
+
+    @staticmethod
+    def _str(value):
+        return "" if value is None else str(value)
+
+    @classmethod
+    def _datetime(cls, date, time):
+        if not date:
+            return ""
+        return f"{date} {time}" if time else date
+
+    @classmethod
+    def to_api_data(cls, row: dict) -> dict:
+        """
+        数据库行转换为paService列表接口数据, 值均为字符串, 键与接口一致
+        示例数据 api_example_data.TODO_LIST_DEMO
+        -- 分部(creatorSubcompany*、userSubcompany*)、isprocessed、preisremark、
+           takisremark、sysName 不在已定义的OA模型中, 固定为空字符串
+        """
+        s = cls._str
+        return {
+            "agentorbyagentid": s(row["current_operators__AGENTORBYAGENTID"]),
+            "agenttype": s(row["current_operators__AGENTTYPE"]),
+            "cid": s(row["current_operators__ID"]),
+            "createTime": cls._datetime(row["CREATEDATE"], row["CREATETIME"]),
+            "creatorDepartmentId": s(row["CREATER__DEPARTMENTID_id"]),
+            "creatorDepartmentName": s(row["CREATER__DEPARTMENTID__DEPARTMENTNAME"]),
+            "creatorId": s(row["CREATER_id"]),
+            "creatorName": s(row["CREATER__LASTNAME"]),
+            "creatorSubcompanyId": "",
+            "creatorSubcompanyName": "",
+            "currentNodeId": s(row["CURRENTNODEID_id"]),
+            "currentNodeName": s(row["CURRENTNODEID__NODENAME"]),
+            "currentnodetype": s(row["current_node_type"]),
+            "isbereject": s(row["current_operators__ISBEREJECT"]),
+            "isprocessed": "",
+            "isremark": s(row["current_operators__ISREMARK"]),
+            "lastOperateTime": cls._datetime(
+                row["LASTOPERATEDATE"], row["LASTOPERATETIME"]
+            ),
+            "lastOperatorId": s(row["LASTOPERATOR_id"]),
+            "lastOperatorName": s(row["LASTOPERATOR__LASTNAME"]),
+            "nodeid": s(row["current_operators__NODEID"]),
+            "operateTime": cls._datetime(
+                row["current_operators__OPERATEDATE"],
+                row["current_operators__OPERATETIME"],
+            ),
+            "preisremark": "",
+            "receiveTime": cls._datetime(
+                row["current_operators__RECEIVEDATE"],
+                row["current_operators__RECEIVETIME"],
+            ),
+            "requestId": s(row["REQUESTID"]),
+            "requestLevel": s(row["REQUESTLEVEL"]),
+            "requestName": s(row["REQUESTNAME"]),
+            "requestmark": s(row["REQUESTMARK"]),
+            "status": s(row["STATUS"]),
+            "sysName": "",
+            "takisremark": "",
+            "userDepartmentId": s(row["current_operators__USERID__DEPARTMENTID_id"]),
+            "userDepartmentName": s(
+                row["current_operators__USERID__DEPARTMENTID__DEPARTMENTNAME"]
+            ),
+            "userName": s(row["current_operators__USERID__LASTNAME"]),
+            "userSubcompanyId": "",
+            "userSubcompanyName": "",
+            "userid": s(row["current_operators__USERID_id"]),
+            "usertype": s(row["current_operators__USERTYPE"]),
+            "viewtype": s(row["current_operators__VIEWTYPE"]),
+            "workflowBaseInfo": {
+                "formId": s(row["WORKFLOWID__FORMID"]),
+                "workflowId": s(row["WORKFLOWID_id"]),
+                "workflowName": s(row["WORKFLOWID__WORKFLOWNAME"]),
+                "workflowTypeId": s(row["WORKFLOWID__WORKFLOWTYPE_id"]),
+                "workflowTypeName": s(row["WORKFLOWID__WORKFLOWTYPE__TYPENAME"]),
+            },
+        }
+
+
+db_task_list_provider = DbTaskListProvider()
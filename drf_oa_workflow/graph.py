@@ -0,0 +1,324 @@
+"""
+编译后的OA流程图(节点、出口、退回范围), 按流程版本缓存在进程内
+"""
+
+import threading
+from collections import OrderedDict
+from collections import deque
+
+from django.test.signals import setting_changed
+
+from drf_oa_workflow.choices import OAFlowNodeType
+from drf_oa_workflow.choices import OAWFRejectType
+from drf_oa_workflow.settings import SETTING_PREFIX
+from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.utils import get_workflow_metadata_model
+
+__all__ = [
+    "WorkflowGraph",
+    "WorkflowGraphCache",
+    "WorkflowGraphNode",
+    "get_workflow_graph",
+    "get_workflow_graph_version",
+    "workflow_graph_cache",
+]
+
+
+class WorkflowGraphNode:
+    """
+    流程图节点, 合并 WorkflowFlowNode 与 WorkflowNodeBase 的信息
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        node_id,
+        name,
+        order,
+        node_type,
+        is_start,
+        is_reject,
+        is_reopen,
+        is_end,
+        reject_type,
+        rejectable_nodes,
+    ):
+        self.node_id = node_id
+        self.name = name
+        self.order = order
+        self.node_type = node_type
+        self.is_start = is_start
+        self.is_reject = is_reject
+        self.is_reopen = is_reopen
+        self.is_end = is_end
+        self.reject_type = reject_type
+        self.rejectable_nodes = rejectable_nodes
+
+    def __repr__(self):
+        return f"<WorkflowGraphNode {self.node_id} {self.name}>"
+
+    @property
+    def is_archive(self):
+        return self.is_end or self.node_type == OAFlowNodeType.ARCHIVE
+
+    @staticmethod
+    def parse_rejectable_nodes(value) -> frozenset:
+        """
+        解析 REJECTABLENODES (以','分隔的节点ID)
+        """
+        if not value:
+            return frozenset()
+        return frozenset(int(i) for i in str(value).split(",") if i.strip().isdigit())
+
+
+class WorkflowGraph:
+    """
+    流程图, 创建后不再修改, 可在多个线程中共享
+    -- 出口分为提交出口(next)和退回出口(ISREJECT=1)
+    -- 可达关系(提交出口的传递闭包)及各节点可退回的节点在创建时计算
+    """
+
+    # 节点及其出口的查询字段, 一个节点有多个出口时返回多行, 没有出口时出口字段为空
+    NODE_FIELDS = (
+        "NODEID",
+        "NODEORDER",
+        "NODETYPE",
+        "ISSELECTREJECTNODE",
+        "REJECTABLENODES",
+        "NODEID__NODENAME",
+        "NODEID__ISSTART",
+        "NODEID__ISREJECT",
+        "NODEID__ISREOPEN",
+        "NODEID__ISEND",
+        "NODEID__to_relations__DESTNODEID",
+        "NODEID__to_relations__ISREJECT",
+        "NODEID__to_relations__LINKNAME",
+    )
+
+    def __init__(self, workflow_id, version, nodes, links):
+        """
+        :param workflow_id: OA流程ID
+        :param version: 流程版本, 同 get_workflow_graph_version
+        :param nodes: {节点ID: WorkflowGraphNode}
+        :param links: [(节点ID, 目标节点ID, 是否退回出口, 出口名称)]
+        """
+        self.workflow_id = workflow_id
+        self.version = version
+        self.nodes = nodes
+        self.links = tuple(links)
+
+        next_nodes = {node_id: [] for node_id in nodes}
+        reject_links = {node_id: [] for node_id in nodes}
+        for node_id, dest_node_id, is_reject, _ in self.links:
+            if dest_node_id not in nodes:
+                continue
+            adjacency = reject_links if is_reject else next_nodes
+            adjacency[node_id].append(dest_node_id)
+        self._next_nodes = {k: tuple(v) for k, v in next_nodes.items()}
+        self._reject_links = {k: frozenset(v) for k, v in reject_links.items()}
+
+        self._reachable = {
+            node_id: self._walk(node_id, self._next_nodes) for node_id in nodes
+        }
+        previous_nodes = {node_id: [] for node_id in nodes}
+        for node_id, dest_node_ids in self._next_nodes.items():
+            for dest_node_id in dest_node_ids:
+                previous_nodes[dest_node_id].append(node_id)
+        self._upstream = {
+            node_id: self._walk(node_id, previous_nodes) for node_id in nodes
+        }
+        self._reject_targets = {
+            node_id: self._compile_reject_targets(node)
+            for node_id, node in nodes.items()
+        }
+
+    def __repr__(self):
+        return f"<WorkflowGraph {self.workflow_id}:{self.version}>"
+
+    @classmethod
+    def load(cls, workflow_id, version=None):
+        """
+        一次查询流程的全部节点及出口并编译
+        :param workflow_id: OA流程ID
+        :param version: 流程版本, 为空时查询
+        """
+        if version is None:
+            version = get_workflow_graph_version(workflow_id)
+        flow_node_model = get_workflow_metadata_model("WorkflowFlowNode")
+        rows = flow_node_model.objects.filter(WORKFLOWID=workflow_id).values(
+            *cls.NODE_FIELDS
+        )
+
+        nodes, links = {}, []
+        for row in rows:
+            node_id = row["NODEID"]
+            if node_id not in nodes:
+                nodes[node_id] = WorkflowGraphNode(
+                    node_id=node_id,
+                    name=row["NODEID__NODENAME"],
+                    order=row["NODEORDER"],
+                    node_type=row["NODETYPE"],
+                    is_start=row["NODEID__ISSTART"] == "1",
+                    is_reject=row["NODEID__ISREJECT"] == "1",
+                    is_reopen=row["NODEID__ISREOPEN"] == "1",
+                    is_end=row["NODEID__ISEND"] == "1",
+                    reject_type=row["ISSELECTREJECTNODE"],
+                    rejectable_nodes=WorkflowGraphNode.parse_rejectable_nodes(
+                        row["REJECTABLENODES"]
+                    ),
+                )
+            if row["NODEID__to_relations__DESTNODEID"] is not None:
+                links.append(
+                    (
+                        node_id,
+                        row["NODEID__to_relations__DESTNODEID"],
+                        row["NODEID__to_relations__ISREJECT"] == "1",
+                        row["NODEID__to_relations__LINKNAME"],
+                    )
+                )
+        return cls(workflow_id, version, nodes, links)
+
+    @staticmethod
+    def _walk(node_id, adjacency) -> frozenset:
+        visited = set()
+        queue = deque(adjacency[node_id])
+        while queue:
+            current = queue.popleft()
+            if current in visited:
+                continue
+            visited.add(current)
+            queue.extend(adjacency[current])
+        visited.discard(node_id)
+        return frozenset(visited)
+
+    def _compile_reject_targets(self, node: WorkflowGraphNode) -> frozenset:
+        """
+        节点可退回的节点
+        -- 按出口退回: 节点的退回出口
+        -- 自由退回: 可以流转到该节点的全部上游节点
+        -- 在自定范围内退回: REJECTABLENODES 中属于本流程的节点
+        """
+        if not node.is_reject:
+            return frozenset()
+        if node.reject_type == OAWFRejectType.FREE:
+            return self._upstream[node.node_id]
+        if node.reject_type == OAWFRejectType.APPOINT:
+            return node.rejectable_nodes & self.nodes.keys()
+        return self._reject_links[node.node_id]
+
+    def node(self, node_id) -> WorkflowGraphNode:
+        return self.nodes[int(node_id)]
+
+    @property
+    def start_node(self):
+        return next((i for i in self.nodes.values() if i.is_start), None)
+
+    @property
+    def archive_nodes(self):
+        return [i for i in self.nodes.values() if i.is_archive]
+
+    def is_archive(self, node_id) -> bool:
+        return self.node(node_id).is_archive
+
+    def next_nodes(self, node_id) -> tuple:
+        """
+        节点提交出口的目标节点ID
+        """
+        return self._next_nodes[int(node_id)]
+
+    def reachable_nodes(self, node_id) -> frozenset:
+        """
+        从节点经提交出口可以到达的全部节点ID(不含自身)
+        """
+        return self._reachable[int(node_id)]
+
+    def is_reachable(self, node_id, target_node_id) -> bool:
+        return int(target_node_id) in self._reachable[int(node_id)]
+
+    def reject_targets(self, node_id) -> frozenset:
+        """
+        节点可退回的节点ID, 节点不可退回时为空
+        """
+        return self._reject_targets[int(node_id)]
+
+    def can_reject(self, node_id, target_node_id) -> bool:
+        return int(target_node_id) in self._reject_targets[int(node_id)]
+
+
+def get_workflow_graph_version(workflow_id):
+    """
+    流程版本(VERSION及ACTIVEVERSIONID), 流程重新发布后变化
+    :param workflow_id: OA流程ID
+    """
+    row = (
+        get_workflow_metadata_model("WorkflowBase")
+        .objects.filter(ID=workflow_id)
+        .values_list("VERSION", "ACTIVEVERSIONID")
+        .first()
+    )
+    return ":".join(str(i) for i in row) if row else None
+
+
+class WorkflowGraphCache:
+    """
+    进程内流程图缓存(LRU), 每个流程只保留最新版本
+    -- 获取时查询流程版本, 版本变化后重新加载
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._graphs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, workflow_id, version=None) -> WorkflowGraph:
+        """
+        :param workflow_id: OA流程ID
+        :param version: 已知的流程版本, 为空时查询
+        """
+        workflow_id = int(workflow_id)
+        if version is None:
+            version = get_workflow_graph_version(workflow_id)
+        with self._lock:
+            graph = self._graphs.get(workflow_id)
+            if graph is not None and graph.version == version:
+                self._graphs.move_to_end(workflow_id)
+                return graph
+
+        graph = WorkflowGraph.load(workflow_id, version)
+        with self._lock:
+            self._graphs[workflow_id] = graph
+            self._graphs.move_to_end(workflow_id)
+            while len(self._graphs) > self.maxsize:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def invalidate(self, workflow_id=None):
+        """
+        :param workflow_id: OA流程ID, 为空时清除全部
+        """
+        with self._lock:
+            if workflow_id is None:
+                self._graphs.clear()
+            else:
+                self._graphs.pop(int(workflow_id), None)
+
+
+workflow_graph_cache = WorkflowGraphCache(
+    maxsize=api_settings.WORKFLOW_GRAPH_CACHE_SIZE
+)
+
+
+def get_workflow_graph(workflow_id, version=None) -> WorkflowGraph:
+    """
+    获取流程图, 同 workflow_graph_cache.get
+    """
+    return workflow_graph_cache.get(workflow_id, version)
+
+
+def reload_workflow_graphs(*args, **kwargs):
+    setting = kwargs["setting"]
+    if setting == SETTING_PREFIX:
+        workflow_graph_cache.maxsize = api_settings.WORKFLOW_GRAPH_CACHE_SIZE
+        workflow_graph_cache.invalidate()
+
+
+setting_changed.connect(reload_workflow_graphs)
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_oa_workflow', '0007_workflowrequestoperatelog_oauserinfo_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalWorkflowBase',
+            fields=[
+                ('ID', models.IntegerField(primary_key=True, serialize=False)),
+                ('WORKFLOWNAME', models.CharField(blank=True, max_length=300, null=True, verbose_name='流程名称')),
+                ('FORMID', models.IntegerField(verbose_name='表单ID')),
+                ('ISVALID', models.IntegerField(verbose_name='生效信息')),
+                ('VERSION', models.IntegerField(null=True, verbose_name='版本')),
+                ('ISTEMPLATE', models.CharField(max_length=10, null=True, verbose_name='是否为流程模板')),
+                ('TEMPLATEID', models.IntegerField(null=True, verbose_name='模板ID')),
+                ('ACTIVEVERSIONID', models.IntegerField(null=True, verbose_name='当前流程所属活动版本id')),
+                ('DSPORDER', models.IntegerField(null=True, verbose_name='顺序')),
+                ('WFIDENTKEY', models.IntegerField(null=True, verbose_name='流程ID标识')),
+            ],
+            options={
+                'verbose_name': 'OA流程信息(副本)',
+                'verbose_name_plural': 'OA流程信息(副本)',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocalWorkflowNodeBase',
+            fields=[
+                ('ID', models.IntegerField(primary_key=True, serialize=False)),
+                ('NODENAME', models.CharField(blank=True, max_length=300, null=True, verbose_name='节点名称')),
+                ('ISSTART', models.CharField(max_length=10, verbose_name='是否创建节点')),
+                ('ISREJECT', models.CharField(max_length=10, verbose_name='当前节点是否可以退回')),
+                ('ISREOPEN', models.CharField(max_length=10, verbose_name='是否重新打开')),
+                ('ISEND', models.CharField(max_length=10, verbose_name='是否归档节点')),
+            ],
+            options={
+                'verbose_name': 'OA流程节点基础信息(副本)',
+                'verbose_name_plural': 'OA流程节点基础信息(副本)',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocalWorkflowType',
+            fields=[
+                ('ID', models.IntegerField(primary_key=True, serialize=False)),
+                ('TYPENAME', models.CharField(max_length=1000, verbose_name='目录')),
+                ('TYPEDESC', models.CharField(blank=True, max_length=1000, null=True, verbose_name='描述')),
+                ('ICONKEY', models.CharField(blank=True, max_length=1000, null=True, verbose_name='ICONKEY')),
+                ('DSPORDER', models.IntegerField(blank=True, null=True, verbose_name='顺序')),
+                ('UUID', models.CharField(max_length=50, verbose_name='UUID')),
+            ],
+            options={
+                'verbose_name': 'OA流程目录信息(副本)',
+                'verbose_name_plural': 'OA流程目录信息(副本)',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocalWorkflowNodeLink',
+            fields=[
+                ('ISREJECT', models.CharField(max_length=10, verbose_name='节点是否可退回')),
+                ('LINKNAME', models.CharField(max_length=1000, verbose_name='出口名称')),
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('DESTNODEID', models.ForeignKey(db_column='DESTNODEID', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='from_relations', to='drf_oa_workflow.localworkflownodebase', verbose_name='目标节点')),
+                ('NODEID', models.ForeignKey(db_column='NODEID', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='to_relations', to='drf_oa_workflow.localworkflownodebase', verbose_name='节点信息')),
+                ('WORKFLOWID', models.ForeignKey(db_column='WORKFLOWID', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='node_relations', to='drf_oa_workflow.localworkflowbase', verbose_name='所属流程')),
+            ],
+            options={
+                'verbose_name': 'OA流程节点出口(副本)',
+                'verbose_name_plural': 'OA流程节点出口(副本)',
+            },
+        ),
+        migrations.AddField(
+            model_name='localworkflowbase',
+            name='WORKFLOWTYPE',
+            field=models.ForeignKey(db_column='WORKFLOWTYPE', db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='drf_oa_workflow.localworkflowtype', verbose_name='流程目录ID'),
+        ),
+        migrations.CreateModel(
+            name='LocalWorkflowFlowNode',
+            fields=[
+                ('NODEORDER', models.IntegerField(verbose_name='顺序')),
+                ('ISSELECTREJECTNODE', models.SmallIntegerField(choices=[(0, '按出口退回'), (1, '自由退回'), (2, '在自定范围内退回')], null=True, verbose_name='退回方式')),
+                ('REJECTABLENODES', models.TextField(blank=True, null=True, verbose_name='指定可退回节点')),
+                ('ISSUBMITDIRECTNODE', models.CharField(blank=True, choices=[('0', '逐级审批'), ('1', '直达本节点'), ('2', '操作者选择')], max_length=10, null=True, verbose_name='退回后再提交到达节点处理方式')),
+                ('ISSUBMITDIRECTNODEDEFT', models.CharField(blank=True, choices=[('0', '逐级审批'), ('1', '直达本节点')], max_length=10, null=True, verbose_name='默认退回后再提交到达节点处理方式')),
+                ('NODETYPE', models.CharField(blank=True, choices=[('0', '创建'), ('1', '审批'), ('2', '提交'), ('3', '归档')], max_length=10, null=True, verbose_name='节点类型')),
+                ('NODEID', models.OneToOneField(db_column='NODEID', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='drf_oa_workflow.localworkflownodebase', verbose_name='节点信息')),
+                ('WORKFLOWID', models.ForeignKey(db_column='WORKFLOWID', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='nodes', to='drf_oa_workflow.localworkflowbase', verbose_name='所属流程')),
+            ],
+            options={
+                'verbose_name': 'OA流程下的节点(副本)',
+                'verbose_name_plural': 'OA流程下的节点(副本)',
+            },
+        ),
+    ]
@@ -1,6 +1,11 @@
 __all__ = [
     "HRMDepartment",
     "HRMResource",
+    "LocalWorkflowBase",
+    "LocalWorkflowFlowNode",
+    "LocalWorkflowNodeBase",
+    "LocalWorkflowNodeLink",
+    "LocalWorkflowType",
     "WorkflowBase",
     "WorkflowCurrentOperator",
     "WorkflowFlowNode",
@@ -25,5 +30,10 @@ from .oa_workflow import WorkflowRequestBase
 from .oa_workflow import WorkflowRequestLog
 from .oa_workflow import WorkflowRequestOperateLog
 from .oa_workflow import WorkflowType
+from .oa_workflow_local import LocalWorkflowBase
+from .oa_workflow_local import LocalWorkflowFlowNode
+from .oa_workflow_local import LocalWorkflowNodeBase
+from .oa_workflow_local import LocalWorkflowNodeLink
+from .oa_workflow_local import LocalWorkflowType
 from .user import AbstractOaUserInfo
 from .user import OaUserInfo
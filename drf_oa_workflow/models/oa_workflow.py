@@ -13,6 +13,7 @@ from drf_oa_workflow.choices import OAWFRejectType
 from drf_oa_workflow.choices import OAWorkflowLogTypes
 from drf_oa_workflow.db.manager import CurrentOperatorManager
 from drf_oa_workflow.db.manager import WorkflowManager
+from drf_oa_workflow.db.manager import WorkflowMetadataManager
 from drf_oa_workflow.db.models import OADbBaseModel
 
 __all__ = [
@@ -28,6 +29,22 @@ __all__ = [
 ]
 
 
+def _srm_values(instance):
+    """
+    按模型的SRM_VALUES读取实例的字段值, 结构同SrmExportQuerySet的values()行
+    关联表字段(如 NODEID__NODENAME)通过关联对象读取, 关联对象为空时值为None
+    """
+    row = {}
+    for name in instance.SRM_VALUES:
+        value = instance
+        for attr in name.split("__"):
+            if value is None:
+                break
+            value = getattr(value, attr)
+        row[name] = value
+    return row
+
+
 class WorkflowCurrentOperator(OADbBaseModel):
     """
     OA流程当前请求人
@@ -134,7 +151,7 @@ class WorkflowCurrentOperator(OADbBaseModel):
         self.save()
 
 
-class WorkflowType(OADbBaseModel):
+class AbstractWorkflowType(models.Model):
     ID = models.IntegerField(primary_key=True)
     TYPENAME = models.CharField(verbose_name="目录", max_length=1000)
     TYPEDESC = models.CharField(  # noqa: DJ001
@@ -146,15 +163,21 @@ class WorkflowType(OADbBaseModel):
     DSPORDER = models.IntegerField(verbose_name="顺序", null=True, blank=True)
     UUID = models.CharField(verbose_name="UUID", max_length=50)
 
+    class Meta:
+        abstract = True
+
+
+class WorkflowType(AbstractWorkflowType, OADbBaseModel):  # noqa: DJ008
     class Meta:
         managed = False
         db_table = 'ECOLOGY"."WORKFLOW_TYPE'
         verbose_name = verbose_name_plural = "OA流程目录信息"
 
 
-class WorkflowBase(OADbBaseModel):
+class AbstractWorkflowBase(models.Model):
     """
     流程基本信息
+    WORKFLOWTYPE(流程目录)外键由子类定义
     """
 
     ID = models.IntegerField(primary_key=True)
@@ -162,16 +185,6 @@ class WorkflowBase(OADbBaseModel):
         max_length=300, blank=True, null=True, verbose_name="流程名称"
     )
     FORMID = models.IntegerField(verbose_name="表单ID")
-    # WORKFLOWTYPE = models.IntegerField(verbose_name="所属路径ID")
-    WORKFLOWTYPE = models.ForeignKey(
-        WorkflowType,
-        db_column="WORKFLOWTYPE",
-        to_field="ID",
-        null=True,
-        on_delete=models.DO_NOTHING,
-        related_name="+",
-        verbose_name="流程目录ID",
-    )
     ISVALID = models.IntegerField(
         verbose_name="生效信息"
     )  # 0：无效 1：有效 2:测试 3:历史版本
@@ -186,6 +199,23 @@ class WorkflowBase(OADbBaseModel):
     DSPORDER = models.IntegerField(verbose_name="顺序", null=True)
     WFIDENTKEY = models.IntegerField(verbose_name="流程ID标识", null=True)
 
+    # 批量导出SRM数据, 见 SrmExportQuerySet
+    SRM_VALUES = (
+        "ID",
+        "WORKFLOWNAME",
+        "WORKFLOWTYPE_id",
+        "FORMID",
+        "ISVALID",
+        "TEMPLATEID",
+        "VERSION",
+        "ACTIVEVERSIONID",
+    )
+    SRM_ORDERING = ("ID",)
+    SRM_WORKFLOW_LOOKUP = "ID__in"
+
+    class Meta:
+        abstract = True
+
     def into_srm_dict(self):
         """
         CASE
@@ -197,24 +227,50 @@ class WorkflowBase(OADbBaseModel):
             ELSE VERSION
         END AS work_flow_version
         """
+        return self.srm_dict_from_values(_srm_values(self))
+
+    @staticmethod
+    def srm_dict_from_values(row):
+        """
+        SrmExportQuerySet的values()行转换为SRM数据, into_srm_dict也由此转换
+        """
         return {
-            "work_flow_id": self.ID,
-            "name": self.WORKFLOWNAME,
-            "work_flow_type_id": self.WORKFLOWTYPE_id,
-            "work_flow_form_id": self.FORMID,
-            "is_active_version": self.ISVALID,
-            "parent_id": self.TEMPLATEID if self.VERSION else None,
-            "work_flow_version": self.VERSION or 1,
-            "active_version_id": self.ACTIVEVERSIONID,
+            "work_flow_id": row["ID"],
+            "name": row["WORKFLOWNAME"],
+            "work_flow_type_id": row["WORKFLOWTYPE_id"],
+            "work_flow_form_id": row["FORMID"],
+            "is_active_version": row["ISVALID"],
+            "parent_id": row["TEMPLATEID"] if row["VERSION"] else None,
+            "work_flow_version": row["VERSION"] or 1,
+            "active_version_id": row["ACTIVEVERSIONID"],
         }
 
+
+class WorkflowBase(AbstractWorkflowBase, OADbBaseModel):  # noqa: DJ008
+    """
+    流程基本信息
+    """
+
+    # WORKFLOWTYPE = models.IntegerField(verbose_name="所属路径ID")
+    WORKFLOWTYPE = models.ForeignKey(
+        WorkflowType,
+        db_column="WORKFLOWTYPE",
+        to_field="ID",
+        null=True,
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        verbose_name="流程目录ID",
+    )
+
+    objects = WorkflowMetadataManager()
+
     class Meta:
         managed = False
         db_table = 'ECOLOGY"."WORKFLOW_BASE'
         verbose_name = verbose_name_plural = "OA流程信息"
 
 
-class WorkflowNodeBase(OADbBaseModel):
+class AbstractWorkflowNodeBase(models.Model):
     """
     流程节点基本信息
     """
@@ -234,36 +290,28 @@ class WorkflowNodeBase(OADbBaseModel):
     )  # 0：否，1：是
     ISEND = models.CharField(verbose_name="是否归档节点", max_length=10)  # 0：否，1：是
 
+    class Meta:
+        abstract = True
+
+
+class WorkflowNodeBase(AbstractWorkflowNodeBase, OADbBaseModel):  # noqa: DJ008
+    """
+    流程节点基本信息
+    """
+
     class Meta:
         managed = False
         db_table = 'ECOLOGY"."WORKFLOW_NODEBASE'
         verbose_name = verbose_name_plural = "OA流程节点基础信息"
 
 
-class WorkflowFlowNode(OADbBaseModel):
+class AbstractWorkflowFlowNode(models.Model):
     """
     流程流转节点
+    WORKFLOWID(所属流程)、NODEID(节点信息)外键由子类定义
     """
 
-    # ID = models.IntegerField(db_column="NODEID", primary_key=True)
-    WORKFLOWID = models.ForeignKey(
-        WorkflowBase,
-        db_column="WORKFLOWID",
-        to_field="ID",
-        on_delete=models.DO_NOTHING,
-        related_name="nodes",
-        verbose_name="所属流程",
-    )
     NODEORDER = models.IntegerField(verbose_name="顺序")
-    NODEID = models.OneToOneField(
-        WorkflowNodeBase,
-        on_delete=models.DO_NOTHING,
-        db_column="NODEID",
-        to_field="ID",
-        primary_key=True,
-        related_name="+",
-        verbose_name="节点信息",
-    )
     ISSELECTREJECTNODE = models.SmallIntegerField(
         null=True, choices=OAWFRejectType.choices, verbose_name="退回方式"
     )
@@ -292,25 +340,118 @@ class WorkflowFlowNode(OADbBaseModel):
         verbose_name="节点类型",
     )
 
+    # 批量导出SRM数据, 见 SrmExportQuerySet
+    SRM_VALUES = (
+        "WORKFLOWID_id",
+        "NODEORDER",
+        "NODEID_id",
+        "NODEID__NODENAME",
+        "NODEID__ISSTART",
+        "NODEID__ISREJECT",
+        "NODEID__ISREOPEN",
+        "NODEID__ISEND",
+    )
+    SRM_ORDERING = ("WORKFLOWID", "NODEORDER", "NODEID")
+    SRM_WORKFLOW_LOOKUP = "WORKFLOWID__in"
+
+    class Meta:
+        abstract = True
+
+    def into_srm_dict(self):
+        return self.srm_dict_from_values(_srm_values(self))
+
+    @staticmethod
+    def srm_dict_from_values(row):
+        """
+        SrmExportQuerySet的values()行转换为SRM数据, into_srm_dict也由此转换
+        """
+        return {
+            "work_flow_id": row["WORKFLOWID_id"],
+            "node_order": row["NODEORDER"],
+            "node_id": row["NODEID_id"],
+            "node_name": row["NODEID__NODENAME"],
+            "is_start": row["NODEID__ISSTART"],
+            "is_reject": row["NODEID__ISREJECT"],
+            "is_reopen": row["NODEID__ISREOPEN"],
+            "is_end": row["NODEID__ISEND"],
+        }
+
+
+class WorkflowFlowNode(AbstractWorkflowFlowNode, OADbBaseModel):  # noqa: DJ008
+    """
+    流程流转节点
+    """
+
+    # ID = models.IntegerField(db_column="NODEID", primary_key=True)
+    WORKFLOWID = models.ForeignKey(
+        WorkflowBase,
+        db_column="WORKFLOWID",
+        to_field="ID",
+        on_delete=models.DO_NOTHING,
+        related_name="nodes",
+        verbose_name="所属流程",
+    )
+    NODEID = models.OneToOneField(
+        WorkflowNodeBase,
+        on_delete=models.DO_NOTHING,
+        db_column="NODEID",
+        to_field="ID",
+        primary_key=True,
+        related_name="+",
+        verbose_name="节点信息",
+    )
+
+    objects = WorkflowMetadataManager()
+
     class Meta:
         managed = False
         db_table = 'ECOLOGY"."WORKFLOW_FLOWNODE'
         verbose_name = verbose_name_plural = "OA流程下的节点"
 
+
+class AbstractWorkflowNodeLink(models.Model):
+    """
+    流程节点出口信息
+    WORKFLOWID(所属流程)、NODEID(节点信息)、DESTNODEID(目标节点)外键由子类定义
+    """
+
+    ISREJECT = models.CharField(
+        verbose_name="节点是否可退回", max_length=10
+    )  # 0：否，1：是
+    LINKNAME = models.CharField(verbose_name="出口名称", max_length=1000)
+
+    # 批量导出SRM数据, 见 SrmExportQuerySet
+    SRM_VALUES = (
+        "NODEID_id",
+        "NODEID__NODENAME",
+        "DESTNODEID_id",
+        "DESTNODEID__NODENAME",
+        "LINKNAME",
+    )
+    SRM_ORDERING = ("WORKFLOWID", "pk")
+    SRM_WORKFLOW_LOOKUP = "WORKFLOWID__in"
+
+    class Meta:
+        abstract = True
+
     def into_srm_dict(self):
+        return self.srm_dict_from_values(_srm_values(self))
+
+    @staticmethod
+    def srm_dict_from_values(row):
+        """
+        SrmExportQuerySet的values()行转换为SRM数据, into_srm_dict也由此转换
+        """
         return {
-            "work_flow_id": self.WORKFLOWID_id,
-            "node_order": self.NODEORDER,
-            "node_id": self.NODEID_id,
-            "node_name": self.NODEID.NODENAME,
-            "is_start": self.NODEID.ISSTART,
-            "is_reject": self.NODEID.ISREJECT,
-            "is_reopen": self.NODEID.ISREOPEN,
-            "is_end": self.NODEID.ISEND,
+            "from_node_id": row["NODEID_id"],
+            "from_node_name": row["NODEID__NODENAME"],
+            "to_node_id": row["DESTNODEID_id"],
+            "to_node_name": row["DESTNODEID__NODENAME"],
+            "link_name": row["LINKNAME"],
         }
 
 
-class WorkflowNodeLink(OADbBaseModel):
+class WorkflowNodeLink(AbstractWorkflowNodeLink, OADbBaseModel):  # noqa: DJ008
     """
     流程节点出口信息
     """
@@ -339,25 +480,14 @@ class WorkflowNodeLink(OADbBaseModel):
         related_name="from_relations",
         verbose_name="目标节点",
     )
-    ISREJECT = models.CharField(
-        verbose_name="节点是否可退回", max_length=10
-    )  # 0：否，1：是
-    LINKNAME = models.CharField(verbose_name="出口名称", max_length=1000)
+
+    objects = WorkflowMetadataManager()
 
     class Meta:
         managed = False
         db_table = 'ECOLOGY"."WORKFLOW_NODELINK'
         verbose_name = verbose_name_plural = "OA流程节点出口"
 
-    def into_srm_dict(self):
-        return {
-            "from_node_id": self.NODEID_id,
-            "from_node_name": self.NODEID.NODENAME,
-            "to_node_id": self.DESTNODEID_id,
-            "to_node_name": self.DESTNODEID.NODENAME,
-            "link_name": self.LINKNAME,
-        }
-
 
 class WorkflowRequestLog(OADbBaseModel):
     """
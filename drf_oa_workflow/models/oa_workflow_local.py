@@ -0,0 +1,114 @@
+"""
+OA流程元数据(流程、目录、节点、出口)在项目数据库中的副本
+由定时任务 drf_oa_workflow:同步OA流程元数据 同步, 字段与OA数据库模型一致
+"""
+
+from django.db import models
+
+from drf_oa_workflow.db.manager import SrmExportQuerySet
+
+from .oa_workflow import AbstractWorkflowBase
+from .oa_workflow import AbstractWorkflowFlowNode
+from .oa_workflow import AbstractWorkflowNodeBase
+from .oa_workflow import AbstractWorkflowNodeLink
+from .oa_workflow import AbstractWorkflowType
+
+__all__ = [
+    "LocalWorkflowBase",
+    "LocalWorkflowFlowNode",
+    "LocalWorkflowNodeBase",
+    "LocalWorkflowNodeLink",
+    "LocalWorkflowType",
+]
+
+
+class LocalWorkflowType(AbstractWorkflowType):
+    class Meta:
+        verbose_name = verbose_name_plural = "OA流程目录信息(副本)"
+
+
+class LocalWorkflowBase(AbstractWorkflowBase):
+    WORKFLOWTYPE = models.ForeignKey(
+        LocalWorkflowType,
+        db_column="WORKFLOWTYPE",
+        to_field="ID",
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="流程目录ID",
+    )
+
+    objects = SrmExportQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = verbose_name_plural = "OA流程信息(副本)"
+
+
+class LocalWorkflowNodeBase(AbstractWorkflowNodeBase):
+    class Meta:
+        verbose_name = verbose_name_plural = "OA流程节点基础信息(副本)"
+
+
+class LocalWorkflowFlowNode(AbstractWorkflowFlowNode):
+    WORKFLOWID = models.ForeignKey(
+        LocalWorkflowBase,
+        db_column="WORKFLOWID",
+        to_field="ID",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="nodes",
+        verbose_name="所属流程",
+    )
+    NODEID = models.OneToOneField(
+        LocalWorkflowNodeBase,
+        on_delete=models.DO_NOTHING,
+        db_column="NODEID",
+        to_field="ID",
+        primary_key=True,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="节点信息",
+    )
+
+    objects = SrmExportQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = verbose_name_plural = "OA流程下的节点(副本)"
+
+
+class LocalWorkflowNodeLink(AbstractWorkflowNodeLink):
+    # 与OA数据库中的出口ID一致
+    id = models.IntegerField(primary_key=True)
+    WORKFLOWID = models.ForeignKey(
+        LocalWorkflowBase,
+        db_column="WORKFLOWID",
+        to_field="ID",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="node_relations",
+        verbose_name="所属流程",
+    )
+    NODEID = models.ForeignKey(
+        LocalWorkflowNodeBase,
+        db_column="NODEID",
+        to_field="ID",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="to_relations",
+        verbose_name="节点信息",
+    )
+    DESTNODEID = models.ForeignKey(
+        LocalWorkflowNodeBase,
+        db_column="DESTNODEID",
+        to_field="ID",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="from_relations",
+        verbose_name="目标节点",
+    )
+
+    objects = SrmExportQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = verbose_name_plural = "OA流程节点出口(副本)"
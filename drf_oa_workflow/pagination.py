@@ -0,0 +1,121 @@
+"""
+OA数据库待办/已办列表的键集(游标)分页
+"""
+
+import base64
+import binascii
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+
+from drf_oa_workflow.db.manager import WorkflowQuerySet
+
+__all__ = [
+    "OaKeysetPagination",
+]
+
+
+class OaKeysetPagination(BasePagination):
+    """
+    使用WorkflowQuerySet.seek分页, 游标为上一页边界行排序字段值的编码
+    -- 不使用OFFSET, 也不查询总数, 任意深度的分页耗时相同
+    -- 视图可以通过keyset_fields属性指定排序字段, 默认按待办接收时间排序
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    keyset_fields = WorkflowQuerySet.TODO_KEYSET_FIELDS
+    invalid_cursor_message = "无效的分页游标"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = getattr(view, "keyset_fields", None) or self.keyset_fields
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+
+        rows = list(
+            queryset.seek(self.fields, after=values, reverse=reverse)[: page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = bool(rows), has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.first_keys = self._keys(rows[0]) if rows else values
+        self.last_keys = self._keys(rows[-1]) if rows else values
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def _keys(self, row):
+        return [getattr(row, f"keyset_{i}") for i in range(len(self.fields))]
+
+    def decode_cursor(self, request):
+        """
+        :return: (排序字段值, 是否向前翻页)
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor["k"], bool(cursor["r"])
+        except (binascii.Error, TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message) from None
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        data = json.dumps({"k": values, "r": int(reverse)}, default=str)
+        encoded = base64.urlsafe_b64encode(data.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_keys is None:
+            return None
+        return self.encode_cursor(self.last_keys, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_keys is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_keys, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -17,12 +17,87 @@ DEFAULTS = {
     "APP_ID": "",
     "APP_RAW_SECRET": "",
     "APP_SPK": "",
+    # 使用APP_SPK加密后的文本(secret、userid)缓存数量
+    "SPK_ENCRYPT_CACHE_SIZE": 4096,
     "OA_HOST": "",
+    # OA接口Token有效期(秒)
+    "TOKEN_EXPIRE": 10800,
+    # Token过期前多少秒开始提前刷新
+    "TOKEN_REFRESH_AHEAD": 600,
+    # 刷新Token的锁超时时间(秒), 其他进程最多等待该时长
+    "TOKEN_LOCK_TIMEOUT": 15,
+    # OA账号信息来源, "api": OA接口; "db": 优先使用已同步的OA用户表
+    "USERINFO_SOURCE": "api",
+    # OA账号信息缓存时间(秒)
+    "USERINFO_CACHE_TIMEOUT": 600,
+    # 待办/已办分页列表来源, "api": OA接口; "db": 直接查询OA数据库
+    # (数据库不支持的列表类型及查询条件仍请求OA接口)
+    "TASK_LIST_SOURCE": "api",
+    # 同步OA用户: 是否增量同步(只写入变化的用户并将OA中已不存在的用户标记为离职)、
+    # 每次从OA数据库读取的行数、每次写入的行数
+    "SYNC_OA_USERS_INCREMENTAL": True,
+    "SYNC_OA_USERS_CHUNK_SIZE": 2000,
+    "SYNC_OA_USERS_BATCH_SIZE": 1000,
+    # 并行同步OA用户时拆分的子任务数量
+    "SYNC_OA_USERS_PARTITIONS": 8,
+    # 流程元数据(流程、目录、节点、出口)读取来源, "oa": OA数据库;
+    # "local": 项目数据库中的副本(需定时执行 drf_oa_workflow:同步OA流程元数据)
+    "WORKFLOW_METADATA_SOURCE": "oa",
+    # 进程内缓存的流程图(drf_oa_workflow.graph)数量, 按流程版本失效
+    "WORKFLOW_GRAPH_CACHE_SIZE": 128,
     # OA继承统一认证配置
     "OA_SSO_TOKEN_APP_ID": "",
     # requests包
     "REQUESTS_LIBRARY": "requests",
+    # 请求OA超时时间(秒), 设置后覆盖连接超时及读取超时
     "REQUESTS_TIMEOUT": None,
+    # 连接OA超时时间(秒)
+    "REQUESTS_CONNECT_TIMEOUT": 5,
+    # 等待OA响应超时时间(秒)
+    "REQUESTS_READ_TIMEOUT": 60,
+    # 进程内同时请求OA的最大数量, None表示不限制
+    "REQUESTS_MAX_CONCURRENT": 50,
+    # 同时请求数量达到上限时等待空闲名额的时间(秒)
+    "REQUESTS_QUEUE_TIMEOUT": 5,
+    # 合并进程内相同用户、接口、参数的并发GET请求
+    "REQUESTS_COALESCE_GET": True,
+    # OA服务熔断: 连续失败次数达到CIRCUIT_BREAKER_FAILURES后熔断,
+    # CIRCUIT_BREAKER_RESET_TIMEOUT秒后放行试探请求
+    "CIRCUIT_BREAKER_ENABLED": True,
+    "CIRCUIT_BREAKER_FAILURES": 5,
+    "CIRCUIT_BREAKER_RESET_TIMEOUT": 30,
+    # 进程内复用到OA的HTTP连接(keep-alive), REQUESTS_LIBRARY需提供Session
+    "REQUESTS_POOL_ENABLED": True,
+    # 连接池缓存的host数量
+    "REQUESTS_POOL_CONNECTIONS": 10,
+    # 每个host保持的最大连接数
+    "REQUESTS_POOL_MAXSIZE": 20,
+    # 连接数达到上限时是否阻塞等待空闲连接
+    "REQUESTS_POOL_BLOCK": False,
+    # 连接池空闲超过该秒数后丢弃旧连接, None表示不处理
+    "REQUESTS_POOL_KEEP_ALIVE": 60,
+    # 并发请求OA的线程池最大线程数
+    "CONCURRENT_MAX_WORKERS": 16,
+    # 分页查询时同时请求总数和分页数据(总数已缓存时只请求分页数据)
+    "PAGE_DATA_CONCURRENT": False,
+    # 分页查询总数缓存时间(秒), 0表示不缓存
+    "PAGE_COUNT_CACHE_TIMEOUT": 10,
+    # OA单点登录Token缓存时间(秒), 需小于OA中单点Token的有效期, 0表示不缓存
+    "SSO_TOKEN_CACHE_TIMEOUT": 60,
+    # 流程操作按钮缓存时间(秒), 需要配置OA数据库, 0表示不缓存
+    "BUTTONS_CACHE_TIMEOUT": 0,
+    # 流程图xml缓存时间(秒), 需要配置OA数据库, 0表示不缓存
+    "CHART_XML_CACHE_TIMEOUT": 0,
+    # get_dashboard等待各列表返回的最长时间(秒), None表示一直等待
+    "DASHBOARD_TIMEOUT": None,
+    # 批量审批/退回时同时处理的流程数
+    "BATCH_CONCURRENCY": 4,
+    # 批量审批/退回时每秒最多请求数, None表示不限流
+    "BATCH_RATE_LIMIT": None,
+    # AsyncOaWorkFlow使用的异步请求后端(类的导入路径), None表示安装了httpx时使用httpx
+    "ASYNC_HTTP_BACKEND": None,
+    # 异步请求后端(httpx)每个事件循环的最大连接数
+    "ASYNC_MAX_CONNECTIONS": 100,
     # DEBUG
     "DEBUG": False,
 }
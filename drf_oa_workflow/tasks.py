@@ -3,38 +3,357 @@ try:
 except ModuleNotFoundError:
     shared_task = lambda name: type(name)  # noqa: E731
 
+from django.db import transaction
+from django.db.models import Max
+from django.db.models import Min
+
+from drf_oa_workflow.choices import OaUserStatus
 from drf_oa_workflow.models import HRMResource
+from drf_oa_workflow.models import LocalWorkflowBase
+from drf_oa_workflow.models import LocalWorkflowFlowNode
+from drf_oa_workflow.models import LocalWorkflowNodeBase
+from drf_oa_workflow.models import LocalWorkflowNodeLink
+from drf_oa_workflow.models import LocalWorkflowType
 from drf_oa_workflow.models import OaUserInfo
+from drf_oa_workflow.models import WorkflowBase
+from drf_oa_workflow.models import WorkflowFlowNode
+from drf_oa_workflow.models import WorkflowNodeBase
+from drf_oa_workflow.models import WorkflowNodeLink
+from drf_oa_workflow.models import WorkflowType
+from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.tokens import token_manager
+from drf_oa_workflow.utils import OaApi
 from drf_oa_workflow.utils import get_sync_oa_user_model
 
+# 同步的OA用户字段, 与_oa_user_values的返回值顺序一致
+SYNC_OA_USER_FIELDS = ["staff_code_id", "dept_id", "name", "dept_name", "status"]
+# 已停用的OA账号状态
+INACTIVE_OA_USER_STATUS = [OaUserStatus.DISMISS, OaUserStatus.RESIGN]
+
+
+CUSTOM_OA_USER_MODEL_MESSAGE = (
+    "此方法仅在使用默认OA用户信息模型drf_oa_workflow.models.OaUserInfo有效，"
+    "\n系统已重新定义OA用户信息模型，为防止任务执行错误，请重新定义同步任务。"
+)
+
 
 @shared_task(name="drf_oa_workflow:同步OA用户")
-def sync_oa_users():
+def sync_oa_users(incremental=None, chunk_size=None, batch_size=None):
     """
     同步Oa用户
+    -- 逐批读取OA人员(iterator), 分批写入, 不一次性加载全部用户
+    -- 增量模式只写入新增及内容变化的用户, OA中已不存在的用户标记为离职
+    :param incremental: 是否增量同步, 默认为 SYNC_OA_USERS_INCREMENTAL
+    :param chunk_size: 每次从OA数据库读取的行数, 默认为 SYNC_OA_USERS_CHUNK_SIZE
+    :param batch_size: 每次写入的行数, 默认为 SYNC_OA_USERS_BATCH_SIZE
+    :return: {"inserted": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+    """
+    if get_sync_oa_user_model() != OaUserInfo:
+        return CUSTOM_OA_USER_MODEL_MESSAGE
+    return _sync_oa_users(
+        incremental=incremental, chunk_size=chunk_size, batch_size=batch_size
+    )
+
+
+@shared_task(name="drf_oa_workflow:并行同步OA用户")
+def sync_oa_users_parallel(
+    partitions=None, incremental=None, chunk_size=None, batch_size=None
+):
+    """
+    并行同步Oa用户
+    按OA用户ID范围拆分为多个子任务(sync_oa_users_partition),
+    由不同worker各自读取OA数据库并写入,
+    全部完成后由chord回调(merge_sync_oa_users_stats)合并统计结果
+    :param partitions: 子任务数量, 默认为 SYNC_OA_USERS_PARTITIONS
+    :param incremental: 同sync_oa_users
+    :param chunk_size: 同sync_oa_users
+    :param batch_size: 同sync_oa_users
+    :return: chord结果ID, 没有需要同步的用户时返回空统计结果
     """
+    from celery import chord
+    from celery import group
+
     if get_sync_oa_user_model() != OaUserInfo:
-        return (
-            "此方法仅在使用默认OA用户信息模型drf_oa_workflow.models.OaUserInfo有效，"
-            "\n系统已重新定义OA用户信息模型，为防止任务执行错误，请重新定义同步任务。"
+        return CUSTOM_OA_USER_MODEL_MESSAGE
+
+    id_ranges = _oa_user_id_ranges(partitions or api_settings.SYNC_OA_USERS_PARTITIONS)
+    if not id_ranges:
+        return _empty_stats()
+    result = chord(
+        group(
+            sync_oa_users_partition.s(
+                start, end, incremental, chunk_size=chunk_size, batch_size=batch_size
+            )
+            for start, end in id_ranges
         )
+    )(merge_sync_oa_users_stats.s())
+    return result.id
+
+
+@shared_task(name="drf_oa_workflow:同步OA用户(分区)")
+def sync_oa_users_partition(
+    start, end, incremental=None, chunk_size=None, batch_size=None
+):
+    """
+    同步ID在[start, end)范围内的Oa用户, 由sync_oa_users_parallel调用
+    """
+    return _sync_oa_users(
+        start,
+        end,
+        incremental=incremental,
+        chunk_size=chunk_size,
+        batch_size=batch_size,
+    )
+
 
-    all_oa_users = HRMResource.objects.select_related("DEPARTMENTID").all()
-    objs = [
-        OaUserInfo(
-            user_id=i.ID,
-            name=i.LASTNAME,
-            staff_code_id=i.LOGINID,
-            dept_id=i.DEPARTMENTID_id,
-            dept_name=i.DEPARTMENTID.DEPARTMENTNAME if i.DEPARTMENTID else "",
-            status=i.STATUS,
+@shared_task(name="drf_oa_workflow:合并同步OA用户结果")
+def merge_sync_oa_users_stats(results):
+    """
+    合并各分区的同步统计结果
+    """
+    stats = _empty_stats()
+    for result in results:
+        for key in stats:
+            stats[key] += result.get(key, 0)
+    return stats
+
+
+def _empty_stats():
+    return {"inserted": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+
+
+def _oa_user_id_ranges(partitions):
+    """
+    将OA用户ID(含本地已同步的用户)拆分为partitions个等宽的[start, end)范围
+    """
+    oa_ids = HRMResource.objects.aggregate(low=Min("ID"), high=Max("ID"))
+    local_ids = OaUserInfo.objects.aggregate(low=Min("user_id"), high=Max("user_id"))
+    lows = [i for i in (oa_ids["low"], local_ids["low"]) if i is not None]
+    highs = [i for i in (oa_ids["high"], local_ids["high"]) if i is not None]
+    if not lows:
+        return []
+    low, high = min(lows), max(highs) + 1
+    step = max(-(-(high - low) // partitions), 1)
+    return [(i, min(i + step, high)) for i in range(low, high, step)]
+
+
+def _sync_oa_users(
+    start=None, end=None, incremental=None, chunk_size=None, batch_size=None
+):
+    """
+    同步Oa用户, start、end不为空时只同步ID在[start, end)范围内的用户
+    """
+    if incremental is None:
+        incremental = api_settings.SYNC_OA_USERS_INCREMENTAL
+    chunk_size = chunk_size or api_settings.SYNC_OA_USERS_CHUNK_SIZE
+    batch_size = batch_size or api_settings.SYNC_OA_USERS_BATCH_SIZE
+    stats = _empty_stats()
+
+    local_users = OaUserInfo.objects.all()
+    if start is not None:
+        local_users = local_users.filter(user_id__gte=start, user_id__lt=end)
+    # 本地用户内容摘要 {user_id: digest}, 只保留摘要不保留模型对象
+    local_digests = {
+        user_id: _digest(values)
+        for user_id, *values in local_users.values_list(
+            "user_id", *SYNC_OA_USER_FIELDS
+        ).iterator(chunk_size=chunk_size)
+    }
+
+    batch, changed_ids = [], []
+    for user_id, values in _oa_user_values(chunk_size, start, end):
+        digest = local_digests.pop(user_id, None)
+        if digest is None:
+            stats["inserted"] += 1
+        elif incremental and digest == _digest(values):
+            stats["unchanged"] += 1
+            continue
+        else:
+            stats["updated"] += 1
+            changed_ids.append(user_id)
+        batch.append(
+            OaUserInfo(user_id=user_id, **dict(zip(SYNC_OA_USER_FIELDS, values)))
         )
-        for i in all_oa_users
-    ]
+        if len(batch) >= batch_size:
+            _upsert_oa_users(batch)
+            batch = []
+    if batch:
+        _upsert_oa_users(batch)
+
+    if incremental and local_digests:
+        # OA中已不存在的用户
+        missing_ids = list(local_digests)
+        for i in range(0, len(missing_ids), batch_size):
+            ids = missing_ids[i : i + batch_size]
+            stats["deactivated"] += (
+                OaUserInfo.objects.filter(user_id__in=ids)
+                .exclude(status__in=INACTIVE_OA_USER_STATUS)
+                .update(status=OaUserStatus.RESIGN)
+            )
+        changed_ids.extend(missing_ids)
+
+    if changed_ids:
+        OaApi.invalidate_userinfo(*changed_ids)
+    return stats
+
+
+def _oa_user_values(chunk_size, start=None, end=None):
+    """
+    逐批读取OA人员, start、end不为空时只读取ID在[start, end)范围内的人员
+    :return: (user_id, (工号, 部门ID, 名称, 部门名称, 状态))
+    """
+    queryset = HRMResource.objects.all()
+    if start is not None:
+        queryset = queryset.filter(ID__gte=start, ID__lt=end)
+    queryset = queryset.values_list(
+        "ID",
+        "LOGINID",
+        "DEPARTMENTID_id",
+        "LASTNAME",
+        "DEPARTMENTID__DEPARTMENTNAME",
+        "STATUS",
+    ).order_by()
+    for user_id, staff_code, dept_id, name, dept_name, status in queryset.iterator(
+        chunk_size=chunk_size
+    ):
+        yield user_id, (staff_code, dept_id, name, dept_name or "", status)
+
+
+def _digest(values):
+    return hash(tuple(values))
+
+
+def _upsert_oa_users(objs):
     OaUserInfo.objects.bulk_create(
         objs,
         update_conflicts=True,
-        update_fields=["staff_code_id", "dept_id", "name", "dept_name", "status"],
+        update_fields=SYNC_OA_USER_FIELDS,
         unique_fields=["user_id"],
     )
-    return None
+
+
+@shared_task(name="drf_oa_workflow:刷新OA接口Token")
+def refresh_oa_token():
+    """
+    Token即将过期时提前刷新OA接口Token
+    建议定时执行的间隔小于 TOKEN_REFRESH_AHEAD, 使Web进程始终拿到有效Token
+    """
+    token_manager.get(OaApi()._apply_token)
+
+
+# 同步OA流程元数据时每批处理的流程数量(OA数据库IN条件最多1000项)
+SYNC_WORKFLOW_METADATA_BATCH_SIZE = 500
+
+
+@shared_task(name="drf_oa_workflow:同步OA流程元数据")
+def sync_oa_workflow_metadata(full=False):  # noqa: FBT002
+    """
+    同步OA流程元数据(流程目录、流程、节点、出口)到项目数据库中的副本(Local*模型)
+    -- 流程目录数据量小, 每次全部写入
+    -- 流程信息只写入有变化的流程
+    -- 新增或VERSION/ACTIVEVERSIONID变化(重新发布)的流程重新同步节点及出口
+    -- OA中已不存在的流程连同节点、出口一起删除
+    -- 不再属于任何流程的节点基础信息在同一事务中删除
+    :param full: 是否重新同步全部流程的节点及出口
+    :return: {"types": 0, "workflows": 0, "structures": 0, "deleted": 0}
+    """
+    stats = {"types": 0, "workflows": 0, "structures": 0, "deleted": 0}
+
+    types = list(WorkflowType.objects.values(*_concrete_attnames(WorkflowType)))
+    _upsert_rows(LocalWorkflowType, types)
+    stats["types"] = len(types)
+
+    fields = _concrete_attnames(WorkflowBase)
+    local_workflows = {
+        row["ID"]: row for row in LocalWorkflowBase.objects.values(*fields).iterator()
+    }
+    changed, restructured = [], []
+    for row in WorkflowBase.objects.values(*fields).iterator():
+        local = local_workflows.pop(row["ID"], None)
+        if local != row:
+            changed.append(row)
+        if (
+            full
+            or local is None
+            or (local["VERSION"], local["ACTIVEVERSIONID"])
+            != (row["VERSION"], row["ACTIVEVERSIONID"])
+        ):
+            restructured.append(row["ID"])
+    _upsert_rows(LocalWorkflowBase, changed)
+    stats["workflows"] = len(changed)
+
+    batch_size = SYNC_WORKFLOW_METADATA_BATCH_SIZE
+    for i in range(0, len(restructured), batch_size):
+        _sync_workflow_structures(restructured[i : i + batch_size])
+    stats["structures"] = len(restructured)
+
+    # OA中已不存在的流程
+    deleted = list(local_workflows)
+    for i in range(0, len(deleted), batch_size):
+        ids = deleted[i : i + batch_size]
+        with transaction.atomic():
+            _delete_local_workflow_structures(ids)
+            LocalWorkflowBase.objects.filter(ID__in=ids).delete()
+            _delete_orphan_node_bases()
+    stats["deleted"] = len(deleted)
+    return stats
+
+
+def _sync_workflow_structures(workflow_ids):
+    """
+    重新同步流程的节点及出口
+    """
+    node_bases = WorkflowNodeBase.objects.filter(
+        ID__in=WorkflowFlowNode.objects.filter(WORKFLOWID__in=workflow_ids).values(
+            "NODEID"
+        )
+    ).values(*_concrete_attnames(WorkflowNodeBase))
+    flow_nodes = WorkflowFlowNode.objects.filter(WORKFLOWID__in=workflow_ids).values(
+        *_concrete_attnames(WorkflowFlowNode)
+    )
+    links = WorkflowNodeLink.objects.filter(WORKFLOWID__in=workflow_ids).values(
+        *_concrete_attnames(WorkflowNodeLink)
+    )
+    node_bases, flow_nodes, links = list(node_bases), list(flow_nodes), list(links)
+
+    with transaction.atomic():
+        _delete_local_workflow_structures(workflow_ids)
+        _upsert_rows(LocalWorkflowNodeBase, node_bases)
+        LocalWorkflowFlowNode.objects.bulk_create(
+            [LocalWorkflowFlowNode(**row) for row in flow_nodes]
+        )
+        LocalWorkflowNodeLink.objects.bulk_create(
+            [LocalWorkflowNodeLink(**row) for row in links]
+        )
+        _delete_orphan_node_bases()
+
+
+def _delete_local_workflow_structures(workflow_ids):
+    LocalWorkflowNodeLink.objects.filter(WORKFLOWID__in=workflow_ids).delete()
+    LocalWorkflowFlowNode.objects.filter(WORKFLOWID__in=workflow_ids).delete()
+
+
+def _delete_orphan_node_bases():
+    """
+    删除不再属于任何流程的节点基础信息(节点从流程中移除或流程已删除)
+    """
+    LocalWorkflowNodeBase.objects.exclude(
+        ID__in=LocalWorkflowFlowNode.objects.values("NODEID")
+    ).delete()
+
+
+def _concrete_attnames(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _upsert_rows(model, rows):
+    if not rows:
+        return
+    model.objects.bulk_create(
+        [model(**row) for row in rows],
+        update_conflicts=True,
+        update_fields=[
+            f.name for f in model._meta.concrete_fields if not f.primary_key
+        ],
+        unique_fields=[model._meta.pk.name],
+    )
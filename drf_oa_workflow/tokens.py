@@ -0,0 +1,141 @@
+"""
+OA接口Token管理
+"""
+
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from drf_oa_workflow.settings import api_settings
+
+__all__ = ["OaTokenManager", "token_manager"]
+
+
+class OaTokenManager:
+    """
+    OA接口Token管理
+
+    -- Token与过期时间一起保存在django cache中, 各进程共用
+    -- 进程内保留一份副本, Token有效期内不必每次访问cache
+    -- Token即将过期(TOKEN_REFRESH_AHEAD)时提前刷新, 刷新期间其他调用方继续使用旧Token
+    -- 使用cache锁保证同一时间只有一个进程请求OA刷新Token, 其余进程等待并复用新Token
+    """
+
+    CACHE_KEY = "oa-api-token-info"
+    LOCK_KEY = "oa-api-token-lock"
+    POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._token = None
+        self._expires_at = 0.0
+
+    def _remember(self, info):
+        if isinstance(info, dict) and info.get("token"):
+            self._token = info["token"]
+            self._expires_at = info["expires_at"]
+        return self._token, self._expires_at
+
+    def _load(self):
+        return self._remember(cache.get(self.CACHE_KEY))
+
+    def _store(self, token, expire):
+        info = {"token": token, "expires_at": time.time() + expire}
+        cache.set(self.CACHE_KEY, info, timeout=expire)
+        return self._remember(info)
+
+    def _fresh(self, token, expires_at):
+        return token and time.time() < expires_at - api_settings.TOKEN_REFRESH_AHEAD
+
+    def cached_token(self):
+        """
+        当前缓存中未过期的Token, 不会请求OA
+        """
+        token, expires_at = self._load()
+        if token and time.time() < expires_at:
+            return token
+        return None
+
+    def get(self, fetch, expire=None):
+        """
+        获取可用Token
+        :param fetch:  请求OA获取新Token的方法, fetch(expire) -> token
+        :param expire: Token有效期(秒)
+        """
+        if self._fresh(self._token, self._expires_at):
+            return self._token
+        token, expires_at = self._load()
+        if self._fresh(token, expires_at):
+            return token
+        if token and time.time() < expires_at:
+            # 即将过期但仍可用: 抢到锁的调用方刷新, 其余调用方直接使用旧Token
+            return self.refresh(fetch, expire=expire, stale_token=token, wait=False)
+        return self.refresh(fetch, expire=expire, stale_token=token)
+
+    def refresh(self, fetch, expire=None, stale_token=None, wait=True):  # noqa: FBT002
+        """
+        刷新Token, 同一时间只有一个进程会请求OA
+        :param fetch:       请求OA获取新Token的方法, fetch(expire) -> token
+        :param expire:      Token有效期(秒)
+        :param stale_token: 需要被替换的Token; 缓存中已是其他Token时直接复用
+        :param wait:        未抢到锁时是否等待其他进程刷新完成
+        """
+        expire = expire or api_settings.TOKEN_EXPIRE
+        lock_timeout = api_settings.TOKEN_LOCK_TIMEOUT
+        deadline = time.monotonic() + lock_timeout
+        while True:
+            token, expires_at = self._load()
+            if token and token != stale_token and time.time() < expires_at:
+                return token
+
+            lock_id = str(uuid.uuid4())
+            if cache.add(self.LOCK_KEY, lock_id, timeout=lock_timeout):
+                try:
+                    # 拿到锁后再确认一次, 避免重复刷新
+                    token, expires_at = self._load()
+                    if token and token != stale_token and time.time() < expires_at:
+                        return token
+                    token, _ = self._store(fetch(expire), expire)
+                    return token
+                finally:
+                    if cache.get(self.LOCK_KEY) == lock_id:
+                        cache.delete(self.LOCK_KEY)
+
+            if not wait and token and time.time() < expires_at:
+                return token
+            if time.monotonic() >= deadline:
+                # 持有锁的进程超时未完成刷新, 自行刷新
+                token, _ = self._store(fetch(expire), expire)
+                return token
+            time.sleep(self.POLL_INTERVAL)
+
+    async def aget(self, afetch, expire=None):
+        """
+        异步获取可用Token, 同get
+        -- 进程内副本有效时直接返回, 否则在线程中执行get, 不阻塞事件循环
+        :param afetch: 请求OA获取新Token的异步方法, await afetch(expire) -> token
+        """
+        if self._fresh(self._token, self._expires_at):
+            return self._token
+        return await sync_to_async(self.get, thread_sensitive=False)(
+            async_to_sync(afetch), expire=expire
+        )
+
+    async def arefresh(self, afetch, expire=None, stale_token=None, wait=True):  # noqa: FBT002
+        """
+        异步刷新Token, 同refresh, 在线程中执行, 不阻塞事件循环
+        :param afetch: 请求OA获取新Token的异步方法, await afetch(expire) -> token
+        """
+        return await sync_to_async(self.refresh, thread_sensitive=False)(
+            async_to_sync(afetch), expire=expire, stale_token=stale_token, wait=wait
+        )
+
+    def clear(self):
+        cache.delete(self.CACHE_KEY)
+        self._token = None
+        self._expires_at = 0.0
+
+
+token_manager = OaTokenManager()
@@ -0,0 +1,443 @@
+"""
+OA接口HTTP传输层以及并发请求线程池
+"""
+
+import copy
+import http.cookiejar
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.test.signals import setting_changed
+from rest_framework.exceptions import APIException
+
+from drf_oa_workflow.settings import SETTING_PREFIX
+from drf_oa_workflow.settings import api_settings
+
+__all__ = [
+    "CircuitBreaker",
+    "MultipartStream",
+    "RateLimiter",
+    "SingleFlight",
+    "circuit_breaker",
+    "close_sessions",
+    "get_executor",
+    "get_session",
+    "get_timeout",
+    "request_slot",
+    "submit",
+]
+
+
+class PooledSessionFactory:
+    """
+    进程级共享连接池的requests Session
+
+    -- 进程内所有线程共用一个HTTPAdapter(urllib3连接池), 复用到OA的TCP/TLS连接
+    -- 每个线程持有自己的Session对象, 避免多线程共享Session的状态
+    -- Session不保存cookie(OA返回的JSESSIONID等), 与直接调用requests.get/post一致,
+       避免同一线程中上一个用户的cookie被带到下一个用户的请求中
+    -- 连接池空闲超过 REQUESTS_POOL_KEEP_ALIVE 秒后丢弃旧连接,
+       防止使用已被OA或负载均衡关闭的连接
+    -- fork后(gunicorn/celery prefork)子进程会重新创建连接池
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = None
+        self._adapter = None
+        self._generation = 0
+        self._last_used = 0.0
+
+    @property
+    def library(self):
+        return api_settings.REQUESTS_LIBRARY
+
+    def _build_adapter(self):
+        from requests.adapters import HTTPAdapter
+
+        return HTTPAdapter(
+            pool_connections=api_settings.REQUESTS_POOL_CONNECTIONS,
+            pool_maxsize=api_settings.REQUESTS_POOL_MAXSIZE,
+            pool_block=api_settings.REQUESTS_POOL_BLOCK,
+        )
+
+    def _get_adapter(self):
+        now = time.monotonic()
+        keep_alive = api_settings.REQUESTS_POOL_KEEP_ALIVE
+        with self._lock:
+            if self._adapter is None or self._pid != os.getpid():
+                self._adapter = self._build_adapter()
+                self._pid = os.getpid()
+                self._generation += 1
+            elif keep_alive is not None and now - self._last_used > keep_alive:
+                # 空闲过久, 清理连接池中的旧连接, 下次请求时重新建立
+                self._adapter.poolmanager.clear()
+            self._last_used = now
+            return self._adapter, self._generation
+
+    def get_session(self):
+        """
+        获取当前线程使用的Session
+        REQUESTS_LIBRARY 不提供Session(如只封装了get/post的模块)时, 直接返回该模块
+        """
+        library = self.library
+        if not api_settings.REQUESTS_POOL_ENABLED or not hasattr(library, "Session"):
+            return library
+
+        adapter, generation = self._get_adapter()
+        session = getattr(self._local, "session", None)
+        if session is None or self._local.generation != generation:
+            session = library.Session()
+            session.cookies.set_policy(
+                http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+            self._local.generation = generation
+        return session
+
+    def close(self):
+        """
+        关闭连接池
+        """
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+            self._adapter = None
+            self._local = threading.local()
+
+
+_session_factory = PooledSessionFactory()
+
+
+def get_session():
+    return _session_factory.get_session()
+
+
+def close_sessions():
+    _session_factory.close()
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def _mark_worker():
+    _worker_state.active = True
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    进程内并发请求OA使用的线程池, 最大线程数为 CONCURRENT_MAX_WORKERS
+    """
+    global _executor, _executor_pid  # noqa: PLW0603
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=api_settings.CONCURRENT_MAX_WORKERS,
+                thread_name_prefix="oa-api",
+                initializer=_mark_worker,
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    在线程池中执行fn
+    已在线程池线程中时直接在当前线程执行, 避免嵌套提交任务相互等待导致线程池死锁
+    """
+    if getattr(_worker_state, "active", False):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+    return get_executor().submit(fn, *args, **kwargs)
+
+
+class RateLimiter:
+    """
+    按每秒请求数限流, 多个线程/协程共用
+    """
+
+    def __init__(self, rate=None):
+        """
+        :param rate: 每秒最多请求数, None或0表示不限流
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def reserve(self) -> float:
+        """
+        预约下一次请求的时间, 返回需要等待的秒数
+        """
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+            return start - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MultipartStream:
+    """
+    流式multipart/form-data请求体, 文件内容分块读取, 不会一次性读入内存
+
+    -- file_source可以是文件路径、bytes、文件对象(BytesIO/打开的文件等)或bytes迭代器
+    -- 能确定文件大小时(路径、bytes、可seek的文件对象)带Content-Length发送,
+       否则(管道、socket等不可seek的文件对象及迭代器)使用chunked传输
+    -- 路径、bytes及可seek的文件对象可以重复发送(如Token过期后重试), 迭代器只能发送一次
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fields: dict, file_field: str, file_source, file_name: str):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._source = file_source
+        self._start = self._start_position(file_source)
+
+        head = "".join(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{self._quote(name)}"\r\n\r\n'
+            f"{value}\r\n"
+            for name, value in fields.items()
+        )
+        file_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{self._quote(file_field)}"; '
+            f'filename="{self._quote(file_name)}"\r\n'
+            f"Content-Type: {file_type}\r\n\r\n"
+        )
+        self._head = head.encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        size = self._source_size()
+        if size is not None:
+            # requests根据len属性设置Content-Length
+            self.len = len(self._head) + size + len(self._tail)
+
+    @staticmethod
+    def _quote(value):
+        return str(value).replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+    @staticmethod
+    def _start_position(source):
+        """
+        可seek的文件对象的当前位置, 不可seek时为None
+        """
+        if not (hasattr(source, "seek") and hasattr(source, "tell")):
+            return None
+        try:
+            if hasattr(source, "seekable") and not source.seekable():
+                return None
+            return source.tell()
+        except (OSError, ValueError):
+            # io.UnsupportedOperation是OSError的子类
+            return None
+
+    def _source_size(self):
+        source = self._source
+        if isinstance(source, (str, os.PathLike)):
+            return Path(source).stat().st_size
+        if isinstance(source, (bytes, bytearray)):
+            return len(source)
+        if self._start is not None:
+            try:
+                end = source.seek(0, os.SEEK_END)
+                source.seek(self._start)
+            except (OSError, ValueError):
+                self._start = None
+                return None
+            return end - self._start
+        return None
+
+    def _iter_source(self):
+        source = self._source
+        if isinstance(source, (str, os.PathLike)):
+            with Path(source).open("rb") as f:
+                yield from iter(lambda: f.read(self.CHUNK_SIZE), b"")
+        elif isinstance(source, (bytes, bytearray)):
+            yield bytes(source)
+        elif hasattr(source, "read"):
+            if self._start is not None:
+                source.seek(self._start)
+            yield from iter(lambda: source.read(self.CHUNK_SIZE), b"")
+        else:
+            yield from source
+
+    def __iter__(self):
+        yield self._head
+        yield from self._iter_source()
+        yield self._tail
+
+
+class SingleFlight:
+    """
+    合并进程内相同的并发请求
+    相同key的请求执行中时, 后到的调用方等待并共用该请求的结果
+    每个调用方(包括发起请求的调用方)得到结果的深拷贝, 修改结果互不影响
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+def get_timeout():
+    """
+    请求OA的超时时间
+    设置了 REQUESTS_TIMEOUT 时使用该值, 否则为(连接超时, 读取超时)
+    """
+    if api_settings.REQUESTS_TIMEOUT is not None:
+        return api_settings.REQUESTS_TIMEOUT
+    return api_settings.REQUESTS_CONNECT_TIMEOUT, api_settings.REQUESTS_READ_TIMEOUT
+
+
+class CircuitBreaker:
+    """
+    OA服务熔断
+
+    -- 连续失败(无法连接、超时、5xx)达到 CIRCUIT_BREAKER_FAILURES 次后熔断,
+       熔断期间请求直接抛出APIException, 不再等待OA超时
+    -- 熔断 CIRCUIT_BREAKER_RESET_TIMEOUT 秒后放行一个试探请求(半开),
+       成功则恢复, 失败则继续熔断; 试探期间其他请求仍直接失败
+    -- 每个进程单独计数
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def before_request(self):
+        """
+        请求OA前调用, 熔断中抛出APIException
+        """
+        if not api_settings.CIRCUIT_BREAKER_ENABLED or self.state == self.CLOSED:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self.opened_at < api_settings.CIRCUIT_BREAKER_RESET_TIMEOUT:
+                raise APIException("OA服务暂时不可用, 请稍后重试")
+            # 半开: 放行当前请求试探, 下一个试探需再等待一个周期
+            self.opened_at = now
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (
+                self.state == self.OPEN
+                or self.failures >= api_settings.CIRCUIT_BREAKER_FAILURES
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_response(self, status_code):
+        if status_code >= 500:  # noqa: PLR2004
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+
+circuit_breaker = CircuitBreaker()
+
+_bulkhead = None
+_bulkhead_lock = threading.Lock()
+
+
+def _get_bulkhead():
+    global _bulkhead  # noqa: PLW0603
+    with _bulkhead_lock:
+        if _bulkhead is None and api_settings.REQUESTS_MAX_CONCURRENT:
+            _bulkhead = threading.BoundedSemaphore(api_settings.REQUESTS_MAX_CONCURRENT)
+        return _bulkhead
+
+
+@contextmanager
+def request_slot():
+    """
+    同步请求OA前获取执行名额
+    熔断中, 或进程内同时请求OA的数量达到 REQUESTS_MAX_CONCURRENT 且等待
+    REQUESTS_QUEUE_TIMEOUT 秒后仍无空闲名额时, 抛出APIException
+    """
+    circuit_breaker.before_request()
+    bulkhead = _get_bulkhead()
+    if bulkhead is None:
+        yield
+        return
+    if not bulkhead.acquire(timeout=api_settings.REQUESTS_QUEUE_TIMEOUT):
+        raise APIException("请求OA服务的任务过多, 请稍后重试")
+    try:
+        yield
+    finally:
+        bulkhead.release()
+
+
+def reload_sessions(*args, **kwargs):
+    global _bulkhead  # noqa: PLW0603
+    if kwargs["setting"] == SETTING_PREFIX:
+        close_sessions()
+        circuit_breaker.reset()
+        _bulkhead = None
+
+
+setting_changed.connect(reload_sessions)
@@ -1,12 +1,19 @@
 import base64
+import hashlib
 import json
 import re
+import threading
 import time
-from io import BytesIO
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
 from itertools import groupby
+from itertools import islice
 from json.decoder import JSONDecodeError as BaseJSONDecodeError
+from typing import TYPE_CHECKING
 
-import requests as system_requests
 from Crypto.Cipher import PKCS1_v1_5
 from Crypto.PublicKey import RSA
 from django.apps import apps as django_apps
@@ -15,15 +22,28 @@ from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from requests.exceptions import ConnectionError
 from requests.exceptions import JSONDecodeError
+from requests.exceptions import Timeout
 from rest_framework.exceptions import APIException
 
 from drf_oa_workflow import choices
+from drf_oa_workflow.db.task_list import db_task_list_provider
 from drf_oa_workflow.models import HRMResource
+from drf_oa_workflow.models import WorkflowRequestBase
 from drf_oa_workflow.settings import DEFAULT_SYNC_OA_USER_MODEL
 from drf_oa_workflow.settings import SETTING_PREFIX
 from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.tokens import token_manager
+from drf_oa_workflow.transport import MultipartStream
+from drf_oa_workflow.transport import RateLimiter
+from drf_oa_workflow.transport import SingleFlight
+from drf_oa_workflow.transport import circuit_breaker
+from drf_oa_workflow.transport import get_session
+from drf_oa_workflow.transport import get_timeout
+from drf_oa_workflow.transport import request_slot
+from drf_oa_workflow.transport import submit
 
-requests: system_requests = api_settings.REQUESTS_LIBRARY
+if TYPE_CHECKING:
+    import requests as system_requests
 
 
 def get_sync_oa_user_model():
@@ -43,9 +63,88 @@ def get_sync_oa_user_model():
         )
 
 
+def get_workflow_metadata_model(model_name):
+    """
+    按 WORKFLOW_METADATA_SOURCE 返回流程元数据模型
+    :param model_name: OA数据库模型名, 如 WorkflowBase、WorkflowNodeLink
+    :return: "local" 时返回项目数据库中的副本模型(Local*), 否则返回OA数据库模型
+    """
+    if api_settings.WORKFLOW_METADATA_SOURCE == "local":
+        model_name = f"Local{model_name}"
+    return django_apps.get_model("drf_oa_workflow", model_name)
+
+
+class OaTokenExpired(Exception):
+    """
+    OA接口Token不存在或已超时
+    """
+
+
+class SpkEncryptor:
+    """
+    使用OA SPK加密文本
+    解析后的公钥只加载一次, 加密结果按明文缓存(LRU), 避免每次请求重复RSA加密
+    """
+
+    def __init__(self, app_spk: str, maxsize: int):
+        self.fingerprint = spk_fingerprint(app_spk)
+        self.maxsize = maxsize
+        self._cipher = PKCS1_v1_5.new(RSA.import_key(app_spk.encode()))
+        self._encrypted = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encrypt(self, text: str):
+        with self._lock:
+            if text in self._encrypted:
+                self._encrypted.move_to_end(text)
+                return self._encrypted[text]
+
+        result = base64.b64encode(self._cipher.encrypt(text.encode())).decode()
+        with self._lock:
+            self._encrypted[text] = result
+            while len(self._encrypted) > self.maxsize:
+                self._encrypted.popitem(last=False)
+        return result
+
+
+_spk_encryptors = {}
+_spk_encryptors_lock = threading.Lock()
+
+
+def spk_fingerprint(app_spk: str):
+    return hashlib.sha256(app_spk.encode()).hexdigest()
+
+
+def get_spk_encryptor(app_spk: str) -> SpkEncryptor:
+    """
+    按SPK指纹获取加密器, SPK变更后会使用新的加密器
+    :param app_spk: 已处理格式的OA SPK
+    """
+    fingerprint = spk_fingerprint(app_spk)
+    encryptor = _spk_encryptors.get(fingerprint)
+    if encryptor is None:
+        with _spk_encryptors_lock:
+            encryptor = _spk_encryptors.get(fingerprint)
+            if encryptor is None:
+                encryptor = SpkEncryptor(
+                    app_spk, maxsize=api_settings.SPK_ENCRYPT_CACHE_SIZE
+                )
+                _spk_encryptors[fingerprint] = encryptor
+    return encryptor
+
+
+_get_flight = SingleFlight()
+
+
 class OaApi:
     TOKEN_KEY = "token"  # noqa: S105
-    CACHE_TOKEN_KEY = "oa-api-token"  # noqa: S105
+    CACHE_TOKEN_KEY = token_manager.CACHE_KEY
+    CACHE_USERINFO_KEY = "oa-api-userinfo:{oa_user_id}"
+    CACHE_PAGE_COUNT_KEY = "oa-api-page-count:{oa_user_id}:{version}:{digest}"
+    CACHE_PAGE_COUNT_VERSION_KEY = "oa-api-page-count-version:{oa_user_id}"
+    CACHE_SSO_TOKEN_KEY = "oa-api-sso-token:{staff_code}"  # noqa: S105
+    CACHE_CHART_XML_KEY = "oa-api-chart-xml:{workflow_id}:{version}"
+    CHART_NODE_NAME_PATTERN = re.compile(r'value="base64_(?P<b64_node_name>[^"]*)"')
     REQUEST_CONTENTTYPE = "application/x-www-form-urlencoded; charset=utf-8"
     REQUEST_HEADERS = {"Content-Type": REQUEST_CONTENTTYPE}
 
@@ -81,25 +180,60 @@ class OaApi:
             self.app_spk = self.handle_pub_key(api_settings.APP_SPK)
         else:
             self.app_spk = api_settings.APP_SPK
+        self._spk_encryptor = get_spk_encryptor(self.app_spk)
         self.app_encrypted_secret = self.__encrypt_with_spk(api_settings.APP_RAW_SECRET)
         # self.encrypt_userid = self.__get_encrypt_userid(oa_user_id)
         self.encrypt_userid = ""
+        self.oa_user_id = ""
 
-        self.token = cache.get(self.CACHE_TOKEN_KEY)
+        self.token = self._load_cached_token()
 
         self.maximum_recursion = 8
         self.recursion_c = 0
 
+    def _load_cached_token(self):
+        """
+        创建客户端时读取缓存中的Token
+        """
+        return token_manager.cached_token()
+
     def __helpme(self, error):
         if self.recursion_c >= self.maximum_recursion:
             raise APIException(error)
         self.recursion_c += 1
 
-    def get_sso_token(self, staff_code):
+    def get_sso_token(self, staff_code, use_cache=True):  # noqa: FBT002
         """
         获取SSO TOKEN
+        同一账号的Token缓存 SSO_TOKEN_CACHE_TIMEOUT 秒
         :param staff_code: 用户工号或者为oa的登入名, A0009527
+        :param use_cache: 是否使用缓存的Token
         """
+        cache_key = self._sso_token_cache_key(staff_code) if use_cache else None
+        if cache_key:
+            token = cache.get(cache_key)
+            if token:
+                return token
+
+        api_path = "/ssologin/getToken"
+        headers = {"Content-Type": self.REQUEST_CONTENTTYPE}
+        post_data = self._sso_token_data(staff_code)
+        token = self._post_oa(
+            api_path, post_data=post_data, headers=headers, need_json=False
+        )
+        token = self._check_sso_token(token)
+        if cache_key:
+            cache.set(cache_key, token, timeout=api_settings.SSO_TOKEN_CACHE_TIMEOUT)
+        return token
+
+    @classmethod
+    def _sso_token_cache_key(cls, staff_code):
+        if not api_settings.SSO_TOKEN_CACHE_TIMEOUT:
+            return None
+        return cls.CACHE_SSO_TOKEN_KEY.format(staff_code=staff_code)
+
+    @staticmethod
+    def _sso_token_data(staff_code):
         if not api_settings.OA_SSO_TOKEN_APP_ID:
             raise ValueError(
                 "使用此方法请先在django settings中配置变量:"
@@ -109,12 +243,10 @@ class OaApi:
                 "\n    ..."
                 "\n}"
             )
-        api_path = "/ssologin/getToken"
-        headers = {"Content-Type": self.REQUEST_CONTENTTYPE}
-        post_data = {"appid": api_settings.OA_SSO_TOKEN_APP_ID, "loginid": staff_code}
-        token = self._post_oa(
-            api_path, post_data=post_data, headers=headers, need_json=False
-        )
+        return {"appid": api_settings.OA_SSO_TOKEN_APP_ID, "loginid": staff_code}
+
+    @staticmethod
+    def _check_sso_token(token: str):
         # RIGHT DCA2CD1A9AFA13A8CEA5C82A5CDE8D7ADABA81522626723EC559D733649FABDC
         # ERROR Token获取失败: 认证应用未注册
         if "失败" in token:
@@ -132,11 +264,71 @@ class OaApi:
         if getattr(self, "user", {}) and str(self.user["userid"]) == oa_user_id:
             return
 
-        if not self.token:
-            self.get_token()
         self.oa_user_id = oa_user_id
         self.encrypt_userid = self.__encrypt_with_spk(oa_user_id)
-        self._user = self.userinfo()
+        self._user = self.get_userinfo(oa_user_id)
+
+    @classmethod
+    def _userinfo_cache_key(cls, oa_user_id):
+        return cls.CACHE_USERINFO_KEY.format(oa_user_id=oa_user_id)
+
+    def get_userinfo(self, oa_user_id: str) -> dict:
+        """
+        获取账号信息, 结果缓存 USERINFO_CACHE_TIMEOUT 秒
+        USERINFO_SOURCE 为 "db" 时优先使用已同步的OA用户表数据, 未查询到再请求OA接口
+        :param oa_user_id: 已注册的OA用户ID
+        """
+        cache_key = self._userinfo_cache_key(oa_user_id)
+        user_info = cache.get(cache_key)
+        if user_info is not None:
+            return user_info
+
+        if api_settings.USERINFO_SOURCE == "db":
+            user_info = self.userinfo_from_db(oa_user_id)
+        if not user_info:
+            user_info = self.userinfo()
+        cache.set(cache_key, user_info, timeout=api_settings.USERINFO_CACHE_TIMEOUT)
+        return user_info
+
+    @classmethod
+    def invalidate_userinfo(cls, *oa_user_ids):
+        """
+        清除账号信息缓存
+        :param oa_user_ids: OA用户ID
+        """
+        cache.delete_many([cls._userinfo_cache_key(i) for i in oa_user_ids])
+
+    @staticmethod
+    def userinfo_from_db(oa_user_id: str):
+        """
+        使用已同步的OA用户表(SYNC_OA_USER_MODEL)或OA人员表构建账号信息
+        仅包含userid、username、deptid、deptname
+        :param oa_user_id: OA用户ID
+        """
+        oa_user = get_sync_oa_user_model().objects.filter(user_id=oa_user_id).first()
+        if oa_user:
+            return {
+                "userid": str(oa_user.user_id),
+                "username": oa_user.name,
+                "deptid": oa_user.dept_id,
+                "deptname": oa_user.dept_name,
+            }
+
+        oa_user = (
+            HRMResource.objects.select_related("DEPARTMENTID")
+            .filter(ID=oa_user_id)
+            .first()
+        )
+        if oa_user:
+            return {
+                "userid": str(oa_user.ID),
+                "username": oa_user.LASTNAME,
+                "deptid": oa_user.DEPARTMENTID_id,
+                "deptname": (
+                    oa_user.DEPARTMENTID.DEPARTMENTNAME if oa_user.DEPARTMENTID else ""
+                ),
+            }
+        return None
 
     def register_user_with_job_code(self, job_code: str):
         """
@@ -155,25 +347,28 @@ class OaApi:
         :param text:
         :return:
         """
-        publickey = RSA.import_key(self.app_spk.encode())
-        pk = PKCS1_v1_5.new(publickey)
-        encrypt_text = pk.encrypt(text.encode())
-        result = base64.b64encode(encrypt_text)
-        return result.decode()
+        return self._spk_encryptor.encrypt(text)
+
+    def get_token(self, expr=None):
+        """
+        刷新Oa API Token
+        多个进程同时刷新时只有一个进程会请求OA, 其余进程复用刷新后的Token
+        :param expr: Token有效期(秒), 默认为 TOKEN_EXPIRE
+        :return:
+        """
+        self.token = token_manager.refresh(
+            self._apply_token, expire=expr, stale_token=self.token
+        )
+        return self.token
 
-    def get_token(self, expr=10800):
+    def _apply_token(self, expr):
         """
-        获取Oa API Token
-        :param expr:
+        请求OA获取新的Token
+        :param expr: Token有效期(秒)
         :return:
         """
         api_path = "/api/ec/dev/auth/applytoken"
-        headers = {
-            "appid": self.app_id,
-            "secret": self.app_encrypted_secret,
-            "time": str(expr),
-        }
-        res = self._post_oa(api_path, headers=headers)
+        res = self._post_oa(api_path, headers=self._apply_token_headers(expr))
         # resp.text {
         # "msg":"获取成功!",
         # "code":0,
@@ -182,12 +377,24 @@ class OaApi:
         # "token":"e3d7e45b-805c-43c3-9c0c-e452135ae1ea"
         # }
         # print("新OA Token: ", res[self.TOKEN_KEY])
-        self.token = res[self.TOKEN_KEY]
-        cache.set(self.CACHE_TOKEN_KEY, self.token, timeout=None)
-        return self.token
+        return res[self.TOKEN_KEY]
+
+    def _apply_token_headers(self, expr):
+        return {
+            "appid": self.app_id,
+            "secret": self.app_encrypted_secret,
+            "time": str(expr),
+        }
 
     @property
     def _request_headers(self):
+        headers = self._user_headers()
+        # Token即将过期时会提前刷新
+        self.token = token_manager.get(self._apply_token)
+        headers[self.TOKEN_KEY] = self.token
+        return headers
+
+    def _user_headers(self):
         if not self.encrypt_userid:
             raise NotImplementedError(
                 "调用前请先使用.register_user(OA_USER_ID: str)"
@@ -237,22 +444,43 @@ class OaApi:
     def __request(
         self,
         api_path,
-        rf: any([system_requests.get, system_requests.post]),
+        method: str,
         headers: dict = None,  # noqa: RUF013 PEP 484
         need_json=True,  # noqa: FBT002
         **kwargs,
     ):
         url = f"{self.oa_host}{api_path}"
         headers = headers or self._request_headers
+        rf = getattr(get_session(), method)
+        with request_slot():
+            try:
+                resp: system_requests.Response = rf(
+                    url, headers=headers, **kwargs, timeout=get_timeout()
+                )
+            except ConnectionError as e:
+                circuit_breaker.record_failure()
+                raise APIException(f"系统无法连接到OA服务: {e}")
+            except Timeout as e:
+                circuit_breaker.record_failure()
+                raise APIException(f"OA服务响应超时: {e}")
+            except Exception as e:
+                raise APIException(str(e))
+        circuit_breaker.record_response(resp.status_code)
+
         try:
-            resp: system_requests.Response = rf(
-                url, headers=headers, **kwargs, timeout=api_settings.REQUESTS_TIMEOUT
+            return self._parse_response(resp, need_json=need_json)
+        except OaTokenExpired as e:
+            self.__helpme(str(e))
+            headers[self.TOKEN_KEY] = self.get_token()
+            return self.__request(
+                api_path, method, headers=headers, need_json=need_json, **kwargs
             )
-        except ConnectionError as e:
-            raise APIException(f"系统无法连接到OA服务: {e}")
-        except Exception as e:
-            raise APIException(str(e))
 
+    def _parse_response(self, resp, need_json=True):  # noqa: FBT002
+        """
+        解析OA接口响应
+        Token失效时抛出OaTokenExpired, 由调用方刷新Token后重试
+        """
         if resp.status_code != 200:  # noqa: PLR2004
             # 错误导致递归的问题
             # print(resp.text)
@@ -286,20 +514,12 @@ class OaApi:
                 elif resp_msg.startswith("认证信息错误"):
                     explain_suf = "(或为OA APP_SECRET失效)"
                 elif resp_msg.startswith("token不存在或者超时"):
-                    self.__helpme(resp.text)
-                    headers[self.TOKEN_KEY] = self.get_token()
-                    return self.__request(
-                        api_path, rf, headers=headers, need_json=need_json, **kwargs
-                    )
+                    raise OaTokenExpired(resp.text)
                 else:
                     explain_suf = "(或为OA License过期)"
                 raise APIException(detail=f"OA Error: {resp_msg}。{explain_suf}")
             if resp_msg == "登录信息超时":
-                self.__helpme(resp.text)
-                headers[self.TOKEN_KEY] = self.get_token()
-                return self.__request(
-                    api_path, rf, headers=headers, need_json=need_json, **kwargs
-                )
+                raise OaTokenExpired(resp.text)
             raise ValueError(f"Error: {resp.text}")
         if isinstance(res, dict) and res.get("code", "") and res["code"] != "SUCCESS":
             # error_msg = f"OA提示: {res['code']}, {res.get('errMsg', '')};"
@@ -309,19 +529,45 @@ class OaApi:
             raise APIException(detail=self.get_faild_info(res))
         return res
 
-    def _get_oa(
+    def _get_oa(  # noqa: PLR0913
         self,
         api: str,
         params: dict = None,  # noqa: RUF013 PEP 484
         headers: dict = None,  # noqa: RUF013 PEP 484
         need_json=True,  # noqa: FBT002
+        coalesce=None,
     ):
+        """
+        :param coalesce: 是否合并相同用户、接口、参数的并发请求,
+                         默认为 REQUESTS_COALESCE_GET; 指定headers时不合并
+        """
+        if coalesce is None:
+            coalesce = api_settings.REQUESTS_COALESCE_GET
+        if coalesce and not headers:
+            return _get_flight.do(
+                self._coalesce_key(api, params, need_json),
+                self._get_oa,
+                api,
+                params=params,
+                need_json=need_json,
+                coalesce=False,
+            )
+
         res = self.__request(
-            api, requests.get, params=params, headers=headers, need_json=need_json
+            api, "get", params=params, headers=headers, need_json=need_json
         )
         self.recursion_c = 0
         return res
 
+    def _coalesce_key(self, api, params, need_json):
+        return (
+            self.oa_host,
+            self.oa_user_id,
+            api,
+            json.dumps(params, sort_keys=True, default=str),
+            need_json,
+        )
+
     def _post_oa(
         self,
         api: str,
@@ -332,7 +578,7 @@ class OaApi:
     ):
         res = self.__request(
             api,
-            requests.post,
+            "post",
             data=post_data,
             headers=headers,
             need_json=need_json,
@@ -349,12 +595,17 @@ class OaApi:
         page=1,
         page_size=10,
         conditions: dict = None,  # noqa: RUF013 PEP 484
+        concurrent=None,
     ):
         """
         请求分页数据
         :param page_count_path:
         :param page_data_path:
         :param workflow_id:
+        :param page:
+        :param page_size:
+        :param concurrent: 是否同时请求总数和分页数据, 默认为 PAGE_DATA_CONCURRENT
+                           总数已缓存时不使用, 页码超出范围时不请求分页数据
         :param conditions: 查询条件
             -- archivestatus  流程是否归档。 1: 已归档 2: 未归档
             -- nodetype:      当前节点类型。 0: 创建，1: 批准，2: 提交，3: 归档
@@ -369,9 +620,45 @@ class OaApi:
            内部价2                       workflowIds           id = 51022
            内部价                        workflowIds           id = 50522
         """
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        post_data = {
+            "pageNo": str(page),
+            "pageSize": str(page_size),
+            **search_conditions,
+        }
+        if concurrent is None:
+            concurrent = api_settings.PAGE_DATA_CONCURRENT
+
+        todo_count = self._cached_page_count(page_count_path, search_conditions)
+        if todo_count is None and concurrent:
+            # 总数未缓存时与分页数据同时请求, 页码超出范围时丢弃分页数据
+            count_future = submit(
+                self._request_page_count, page_count_path, search_conditions
+            )
+            res: list = self._post_oa(page_data_path, post_data=post_data)
+            todo_count = count_future.result()
+            if (page - 1) * page_size >= todo_count:
+                return [], page, todo_count
+            return res, page, todo_count
+
+        if todo_count is None:
+            todo_count = self._request_page_count(page_count_path, search_conditions)
+
+        if (page - 1) * page_size >= todo_count:
+            return [], page, todo_count
+
+        res: list = self._post_oa(
+            page_data_path,
+            post_data=post_data,  # , need_json=False
+        )
+
+        return res, page, todo_count
+
+    @staticmethod
+    def _search_conditions(workflow_id, conditions: dict = None):  # noqa: RUF013
         if not conditions:
             conditions = {}
-        search_conditions = {
+        return {
             "conditions": json.dumps(
                 {
                     # "workflowTypes": "1021",  # 流程目录ID  2,3,4
@@ -380,25 +667,184 @@ class OaApi:
                 }
             )
         }
+
+    def _iter_page_data(  # noqa: PLR0913
+        self,
+        page_count_path,
+        page_data_path,
+        workflow_id,
+        page_size=100,
+        conditions: dict = None,  # noqa: RUF013 PEP 484
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐页遍历全部分页数据, 逐条返回
+        -- 总数只请求一次
+        -- prefetch为True时, 调用方处理当前页的同时在线程池中请求下一页
+        -- 内存中最多同时保留两页数据
+        :param page_count_path:
+        :param page_data_path:
+        :param workflow_id:
+        :param page_size:
+        :param conditions: 查询条件, 同_page_data
+        :param prefetch: 是否预取下一页
+        """
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        total_count = self._page_count(page_count_path, search_conditions)
+        total_pages = (total_count + page_size - 1) // page_size
+
+        def fetch(page):
+            post_data = {
+                "pageNo": str(page),
+                "pageSize": str(page_size),
+                **search_conditions,
+            }
+            return self._post_oa(page_data_path, post_data=post_data)
+
+        future = None
+        try:
+            for page in range(1, total_pages + 1):
+                data = future.result() if future else fetch(page)
+                future = None
+                if prefetch and page < total_pages and len(data) >= page_size:
+                    future = submit(fetch, page + 1)
+                yield from data
+                if len(data) < page_size:
+                    # 遍历期间数据减少, 已无后续数据
+                    break
+        finally:
+            if future:
+                future.cancel()
+
+    def _page_count(self, page_count_path, search_conditions: dict) -> int:
+        """
+        请求分页数据总数
+        结果按(用户, 接口, 查询条件)缓存 PAGE_COUNT_CACHE_TIMEOUT 秒, 用户操作流程后失效
+        """
+        count = self._cached_page_count(page_count_path, search_conditions)
+        if count is None:
+            count = self._request_page_count(page_count_path, search_conditions)
+        return count
+
+    def _cached_page_count(self, page_count_path, search_conditions: dict):
+        """
+        缓存中的分页数据总数, 未缓存时返回None
+        """
+        if not api_settings.PAGE_COUNT_CACHE_TIMEOUT:
+            return None
+        return cache.get(self._page_count_cache_key(page_count_path, search_conditions))
+
+    def _request_page_count(self, page_count_path, search_conditions: dict) -> int:
+        """
+        请求OA获取分页数据总数并缓存
+        """
         resp = self._post_oa(
             page_count_path, post_data=search_conditions, need_json=False
         )
-        todo_count = int(resp)
-
-        if (page - 1) * page_size >= todo_count:
-            return [], page, todo_count
+        count = int(resp)
+        timeout = api_settings.PAGE_COUNT_CACHE_TIMEOUT
+        if timeout:
+            cache_key = self._page_count_cache_key(page_count_path, search_conditions)
+            cache.set(cache_key, count, timeout=timeout)
+        return count
+
+    def _page_count_cache_key(self, page_count_path, search_conditions: dict):
+        conditions = json.dumps(
+            json.loads(search_conditions["conditions"]), sort_keys=True, default=str
+        )
+        digest = hashlib.md5(  # noqa: S324
+            f"{page_count_path}|{conditions}".encode()
+        ).hexdigest()
+        version_key = self.CACHE_PAGE_COUNT_VERSION_KEY.format(
+            oa_user_id=self.oa_user_id
+        )
+        version = cache.get_or_set(version_key, uuid.uuid4().hex, timeout=None)
+        return self.CACHE_PAGE_COUNT_KEY.format(
+            oa_user_id=self.oa_user_id, version=version, digest=digest
+        )
 
-        post_data = {
-            "pageNo": str(page),
-            "pageSize": str(page_size),
-            **search_conditions,
-        }
-        res: list = self._post_oa(
-            page_data_path,
-            post_data=post_data,  # , need_json=False
+    @classmethod
+    def invalidate_page_count(cls, *oa_user_ids):
+        """
+        清除用户的分页数据总数缓存
+        :param oa_user_ids: OA用户ID
+        """
+        cache.set_many(
+            {
+                cls.CACHE_PAGE_COUNT_VERSION_KEY.format(oa_user_id=i): uuid.uuid4().hex
+                for i in oa_user_ids
+            },
+            timeout=None,
         )
 
-        return res, page, todo_count
+    @staticmethod
+    def _batch_kwargs(items) -> list:
+        """
+        批量操作参数, 元素为流程请求ID或包含request_id的参数dict
+        """
+        return [
+            dict(item) if isinstance(item, dict) else {"request_id": item}
+            for item in items
+        ]
+
+    def _run_batch(  # noqa: PLR0913
+        self,
+        func,
+        batch_kwargs,
+        concurrency=None,
+        rate_limit=None,
+        start=0,
+        callback=None,
+    ):
+        """
+        在线程池中批量执行func, 同时执行的数量不超过concurrency
+        batch_kwargs按需读取, 正在执行的数量达到上限时不再读取新数据
+        :param func:         单条操作方法, func(**kwargs)
+        :param batch_kwargs: 每条操作的参数, 可以是生成器
+        :param concurrency:  同时执行数量, 默认为 BATCH_CONCURRENCY
+        :param rate_limit:   每秒最多请求数, 默认为 BATCH_RATE_LIMIT
+        :param start:        第一条数据的序号
+        :param callback:     每条操作完成后调用callback(index, result), 可用于记录进度
+        :return: 与batch_kwargs顺序一致的结果
+            [{"request_id": "", "success": True, "result": {}, "error": None}]
+        """
+        concurrency = concurrency or api_settings.BATCH_CONCURRENCY
+        if rate_limit is None:
+            rate_limit = api_settings.BATCH_RATE_LIMIT
+        limiter = RateLimiter(rate_limit)
+        # 先取得Token, 批量操作共用
+        self.token = token_manager.get(self._apply_token)
+
+        def run(kwargs):
+            limiter.wait()
+            return func(**kwargs)
+
+        results = {}
+        items = enumerate(batch_kwargs, start)
+        pending = {}
+        while True:
+            for index, kwargs in islice(items, concurrency - len(pending)):
+                pending[submit(run, kwargs)] = (index, kwargs)
+            if not pending:
+                return [results[i] for i in sorted(results)]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, kwargs = pending.pop(future)
+                result = {
+                    "request_id": kwargs.get("request_id"),
+                    "success": True,
+                    "result": None,
+                    "error": None,
+                }
+                try:
+                    result["result"] = future.result()
+                except Exception as e:
+                    # OA返回的失败信息已由get_faild_info整理
+                    result["success"] = False
+                    result["error"] = str(e)
+                results[index] = result
+                if callback:
+                    callback(index, result)
 
     def userinfo(self) -> dict:
         """
@@ -444,14 +890,15 @@ class OaApi:
     def upload_file(
         self,
         oa_category_id: str,
-        file_source: BytesIO,
+        file_source,
         file_name,
         return_fileid_only=True,  # noqa: FBT002
     ):
         """
         上传附件
+        文件内容分块读取并流式发送, 不会一次性读入内存
         :param oa_category_id: Oa附件目录ID
-        :param file_source: 上传到Oa的文件内容
+        :param file_source: 上传到Oa的文件内容, 文件路径、bytes、文件对象或bytes迭代器
         :param file_name: 上传到Oa的文件名称
         :param return_fileid_only: 只返回上传的附件id
         :return:
@@ -459,14 +906,44 @@ class OaApi:
         api_path = "/api/doc/upload/uploadFile2Doc"
         # api_path = "/api/doc/upload/uploadFile"
         body = {"category": oa_category_id, "name": file_name}
+        stream = MultipartStream(body, "file", file_source, file_name)
         headers = self._request_headers.copy()
-        headers.pop("Content-Type")
-        files = {"file": file_source}
-        resp = self._post_oa(api_path, post_data=body, headers=headers, files=files)
+        headers["Content-Type"] = stream.content_type
+        resp = self._post_oa(api_path, post_data=stream, headers=headers)
         if return_fileid_only:
             return resp["data"]["fileid"]
         return resp["data"]
 
+    def upload_files(
+        self,
+        oa_category_id: str,
+        files: list,
+        concurrency=None,
+        return_fileid_only=True,  # noqa: FBT002
+    ):
+        """
+        同时上传多个附件, 可在submit_new前上传流程的全部附件
+        :param oa_category_id: Oa附件目录ID
+        :param files: [(file_source, file_name)], file_source同upload_file
+        :param concurrency: 同时上传数量, 默认为 BATCH_CONCURRENCY
+        :param return_fileid_only: 只返回上传的附件id
+        :return: 与files顺序一致的结果, result为附件id或附件信息
+            [{"request_id": None, "success": True, "result": "", "error": None}]
+        """
+        return self._run_batch(
+            self.upload_file,
+            [
+                {
+                    "oa_category_id": oa_category_id,
+                    "file_source": file_source,
+                    "file_name": file_name,
+                    "return_fileid_only": return_fileid_only,
+                }
+                for file_source, file_name in files
+            ],
+            concurrency=concurrency,
+        )
+
     def get_workflow_chart_url(self, staff_code: str, oa_workflow_id):
         """
         以管理流程方式获取流程配置的流程图链接， 不需要注册用户
@@ -486,112 +963,478 @@ class OaApi:
         """
         获取流程配置的流程图xml数据
         需要高权限级别的OA账号
+        CHART_XML_CACHE_TIMEOUT 不为0时按流程ID及流程版本缓存
         :param oa_workflow_id: 要获取流程图的OA流程ID
         """
+        cache_key = self._chart_xml_cache_key(
+            oa_workflow_id, self.get_workflow_version(oa_workflow_id)
+        )
+        if cache_key:
+            xml_content = cache.get(cache_key)
+            if xml_content is not None:
+                return xml_content
+
         get_xml_path = "/api/workflow/layout/getXml"
         post_data = {
             "workflowId": oa_workflow_id,
             "backstageReadOnly": True,
         }
         res = self._post_oa(get_xml_path, post_data=post_data)
-        xml_content = res.get("xml", "")
+        xml_content = self._decode_chart_xml(res.get("xml", ""))
+        if cache_key:
+            cache.set(
+                cache_key, xml_content, timeout=api_settings.CHART_XML_CACHE_TIMEOUT
+            )
+        return xml_content
+
+    @staticmethod
+    def get_workflow_version(oa_workflow_id):
+        """
+        流程版本(VERSION及ACTIVEVERSIONID), 用于判断流程图是否有变更
+        CHART_XML_CACHE_TIMEOUT 为0时不查询, 返回None
+        :param oa_workflow_id: OA流程ID
+        """
+        if not api_settings.CHART_XML_CACHE_TIMEOUT:
+            return None
+        row = (
+            get_workflow_metadata_model("WorkflowBase")
+            .objects.filter(ID=oa_workflow_id)
+            .values_list("VERSION", "ACTIVEVERSIONID")
+            .first()
+        )
+        if not row:
+            return None
+        return ":".join(str(i) for i in row)
+
+    @classmethod
+    def _chart_xml_cache_key(cls, oa_workflow_id, version):
+        if not version or not api_settings.CHART_XML_CACHE_TIMEOUT:
+            return None
+        return cls.CACHE_CHART_XML_KEY.format(
+            workflow_id=oa_workflow_id, version=version
+        )
+
+    @classmethod
+    def _decode_chart_xml(cls, xml_content: str):
         if not xml_content:
             return ""
 
-        # xml中的节点名value的值需要base64解码
-        b64_node_names = re.findall(
-            r"value=\"base64_(?P<b64_node_name>\S+)\"", xml_content
-        )
-        b64_node_names = set(b64_node_names)
-        for i in b64_node_names:
-            node_name = base64.b64decode(i).decode()
-            replace_str = f"base64_{i}"
-            xml_content = xml_content.replace(replace_str, node_name)
-        return xml_content
+        # xml中的节点名value的值需要base64解码, 一次替换全部节点名
+        decoded = {}
+
+        def decode(match):
+            b64_node_name = match.group("b64_node_name")
+            if b64_node_name not in decoded:
+                decoded[b64_node_name] = base64.b64decode(b64_node_name).decode()
+            return f'value="{decoded[b64_node_name]}"'
+
+        return cls.CHART_NODE_NAME_PATTERN.sub(decode, xml_content)
 
 
 class OaWorkFlow(OaApi):
-    def get_todo_list(self, workflow_id, page, page_size, conditions=None):
-        """
-        待办流程
+    CACHE_BUTTONS_KEY = "oa-api-buttons:{oa_user_id}:{request_id}:{version}"
+
+    # 分页列表接口: (总数接口, 分页数据接口)
+    PAGE_DATA_APIS = {
+        # 待办流程
+        "todo": (
+            "/api/workflow/paService/getToDoWorkflowRequestCount",
+            "/api/workflow/paService/getToDoWorkflowRequestList",
+        ),
+        # 待办列表->待处理
+        "doing": (
+            "/api/workflow/paService/getDoingWorkflowRequestCount",
+            "/api/workflow/paService/getDoingWorkflowRequestList",
+        ),
+        # 待办列表->待阅
+        "unread": (
+            "/api/workflow/paService/getToBeReadWorkflowRequestCount",
+            "/api/workflow/paService/getToBeReadWorkflowRequestList",
+        ),
+        # 待办列表->被退回
+        "rejected": (
+            "/api/workflow/paService/getBeRejectWorkflowRequestCount",
+            "/api/workflow/paService/getBeRejectWorkflowRequestList",
+        ),
+        # 已办流程
+        "handled": (
+            "/api/workflow/paService/getHandledWorkflowRequestCount",
+            "/api/workflow/paService/getHandledWorkflowRequestList",
+        ),
+    }
+
+    def get_list(  # noqa: PLR0913
+        self,
+        list_type,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
         """
-        count_api_path = "/api/workflow/paService/getToDoWorkflowRequestCount"
-        data_api_path = "/api/workflow/paService/getToDoWorkflowRequestList"
-        data, page, total_count = self._page_data(
+        分页列表
+        :param list_type: 列表类型 todo/doing/unread/rejected/handled
+        :param conditions: 查询条件, 同_page_data
+        :param concurrent: 是否同时请求总数和分页数据, 仅请求OA接口时有效
+        :param source: 数据来源, "api": OA接口; "db": 直接查询OA数据库,
+            默认为 TASK_LIST_SOURCE; 数据库不支持的列表类型或查询条件仍请求OA接口
+        """
+        if self._use_db_task_list(list_type, conditions, source):
+            return db_task_list_provider.page(
+                list_type,
+                self.oa_user_id,
+                workflow_id,
+                page=page,
+                page_size=page_size,
+                conditions=conditions,
+            )
+
+        count_api_path, data_api_path = self.PAGE_DATA_APIS[list_type]
+        return self._page_data(
             count_api_path,
             data_api_path,
             workflow_id,
             page=page,
             page_size=page_size,
             conditions=conditions,
+            concurrent=concurrent,
+        )
+
+    @staticmethod
+    def _use_db_task_list(list_type, conditions, source):
+        """
+        数据来源为"db"且数据库支持该列表类型及查询条件时查询数据库
+        """
+        return (
+            source or api_settings.TASK_LIST_SOURCE
+        ) == "db" and db_task_list_provider.supports(list_type, conditions)
+
+    def get_todo_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
+        """
+        待办流程
+        """
+        data, page, total_count = self.get_list(
+            "todo",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
         )
         # 示例数据 api_example_data.TODO_LIST_DEMO
         return data, page, total_count
 
-    def get_doing_list(self, workflow_id, page, page_size, conditions=None):
+    def get_doing_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
         """
         待办列表->待处理
         """
-        count_api_path = "/api/workflow/paService/getDoingWorkflowRequestCount"
-        data_api_path = "/api/workflow/paService/getDoingWorkflowRequestList"
-        data, page, total_count = self._page_data(
-            count_api_path,
-            data_api_path,
+        data, page, total_count = self.get_list(
+            "doing",
             workflow_id,
-            page=page,
-            page_size=page_size,
+            page,
+            page_size,
             conditions=conditions,
+            concurrent=concurrent,
+            source=source,
         )
         return data, page, total_count
 
-    def get_unread_list(self, workflow_id, page, page_size, conditions=None):
+    def get_unread_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
         """
         待办列表->待阅
         """
-        count_api_path = "/api/workflow/paService/getToBeReadWorkflowRequestCount"
-        data_api_path = "/api/workflow/paService/getToBeReadWorkflowRequestList"
-        data, page, total_count = self._page_data(
-            count_api_path,
-            data_api_path,
+        data, page, total_count = self.get_list(
+            "unread",
             workflow_id,
-            page=page,
-            page_size=page_size,
+            page,
+            page_size,
             conditions=conditions,
+            concurrent=concurrent,
+            source=source,
         )
         return data, page, total_count
 
-    def get_rejected_list(self, workflow_id, page, page_size, conditions=None):
+    def get_rejected_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
         """
         待办列表->被退回
         """
-        count_api_path = "/api/workflow/paService/getBeRejectWorkflowRequestCount"
-        data_api_path = "/api/workflow/paService/getBeRejectWorkflowRequestList"
-        data, page, total_count = self._page_data(
-            count_api_path,
-            data_api_path,
+        data, page, total_count = self.get_list(
+            "rejected",
             workflow_id,
-            page=page,
-            page_size=page_size,
+            page,
+            page_size,
             conditions=conditions,
+            concurrent=concurrent,
+            source=source,
         )
         return data, page, total_count
 
-    def get_handled_list(self, workflow_id, page, page_size, conditions=None):
+    def get_handled_list(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page,
+        page_size,
+        conditions=None,
+        concurrent=None,
+        source=None,
+    ):
         """
         已办流程
         """
-        count_api_path = "/api/workflow/paService/getHandledWorkflowRequestCount"
-        data_api_path = "/api/workflow/paService/getHandledWorkflowRequestList"
-        data, page, total_count = self._page_data(
+        data, page, total_count = self.get_list(
+            "handled",
+            workflow_id,
+            page,
+            page_size,
+            conditions=conditions,
+            concurrent=concurrent,
+            source=source,
+        )
+        # 示例数据 api_example_data.HANDLED_LIST_DEMO
+        return data, page, total_count
+
+    def iter_list(  # noqa: PLR0913
+        self,
+        list_type,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历列表全部数据
+        :param list_type: 列表类型 todo/doing/unread/rejected/handled
+        :param workflow_id:
+        :param page_size: 每次请求的数据量
+        :param conditions: 查询条件
+        :param prefetch: 是否预取下一页
+        """
+        count_api_path, data_api_path = self.PAGE_DATA_APIS[list_type]
+        return self._iter_page_data(
             count_api_path,
             data_api_path,
             workflow_id,
-            page=page,
             page_size=page_size,
             conditions=conditions,
+            prefetch=prefetch,
         )
-        # 示例数据 api_example_data.HANDLED_LIST_DEMO
-        return data, page, total_count
+
+    def iter_todo(
+        self,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历待办流程
+        """
+        return self.iter_list(
+            "todo",
+            workflow_id,
+            page_size=page_size,
+            conditions=conditions,
+            prefetch=prefetch,
+        )
+
+    def iter_doing(
+        self,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历待办列表->待处理
+        """
+        return self.iter_list(
+            "doing",
+            workflow_id,
+            page_size=page_size,
+            conditions=conditions,
+            prefetch=prefetch,
+        )
+
+    def iter_unread(
+        self,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历待办列表->待阅
+        """
+        return self.iter_list(
+            "unread",
+            workflow_id,
+            page_size=page_size,
+            conditions=conditions,
+            prefetch=prefetch,
+        )
+
+    def iter_rejected(
+        self,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历待办列表->被退回
+        """
+        return self.iter_list(
+            "rejected",
+            workflow_id,
+            page_size=page_size,
+            conditions=conditions,
+            prefetch=prefetch,
+        )
+
+    def iter_handled(
+        self,
+        workflow_id,
+        page_size=100,
+        conditions=None,
+        prefetch=True,  # noqa: FBT002
+    ):
+        """
+        逐条遍历已办流程
+        """
+        return self.iter_list(
+            "handled",
+            workflow_id,
+            page_size=page_size,
+            conditions=conditions,
+            prefetch=prefetch,
+        )
+
+    def get_dashboard(  # noqa: PLR0913
+        self,
+        workflow_id,
+        page=1,
+        page_size=10,
+        conditions=None,
+        list_types=None,
+        timeout=None,
+        source=None,
+    ):
+        """
+        同时请求多个列表(待办、待处理、待阅、退回、已办)的总数和分页数据
+        单个列表请求失败或超时不影响其他列表
+        :param workflow_id:
+        :param page:
+        :param page_size:
+        :param conditions: 查询条件
+        :param list_types: 需要请求的列表类型, 默认为PAGE_DATA_APIS中全部类型
+        :param timeout: 最长等待时间(秒), 默认为 DASHBOARD_TIMEOUT, 超时的列表记为错误
+        :param source: 数据来源, 同get_list, 数据库支持的列表依次查询数据库且不限制时间
+        :return: {list_type: {"data": [], "page": 1, "total_count": 0, "error": None}}
+        """
+        list_types = list_types or list(self.PAGE_DATA_APIS)
+        result = self._db_dashboard(
+            [i for i in list_types if self._use_db_task_list(i, conditions, source)],
+            workflow_id,
+            page,
+            page_size,
+            conditions,
+        )
+        api_list_types = [i for i in list_types if i not in result]
+        if timeout is None:
+            timeout = api_settings.DASHBOARD_TIMEOUT
+        deadline = time.monotonic() + timeout if timeout else None
+        search_conditions = self._search_conditions(workflow_id, conditions)
+        post_data = {
+            "pageNo": str(page),
+            "pageSize": str(page_size),
+            **search_conditions,
+        }
+
+        futures = {}
+        for list_type in api_list_types:
+            count_api_path, data_api_path = self.PAGE_DATA_APIS[list_type]
+            futures[list_type] = (
+                submit(self._page_count, count_api_path, search_conditions),
+                submit(self._post_oa, data_api_path, post_data=post_data),
+            )
+
+        for list_type, (count_future, data_future) in futures.items():
+            bucket = {"data": [], "page": page, "total_count": 0, "error": None}
+            try:
+                total_count = count_future.result(timeout=self._remaining(deadline))
+                data = data_future.result(timeout=self._remaining(deadline))
+                bucket["total_count"] = total_count
+                if (page - 1) * page_size < total_count:
+                    bucket["data"] = data
+            except FutureTimeoutError:
+                count_future.cancel()
+                data_future.cancel()
+                bucket["error"] = "OA服务响应超时"
+            except Exception as e:
+                bucket["error"] = str(e)
+            result[list_type] = bucket
+        return {list_type: result[list_type] for list_type in list_types}
+
+    def _db_dashboard(  # noqa: PLR0913
+        self, list_types, workflow_id, page, page_size, conditions
+    ):
+        result = {}
+        for list_type in list_types:
+            bucket = {"data": [], "page": page, "total_count": 0, "error": None}
+            try:
+                bucket["data"], _, bucket["total_count"] = db_task_list_provider.page(
+                    list_type,
+                    self.oa_user_id,
+                    workflow_id,
+                    page=page,
+                    page_size=page_size,
+                    conditions=conditions,
+                )
+            except Exception as e:
+                bucket["error"] = str(e)
+            result[list_type] = bucket
+        return result
+
+    @staticmethod
+    def _remaining(deadline):
+        if deadline is None:
+            return None
+        return max(deadline - time.monotonic(), 0)
 
     def get_create_list(self):
         """
@@ -608,6 +1451,10 @@ class OaWorkFlow(OaApi):
             )
         }
         res: list = self._post_oa(api_path, post_data=post_data)
+        return self._group_create_list(res)
+
+    @staticmethod
+    def _group_create_list(res: list):
         # 示例数据 api_example_data.CREATE_LIST_DEMO
         result = []
         res.sort(key=lambda x: x["workflowTypeName"])
@@ -623,6 +1470,7 @@ class OaWorkFlow(OaApi):
         # 示例数据 api_example_data.SUBMIT_DATA_DEMO
         api_path = "/api/workflow/paService/doCreateRequest"
         res: dict = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
         return res["data"]["requestid"]
 
     def submit_new(  # noqa: PLR0913
@@ -647,6 +1495,91 @@ class OaWorkFlow(OaApi):
         :param submit_type: 新建流程是否提交到第二节点["0"：不流转 "1"：流转(默认)]
         :param del_when_failed: 新建流程失败是否删除流程["0"：不删除 "1"：删除(默认)]
         """
+        post_data = self._submit_new_data(
+            workflow_id,
+            main_data,
+            detail_data=detail_data,
+            title=title,
+            remark=remark,
+            request_level=request_level,
+            submit_type=submit_type,
+            del_when_failed=del_when_failed,
+        )
+
+        # 示例数据 api_example_data.SUBMIT_DATA_DEMO
+        api_path = "/api/workflow/paService/doCreateRequest"
+        res: dict = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
+        return res["data"]["requestid"]
+
+    def batch_submit_new(  # noqa: PLR0913
+        self,
+        submissions,
+        workflow_id=None,
+        concurrency=None,
+        rate_limit=None,
+        start=0,
+        callback=None,
+    ):
+        """
+        批量创建流程
+        请求数据在当前线程中逐条生成, 同时由线程池提交到OA;
+        正在提交的数量达到concurrency时暂停读取submissions
+        :param submissions: submit_new的参数dict, 可以是生成器
+            如: [{"main_data": [], "detail_data": [], "title": ""}]
+        :param workflow_id: 默认流程ID, submissions中未指定workflow_id时使用
+        :param concurrency: 同时提交的数量, 默认为 BATCH_CONCURRENCY
+        :param rate_limit: 每秒最多请求数, 默认为 BATCH_RATE_LIMIT
+        :param start: 从第几条开始提交(跳过已提交的数据), 用于中断后继续
+        :param callback: 每条提交完成后调用callback(index, result), 可用于记录进度
+        :return: 与submissions顺序一致的结果, request_id为新建的流程请求ID
+            [{"request_id": "", "success": True, "result": "", "error": None}]
+        """
+
+        def create(post_data=None, error=None):
+            if error is not None:
+                raise error
+            return self.submit(post_data)
+
+        def payloads():
+            for submission in islice(submissions, start, None):
+                kwargs = dict(submission)
+                if workflow_id is not None:
+                    kwargs.setdefault("workflow_id", workflow_id)
+                try:
+                    yield {"post_data": self._submit_new_data(**kwargs)}
+                except Exception as e:
+                    # 数据校验失败的记为该条失败, 不中断批量提交
+                    yield {"error": e}
+
+        def on_result(index, result):
+            result["request_id"] = result["result"]
+            if callback:
+                callback(index, result)
+
+        return self._run_batch(
+            create,
+            payloads(),
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            start=start,
+            callback=on_result,
+        )
+
+    @staticmethod
+    def _submit_new_data(  # noqa: PLR0913
+        workflow_id,
+        main_data: list,
+        detail_data: list = None,  # noqa: RUF013 PEP 484
+        title="",
+        remark="",
+        request_level="",
+        submit_type=choices.SubmitTypes.SUBMIT,
+        del_when_failed=choices.SubmitFailedDoes.DELETE,
+    ):
+        """
+        创建流程的请求数据, 参数同submit_new
+        """
         if not workflow_id:
             raise APIException("需要提交流程的流程ID")
         if not main_data:
@@ -678,11 +1611,7 @@ class OaWorkFlow(OaApi):
             post_data["requestName"] = title
         if request_level:
             post_data["requestLevel"] = request_level
-
-        # 示例数据 api_example_data.SUBMIT_DATA_DEMO
-        api_path = "/api/workflow/paService/doCreateRequest"
-        res: dict = self._post_oa(api_path, post_data=post_data)
-        return res["data"]["requestid"]
+        return post_data
 
     def review(
         self,
@@ -718,7 +1647,9 @@ class OaWorkFlow(OaApi):
                 "otherParams": {},
             },
         }
-        return self._post_oa(api_path, post_data=post_data)
+        res = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
+        return res
 
     def reject(
         self,
@@ -735,23 +1666,9 @@ class OaWorkFlow(OaApi):
         :param remark: 退回备注
         """
         api_path = "/api/workflow/paService/rejectRequest"
-
-        # 默认按节点出口退回
-        other_params = {}
-        # 指定节点退回
-        if node_id:
-            other_params["RejectToType"] = 0
-            other_params["RejectToNodeid"] = int(node_id)
-
-        # 重新提交后处理方式
-        if handle_submit is not None:
-            other_params["isSubmitDirect"] = handle_submit
-
-        post_data = {
-            "otherParams": json.dumps(other_params),
-            "remark": remark,
-            "requestId": request_id,
-        }
+        post_data = self._reject_data(
+            request_id, node_id=node_id, handle_submit=handle_submit, remark=remark
+        )
 
         # ERROR DEEMO
         _ERROR = {  # noqa: N806
@@ -773,7 +1690,69 @@ class OaWorkFlow(OaApi):
                 "otherParams": {"doAutoApprove": "0"},
             },
         }
-        return self._post_oa(api_path, post_data=post_data)
+        res = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
+        return res
+
+    def batch_review(self, items: list, concurrency=None, rate_limit=None):
+        """
+        批量提交/审核
+        :param items: 流程请求ID, 或review的参数dict
+            如: ["1001", {"request_id": "1002", "remark": "同意", "extras": {}}]
+        :param concurrency: 同时处理的流程数, 默认为 BATCH_CONCURRENCY
+        :param rate_limit: 每秒最多请求数, 默认为 BATCH_RATE_LIMIT
+        :return: 与items顺序一致的处理结果
+            [{"request_id": "1001", "success": True, "result": {}, "error": None}]
+        """
+        return self._run_batch(
+            self.review,
+            self._batch_kwargs(items),
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+        )
+
+    def batch_reject(self, items: list, concurrency=None, rate_limit=None):
+        """
+        批量退回
+        :param items: 流程请求ID, 或reject的参数dict
+            如: ["1001", {"request_id": "1002", "node_id": "", "remark": "退回"}]
+        :param concurrency: 同时处理的流程数, 默认为 BATCH_CONCURRENCY
+        :param rate_limit: 每秒最多请求数, 默认为 BATCH_RATE_LIMIT
+        :return: 同batch_review
+        """
+        return self._run_batch(
+            self.reject,
+            self._batch_kwargs(items),
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+        )
+
+    @staticmethod
+    def _reject_data(
+        request_id: str,
+        node_id: str = "",
+        handle_submit: int = None,  # noqa: RUF013 PEP 484
+        remark="",
+    ):
+        """
+        退回流程的请求数据, 参数同reject
+        """
+        # 默认按节点出口退回
+        other_params = {}
+        # 指定节点退回
+        if node_id:
+            other_params["RejectToType"] = 0
+            other_params["RejectToNodeid"] = int(node_id)
+
+        # 重新提交后处理方式
+        if handle_submit is not None:
+            other_params["isSubmitDirect"] = handle_submit
+
+        return {
+            "otherParams": json.dumps(other_params),
+            "remark": remark,
+            "requestId": request_id,
+        }
 
     def get_chart_url(self, request_id: str, staff_code):
         """
@@ -782,10 +1761,16 @@ class OaWorkFlow(OaApi):
         :param staff_code: 用户工号或者为oa的登入名, A0009527
         :return:
         """
+        # 获取单点Token
+        sso_token = self.get_sso_token(staff_code)
+        return self._request_chart_url(request_id, sso_token)
+
+    def _request_chart_url(self, request_id, sso_token):
         api_path = "/api/workflow/paService/getRequestFlowChart"
         params = {"requestid": request_id}
         # params = None
-        resp = self._get_oa(api_path, params=params)
+        # 结果中会拼接调用方的单点Token, 不与其他调用方合并请求
+        resp = self._get_oa(api_path, params=params, coalesce=False)
         _ = {
             "code": "SUCCESS",
             "data": {
@@ -798,41 +1783,70 @@ class OaWorkFlow(OaApi):
             },
             "errMsg": {},
         }
-        # 获取单点Token
+        return self._with_sso_token(resp, sso_token)
+
+    @staticmethod
+    def _with_sso_token(resp, sso_token):
+        """
+        流程图链接拼接单点Token, 返回新的结果, 不修改resp
+        """
+        chart_url = resp["data"]["chartUrl"] + f"&ssoToken={sso_token}"
+        return {**resp, "data": {**resp["data"], "chartUrl": chart_url}}
+
+    def get_chart_urls(self, request_ids: list, staff_code, concurrency=None):
+        """
+        批量获取流程图数据, 所有流程共用一个单点Token
+        :param request_ids: OA流程实例ID
+        :param staff_code: 用户工号或者为oa的登入名, A0009527
+        :param concurrency: 同时请求数量, 默认为 BATCH_CONCURRENCY
+        :return: 与request_ids顺序一致的结果, result同get_chart_url
+            [{"request_id": "", "success": True, "result": {}, "error": None}]
+        """
         sso_token = self.get_sso_token(staff_code)
-        resp["data"]["chartUrl"] = resp["data"]["chartUrl"] + f"&ssoToken={sso_token}"
-        return resp
+        return self._run_batch(
+            self._request_chart_url,
+            [{"request_id": i, "sso_token": sso_token} for i in request_ids],
+            concurrency=concurrency,
+        )
 
-    def get_status(self, request_id: str):
+    def get_status(self, request_id: str, coalesce=None):
         """
         获取流程状态
         :param request_id:
+        :param coalesce: 是否合并相同的并发请求, 默认为 REQUESTS_COALESCE_GET
         :return:
         """
         api_path = "/api/workflow/paService/getRequestStatus"
         params = {"requestId": request_id}
         # 示例数据 api_example_data.WF_STATUS_DATA_DEMO
-        return self._get_oa(api_path, params=params)
+        return self._get_oa(api_path, params=params, coalesce=coalesce)
 
-    def get_operator_info(self, request_id):
+    def get_operator_info(self, request_id, coalesce=None):
         """
         OA流程明细页 流程状态 数据
         :param request_id:
+        :param coalesce: 是否合并相同的并发请求, 默认为 REQUESTS_COALESCE_GET
         :return:
         """
         api_path = "/api/workflow/paService/getRequestOperatorInfo"
-        return self._get_oa(api_path, params={"requestId": request_id})
+        params = {"requestId": request_id}
+        return self._get_oa(api_path, params=params, coalesce=coalesce)
 
-    def get_resources(self, request_id):
+    def get_resources(self, request_id, coalesce=None):
         """
         OA流程明细页 相关资源 数据
         相关流程/相关文档/相关资源
         :param request_id:
+        :param coalesce: 是否合并相同的并发请求, 默认为 REQUESTS_COALESCE_GET
         :return:
         """
         api_path = "/api/workflow/paService/getRequestResources"
         params = {"requestId": request_id}
-        result = self._get_oa(api_path, params=params)
+        result = self._get_oa(api_path, params=params, coalesce=coalesce)
+        return self._handle_resources(result)
+
+    @staticmethod
+    def _handle_resources(result):
         # 示例数据 api_example_data.WF_RESOURCE_DATA_DEMO
         # 资源类型 type
         # 1: 相关流程
@@ -846,9 +1860,10 @@ class OaWorkFlow(OaApi):
             res["typeName"] = type_map[res["type"]]
         return result
 
-    def get_remark(self, request_id, page=1, page_size=10):
+    def get_remark(self, request_id, page=1, page_size=10, coalesce=None):
         """
         流程意见
+        :param coalesce: 是否合并相同的并发请求, 默认为 REQUESTS_COALESCE_GET
         :return:
         """
         api_path = "/api/workflow/paService/getRequestLog"
@@ -857,17 +1872,19 @@ class OaWorkFlow(OaApi):
             "otherParams": json.dumps({"pageSize": page_size, "pageNumber": page}),
         }
         # 示例数据 api_example_data.WF_REMARK_DATA_DEMO
-        return self._get_oa(api_path, params=post_data)
+        return self._get_oa(api_path, params=post_data, coalesce=coalesce)
 
-    def get_info(self, request_id):
+    def get_info(self, request_id, coalesce=None):
         """
         流程信息
         :param request_id:
+        :param coalesce: 是否合并相同的并发请求, 默认为 REQUESTS_COALESCE_GET
         :return:
         """
         api_path = "/api/workflow/paService/getWorkflowRequest"
+        params = {"requestId": request_id}
         # 示例数据 api_example_data.WF_INFO_DATA_DEMO
-        return self._get_oa(api_path, params={"requestId": request_id})
+        return self._get_oa(api_path, params=params, coalesce=coalesce)
 
     def transmit(  # noqa: PLR0913
         self,
@@ -887,20 +1904,38 @@ class OaWorkFlow(OaApi):
         :return:
         """
         api_path = "/api/workflow/paService/forwardRequest"
+        post_data = self._transmit_data(
+            request_id, trans_type, user_id, remark=remark, remind_type=remind_type
+        )
+        res = self._post_oa(api_path, post_data=post_data)
+        # 转发/转办的接收人待办也会变化
+        self.invalidate_page_count(self.oa_user_id, *str(user_id).split(","))
+        return res
+
+    @staticmethod
+    def _transmit_data(
+        request_id,
+        trans_type,
+        user_id: str,
+        remark: str = "",
+        remind_type: str = "",
+    ):
+        """
+        转发、意见征询、转办的请求数据, 参数同transmit
+        """
         if trans_type == 3:  # noqa: PLR2004
             if len(user_id.split(",")) > 1:
                 raise APIException(detail="转办只能转给一个用户")
         other_params = {}
         if remind_type:
             other_params["remindTypes"] = remind_type
-        post_data = {
+        return {
             "forwardFlag": trans_type,
             "forwardResourceIds": user_id,
             "otherParams": other_params,
             "remark": remark,
             "requestId": request_id,
         }
-        return self._post_oa(api_path, post_data=post_data)
 
     def recover(self, request_id):
         """
@@ -911,6 +1946,7 @@ class OaWorkFlow(OaApi):
         api_path = "/api/workflow/paService/doForceDrawBack"
         post_data = {"requestId": request_id}
         resp = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
         _ = {"code": "SUCCESS", "errMsg": {}}
         return resp
 
@@ -928,7 +1964,9 @@ class OaWorkFlow(OaApi):
             "remark": remark,
             "requestId": request_id,
         }
-        return self._post_oa(api_path, post_data=post_data)
+        res = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
+        return res
 
     def delete(self, request_id):
         """
@@ -942,26 +1980,115 @@ class OaWorkFlow(OaApi):
         """
         api_path = "/api/workflow/paService/deleteRequest"
         post_data = {"requestId": request_id}
-        return self._post_oa(api_path, post_data=post_data)
+        res = self._post_oa(api_path, post_data=post_data)
+        self.invalidate_page_count(self.oa_user_id)
+        return res
 
     def get_operate_buttons(self, request_id):
         """
         获取用户在当前流程的操作按钮
+        BUTTONS_CACHE_TIMEOUT 不为0时按(用户, 流程, 当前节点)缓存,
+        流程最后操作时间变化后缓存失效
         :return:
         """
+        return self._cached_operate_buttons(
+            request_id, self.get_request_version(request_id)
+        )
+
+    def _cached_operate_buttons(self, request_id, version):
+        cache_key = self._buttons_cache_key(request_id, version)
+        if cache_key:
+            right_menu_data = cache.get(cache_key)
+            if right_menu_data is not None:
+                return right_menu_data
+
         # 1.获取OA loadForm 参数
         load_form_api = "/api/workflow/reqform/loadForm"
+        load_form_body = self._load_form_body(request_id)
+        load_form_data = self._post_oa(load_form_api, post_data=load_form_body)
+
+        # 2.获取OA流程的菜单按钮
+        right_menu_api = "/api/workflow/reqform/rightMenu"
+        right_menu_body = self._right_menu_body(request_id, load_form_data)
+        right_menu_data = self._post_oa(right_menu_api, post_data=right_menu_body)
+        if right_menu_data.get("verifyFailMsg"):
+            raise APIException(right_menu_data["verifyFailMsg"])
+
+        if cache_key:
+            cache.set(
+                cache_key, right_menu_data, timeout=api_settings.BUTTONS_CACHE_TIMEOUT
+            )
+        # 示例数据 api_example_data.WF_BUTTONS
+        return right_menu_data
+
+    @staticmethod
+    def get_request_version(request_id):
+        """
+        流程当前节点及最后操作时间, 用于判断流程是否有新的操作
+        BUTTONS_CACHE_TIMEOUT 为0时不查询, 返回None
+        :param request_id: OA流程请求ID
+        """
+        if not api_settings.BUTTONS_CACHE_TIMEOUT:
+            return None
+        row = (
+            WorkflowRequestBase.objects.filter(REQUESTID=request_id)
+            .values_list("CURRENTNODEID_id", "LASTOPERATEDATE", "LASTOPERATETIME")
+            .first()
+        )
+        if not row:
+            return None
+        return ":".join(str(i) for i in row)
+
+    def _buttons_cache_key(self, request_id, version):
+        if not version or not api_settings.BUTTONS_CACHE_TIMEOUT:
+            return None
+        return self.CACHE_BUTTONS_KEY.format(
+            oa_user_id=self.oa_user_id, request_id=request_id, version=version
+        )
+
+    def get_detail(self, request_id, remark_page=1, remark_page_size=10):
+        """
+        流程明细页数据, 同时请求流程信息、状态、意见、相关资源以及操作按钮
+        单项请求失败不影响其他数据, 失败原因记录在errors中
+        :param request_id: OA流程请求ID
+        :param remark_page: 流程意见页码
+        :param remark_page_size: 流程意见每页数量
+        :return: {"info": {}, "status": {}, "remark": {}, "resources": {},
+                  "buttons": {}, "errors": {"buttons": "..."}}
+        """
+        # 数据库查询在当前线程执行
+        version = self.get_request_version(request_id)
+        futures = {
+            "info": submit(self.get_info, request_id),
+            "status": submit(self.get_status, request_id),
+            "remark": submit(
+                self.get_remark, request_id, remark_page, remark_page_size
+            ),
+            "resources": submit(self.get_resources, request_id),
+            "buttons": submit(self._cached_operate_buttons, request_id, version),
+        }
+        result = {"errors": {}}
+        for name, future in futures.items():
+            error = future.exception()
+            result[name] = None if error else future.result()
+            if error:
+                result["errors"][name] = str(error)
+        return result
+
+    @staticmethod
+    def _load_form_body(request_id):
         timestamp = f"{int(time.time() * 1000)}"
-        load_form_body = {
+        return {
             "preloadkey": timestamp,
             "requestid": request_id,
             "timestamp": timestamp,
         }
-        load_form_data = self._post_oa(load_form_api, post_data=load_form_body)
+
+    @staticmethod
+    def _right_menu_body(request_id, load_form_data: dict):
         if not load_form_data.get("params", {}).get("verifyRight", False):
             raise APIException("对不起，您没有该流程的相关权限！")
 
-        # 2.获取OA流程的菜单按钮
         secret_data = {
             "signatureSecretKey": load_form_data["params"]["signatureSecretKey"],
             "signatureAttributesStr": load_form_data["params"][
@@ -969,14 +2096,7 @@ class OaWorkFlow(OaApi):
             ],
             "requestType": load_form_data["params"]["requestType"],
         }
-        right_menu_api = "/api/workflow/reqform/rightMenu"
-        right_menu_body = {
+        return {
             "requestid": request_id,
             **secret_data,
         }
-        right_menu_data = self._post_oa(right_menu_api, post_data=right_menu_body)
-        if right_menu_data.get("verifyFailMsg"):
-            raise APIException(right_menu_data["verifyFailMsg"])
-
-        # 示例数据 api_example_data.WF_BUTTONS
-        return right_menu_data
@@ -2,11 +2,19 @@
 #
 # from rest_framework.decorators import action
 # from rest_framework.response import Response
+from rest_framework.generics import GenericAPIView
 from rest_framework.views import APIView
 
 from .mixin import OaWFApiViewMixin
+from .pagination import OaKeysetPagination
 
 
 class OaWorkFlowView(OaWFApiViewMixin, APIView):
     # TODO 通用流程接口
     ...
+
+
+class OaKeysetListView(OaWFApiViewMixin, GenericAPIView):
+    # 直接查询OA数据库的待办/已办列表, 使用键集分页
+    # 已办列表需设置 keyset_fields = WorkflowQuerySet.HANDLED_KEYSET_FIELDS
+    pagination_class = OaKeysetPagination
@@ -0,0 +1,52 @@
+"""pytest configuration: minimal Django settings for the package tests."""
+
+import django
+import pytest
+from Crypto.PublicKey import RSA
+from django.conf import settings
+
+
+def _app_spk():
+    public_key = RSA.generate(2048).publickey().export_key().decode()
+    return "".join(public_key.splitlines()[1:-1])
+
+
+def pytest_configure():
+    settings.configure(
+        SECRET_KEY="tests",  # noqa: S106
+        USE_TZ=True,
+        ALLOWED_HOSTS=["testserver"],
+        INSTALLED_APPS=[
+            "django.contrib.contenttypes",
+            "django.contrib.auth",
+            "rest_framework",
+            "drf_oa_workflow",
+        ],
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+            "oa": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+        },
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        DRF_OA_WORKFLOW={
+            "OA_HOST": "http://oa.test",
+            "APP_ID": "tests",
+            "APP_RAW_SECRET": "tests",
+            "APP_SPK": _app_spk(),
+        },
+    )
+    django.setup()
+
+
+@pytest.fixture()
+def fake_token(monkeypatch):
+    """Serve OA API tokens without calling OA."""
+    from django.core.cache import cache
+
+    from drf_oa_workflow.utils import OaApi
+
+    cache.clear()
+    monkeypatch.setattr(OaApi, "_apply_token", lambda self, expr=None: "TOKEN")
+    yield "TOKEN"
+    cache.clear()
@@ -0,0 +1,145 @@
+"""Tests for `drf_oa_workflow.async_utils` and the async token manager."""
+
+import asyncio
+import inspect
+import json
+import threading
+
+import pytest
+from django.core.cache import cache
+
+from drf_oa_workflow.async_utils import AsyncOaWorkFlow
+from drf_oa_workflow.async_utils import ThreadAsyncBackend
+from drf_oa_workflow.tokens import OaTokenManager
+from drf_oa_workflow.tokens import token_manager
+from drf_oa_workflow.utils import OaWorkFlow
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "get_list",
+        "get_todo_list",
+        "get_doing_list",
+        "get_unread_list",
+        "get_rejected_list",
+        "get_handled_list",
+        "submit_new",
+        "reject",
+        "transmit",
+    ],
+)
+def test_async_signatures_match_sync(name):
+    sync_sig = inspect.signature(getattr(OaWorkFlow, name))
+    async_sig = inspect.signature(getattr(AsyncOaWorkFlow, name))
+    assert async_sig == sync_sig
+
+
+def test_async_reject_accepts_positional_arguments(monkeypatch):
+    posted = []
+
+    async def fake_post(self, api, post_data=None, **kwargs):
+        posted.append(post_data)
+        return {"code": "SUCCESS"}
+
+    monkeypatch.setattr(AsyncOaWorkFlow, "_post_oa", fake_post)
+    workflow = AsyncOaWorkFlow()
+    workflow.oa_user_id = "1"
+
+    asyncio.run(workflow.reject("100", "200", 1, "no"))
+    assert posted[0]["requestId"] == "100"
+    assert posted[0]["remark"] == "no"
+    other_params = json.loads(posted[0]["otherParams"])
+    assert other_params["RejectToNodeid"] == int("200")
+    assert other_params["isSubmitDirect"] == 1
+
+
+def test_async_token_manager_refreshes_once_and_reuses_cache():
+    manager = OaTokenManager()
+    calls = []
+
+    async def afetch(expire):
+        calls.append(expire)
+        await asyncio.sleep(0)
+        return "TOKEN-1"
+
+    async def main():
+        first = await manager.aget(afetch, expire=3600)
+        # a second manager reads the token saved in the cache
+        second = await OaTokenManager().aget(afetch, expire=3600)
+        return first, second
+
+    assert asyncio.run(main()) == ("TOKEN-1", "TOKEN-1")
+    assert calls == [3600]
+
+
+def test_async_token_manager_replaces_stale_token():
+    manager = OaTokenManager()
+    tokens = iter(["TOKEN-1", "TOKEN-2"])
+
+    async def afetch(expire):
+        return next(tokens)
+
+    async def main():
+        first = await manager.aget(afetch, expire=3600)
+        second = await manager.arefresh(afetch, expire=3600, stale_token=first)
+        return first, second
+
+    assert asyncio.run(main()) == ("TOKEN-1", "TOKEN-2")
+    assert manager.cached_token() == "TOKEN-2"
+
+
+def test_thread_backend_gets_the_session_in_the_worker_thread(monkeypatch):
+    class FakeSession:
+        def __init__(self):
+            self.thread = threading.get_ident()
+
+        def get(self, url, **kwargs):
+            return self.thread, threading.get_ident()
+
+    monkeypatch.setattr("drf_oa_workflow.async_utils.get_session", FakeSession)
+
+    async def main():
+        used = await asyncio.gather(
+            *(ThreadAsyncBackend().request("get", "http://oa.test") for _ in range(4))
+        )
+        return threading.get_ident(), used
+
+    loop_thread, used = asyncio.run(main())
+    for session_thread, request_thread in used:
+        # the session belongs to the executor thread that sent the request
+        assert session_thread == request_thread
+        assert session_thread != loop_thread
+
+
+def test_async_client_does_not_read_the_cache_on_construction(monkeypatch):
+    def cached_token():
+        raise AssertionError("blocking cache read")
+
+    monkeypatch.setattr(token_manager, "cached_token", cached_token)
+    assert AsyncOaWorkFlow().token is None
+
+
+def test_async_get_token_replaces_the_cached_token():
+    tokens = iter(["TOKEN-1", "TOKEN-2"])
+
+    async def fake_apply_token(self, expr):
+        return next(tokens)
+
+    async def main():
+        workflow = AsyncOaWorkFlow()
+        workflow._apply_token = fake_apply_token.__get__(workflow)
+        await token_manager.arefresh(workflow._apply_token, expire=3600)
+        # a new client has no token yet, get_token still forces a refresh
+        other = AsyncOaWorkFlow()
+        other._apply_token = workflow._apply_token
+        return await other.get_token(3600)
+
+    assert asyncio.run(main()) == "TOKEN-2"
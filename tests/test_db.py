@@ -0,0 +1,301 @@
+"""Tests for `drf_oa_workflow.db`."""
+
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Now
+
+from drf_oa_workflow.db.function import ConvertOADbDatetime
+from drf_oa_workflow.db.function import to_oa_db_datetime
+from drf_oa_workflow.db.manager import CurrentOperatorManager
+from drf_oa_workflow.models import LocalWorkflowBase
+from drf_oa_workflow.models import LocalWorkflowFlowNode
+from drf_oa_workflow.models import LocalWorkflowNodeBase
+from drf_oa_workflow.models import LocalWorkflowNodeLink
+from drf_oa_workflow.models import LocalWorkflowType
+from drf_oa_workflow.models import WorkflowCurrentOperator
+from drf_oa_workflow.models import WorkflowRequestBase
+
+UTC = datetime.timezone.utc
+
+
+class _RecordingQuerySet:
+    def __init__(self, rows):
+        self.rows = rows
+        self.conditions = []
+
+    def filter(self, condition):
+        self.conditions.append(condition)
+        return self
+
+    def values_list(self, *fields):
+        return self
+
+    def order_by(self, *fields):
+        return self
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def _in_lists(condition):
+    return [child[1] for child in condition.children]
+
+
+def test_un_operators_map_splits_in_lists(monkeypatch):
+    queryset = _RecordingQuerySet([(1, 10, "A"), (1, 11, "B"), (3, 12, "C")])
+    monkeypatch.setattr(CurrentOperatorManager, "IN_LIST_MAX_SIZE", 2)
+    monkeypatch.setattr(CurrentOperatorManager, "wf_un_operators", lambda _: queryset)
+
+    result = WorkflowCurrentOperator.objects.wf_un_operators_map(["1", 2, 3, 1, 4, 5])
+
+    # one query, duplicate ids dropped, ids split into OR-ed IN lists of 2
+    (condition,) = queryset.conditions
+    assert condition.connector == "OR"
+    assert _in_lists(condition) == [[1, 2], [3, 4], [5]]
+    assert result == {1: [(10, "A"), (11, "B")], 2: [], 3: [(12, "C")], 4: [], 5: []}
+
+
+def test_un_operators_map_single_in_list_and_empty_input(monkeypatch):
+    queryset = _RecordingQuerySet([])
+    monkeypatch.setattr(CurrentOperatorManager, "wf_un_operators", lambda _: queryset)
+
+    assert WorkflowCurrentOperator.objects.wf_un_operators_map([]) == {}
+    assert queryset.conditions == []
+
+    WorkflowCurrentOperator.objects.wf_un_operators_map(range(1000))
+    (condition,) = queryset.conditions
+    assert len(_in_lists(condition)) == 1
+
+
+def test_attach_un_operators_sets_attribute(monkeypatch):
+    monkeypatch.setattr(
+        CurrentOperatorManager,
+        "wf_un_operators",
+        lambda _: _RecordingQuerySet([(2, 10, "A")]),
+    )
+    requests = [SimpleNamespace(pk=1), SimpleNamespace(pk=2)]
+
+    result = WorkflowCurrentOperator.objects.attach_un_operators(
+        iter(requests), to_attr="pending"
+    )
+
+    assert result == requests
+    assert [i.pending for i in requests] == [[], [(10, "A")]]
+
+
+def test_to_oa_db_datetime_converts_to_utc_plus_8():
+    utc_plus_2 = datetime.timezone(datetime.timedelta(hours=2))
+    assert to_oa_db_datetime(datetime.datetime(2024, 1, 1, 20, tzinfo=UTC)) == (
+        "2024-01-02",
+        "04:00:00",
+    )
+    assert to_oa_db_datetime(
+        datetime.datetime(2024, 1, 1, 1, 30, tzinfo=utc_plus_2)
+    ) == ("2024-01-01", "07:30:00")
+    # naive datetimes and dates are taken as UTC
+    naive = datetime.datetime(2024, 1, 1, 8)  # noqa: DTZ001
+    assert to_oa_db_datetime(naive) == ("2024-01-01", "16:00:00")
+    assert to_oa_db_datetime(datetime.date(2024, 1, 1)) == ("2024-01-01", "08:00:00")
+    assert to_oa_db_datetime("2024-01-01T00:00:00Z") == ("2024-01-01", "08:00:00")
+    with pytest.raises(ValueError, match="无效的时间"):
+        to_oa_db_datetime("yesterday")
+
+
+def _created_sql(**lookups):
+    queryset = (
+        WorkflowRequestBase.objects.annotate(
+            created=ConvertOADbDatetime("CREATEDATE", "CREATETIME"),
+            operated=ConvertOADbDatetime("LASTOPERATEDATE", "LASTOPERATETIME"),
+        )
+        .filter(**lookups)
+        .values("REQUESTID")
+    )
+    sql, params = queryset.query.sql_with_params()
+    return sql.split(" WHERE ", 1)[1], params
+
+
+def test_datetime_lookups_compare_raw_date_and_time_columns():
+    value = datetime.datetime(2024, 1, 1, tzinfo=UTC)
+
+    sql, params = _created_sql(created__gte=value)
+    assert sql == (
+        '("ECOLOGY"."WORKFLOW_REQUESTBASE"."CREATEDATE" >= %s AND '
+        '("ECOLOGY"."WORKFLOW_REQUESTBASE"."CREATEDATE" > %s OR '
+        '"ECOLOGY"."WORKFLOW_REQUESTBASE"."CREATETIME" >= %s))'
+    )
+    assert params == ("2024-01-01", "2024-01-01", "08:00:00")
+
+    sql, params = _created_sql(created__lt=value)
+    assert 'CREATEDATE" <= %s' in sql
+    assert 'CREATETIME" < %s' in sql
+
+    sql, params = _created_sql(created=value)
+    assert sql == (
+        '("ECOLOGY"."WORKFLOW_REQUESTBASE"."CREATEDATE" = %s AND '
+        '"ECOLOGY"."WORKFLOW_REQUESTBASE"."CREATETIME" = %s)'
+    )
+    assert params == ("2024-01-01", "08:00:00")
+
+    sql, params = _created_sql(
+        created__range=(value, value + datetime.timedelta(days=1))
+    )
+    assert params == (
+        *("2024-01-01", "2024-01-01", "08:00:00"),
+        *("2024-01-02", "2024-01-02", "08:00:00"),
+    )
+
+    sql, params = _created_sql(created__isnull=True)
+    assert "IS NULL OR" in sql
+    assert params == ()
+
+
+def test_datetime_lookups_with_expressions_compare_converted_values():
+    # the converted value is compared, the raw columns are not split
+    sql, params = _created_sql(created__gte=Now())
+    assert sql.startswith("CASE WHEN")
+    assert " END >= " in sql
+    assert params == ()
+
+    sql, params = _created_sql(operated__gt=F("created"))
+    lhs, rhs = sql.split(" > ")
+    assert "LASTOPERATEDATE" in lhs
+    assert "CREATEDATE" in rhs
+    assert "TO_DATE" in rhs
+
+    sql, params = _created_sql(created=Now())
+    assert " END = " in sql
+
+    value = datetime.datetime(2024, 1, 1, tzinfo=UTC)
+    sql, params = _created_sql(created__range=(value, Now()))
+    assert " END BETWEEN %s AND " in sql
+    assert len(params) == 1
+
+
+SRM_MODELS = (
+    LocalWorkflowType,
+    LocalWorkflowBase,
+    LocalWorkflowNodeBase,
+    LocalWorkflowFlowNode,
+    LocalWorkflowNodeLink,
+)
+
+
+@pytest.fixture()
+def _srm_rows():
+    with connection.schema_editor() as editor:
+        for model in SRM_MODELS:
+            editor.create_model(model)
+    LocalWorkflowType.objects.create(ID=1, TYPENAME="type", UUID="u")
+    LocalWorkflowBase.objects.bulk_create(
+        [
+            LocalWorkflowBase(
+                ID=10, WORKFLOWNAME="v1", WORKFLOWTYPE_id=1, FORMID=-1, ISVALID=1
+            ),
+            LocalWorkflowBase(
+                ID=11,
+                WORKFLOWNAME="v2",
+                WORKFLOWTYPE_id=None,
+                FORMID=-1,
+                ISVALID=3,
+                VERSION=2,
+                TEMPLATEID=10,
+                ACTIVEVERSIONID=10,
+            ),
+        ]
+    )
+    LocalWorkflowNodeBase.objects.bulk_create(
+        LocalWorkflowNodeBase(
+            ID=node_id,
+            NODENAME=f"node {node_id}",
+            ISSTART="0",
+            ISREJECT="0",
+            ISREOPEN="0",
+            ISEND="0",
+        )
+        for node_id in (100, 101, 102)
+    )
+    LocalWorkflowFlowNode.objects.bulk_create(
+        [
+            LocalWorkflowFlowNode(WORKFLOWID_id=10, NODEID_id=101, NODEORDER=1),
+            LocalWorkflowFlowNode(WORKFLOWID_id=10, NODEID_id=100, NODEORDER=0),
+            LocalWorkflowFlowNode(WORKFLOWID_id=11, NODEID_id=102, NODEORDER=0),
+        ]
+    )
+    LocalWorkflowNodeLink.objects.bulk_create(
+        [
+            LocalWorkflowNodeLink(
+                id=1,
+                WORKFLOWID_id=10,
+                NODEID_id=100,
+                DESTNODEID_id=101,
+                ISREJECT="0",
+                LINKNAME="submit",
+            ),
+            LocalWorkflowNodeLink(
+                id=2,
+                WORKFLOWID_id=10,
+                NODEID_id=101,
+                DESTNODEID_id=100,
+                ISREJECT="1",
+                LINKNAME="reject",
+            ),
+        ]
+    )
+    yield
+    with connection.schema_editor() as editor:
+        for model in reversed(SRM_MODELS):
+            editor.delete_model(model)
+
+
+def _srm_expected(model, workflow_ids=None):
+    queryset = model.objects.order_by(*model.SRM_ORDERING)
+    if workflow_ids is not None:
+        queryset = queryset.filter(**{model.SRM_WORKFLOW_LOOKUP: workflow_ids})
+    return [obj.into_srm_dict() for obj in queryset]
+
+
+@pytest.mark.usefixtures("_srm_rows")
+@pytest.mark.parametrize(
+    "model", [LocalWorkflowBase, LocalWorkflowFlowNode, LocalWorkflowNodeLink]
+)
+def test_srm_export_matches_into_srm_dict(model):
+    expected = _srm_expected(model)
+    assert expected
+    assert list(model.objects.srm_dicts(chunk_size=1)) == expected
+    assert [json.loads(line) for line in model.objects.srm_ndjson()] == expected
+    assert list(model.objects.srm_dicts(workflow_ids=[11])) == _srm_expected(
+        model, [11]
+    )
+
+
+@pytest.mark.usefixtures("_srm_rows")
+def test_workflow_srm_dict_maps_versions():
+    assert [i.into_srm_dict() for i in LocalWorkflowBase.objects.order_by("ID")] == [
+        {
+            "work_flow_id": 10,
+            "name": "v1",
+            "work_flow_type_id": 1,
+            "work_flow_form_id": -1,
+            "is_active_version": 1,
+            "parent_id": None,
+            "work_flow_version": 1,
+            "active_version_id": None,
+        },
+        {
+            "work_flow_id": 11,
+            "name": "v2",
+            "work_flow_type_id": None,
+            "work_flow_form_id": -1,
+            "is_active_version": 3,
+            "parent_id": 10,
+            "work_flow_version": 2,
+            "active_version_id": 10,
+        },
+    ]
+    node = LocalWorkflowFlowNode.objects.get(NODEID=101)
+    assert node.into_srm_dict()["node_name"] == "node 101"
@@ -0,0 +1,74 @@
+"""Tests for `drf_oa_workflow.graph`."""
+
+from drf_oa_workflow.choices import OAWFRejectType
+from drf_oa_workflow.graph import WorkflowGraph
+from drf_oa_workflow.graph import WorkflowGraphNode
+
+
+def _node(node_id, reject_type=OAWFRejectType.BY_LINK, rejectable="", **flags):
+    return WorkflowGraphNode(
+        node_id=node_id,
+        name=f"node {node_id}",
+        order=node_id,
+        node_type="1",
+        is_start=flags.get("is_start", False),
+        is_reject=flags.get("is_reject", True),
+        is_reopen=False,
+        is_end=flags.get("is_end", False),
+        reject_type=reject_type,
+        rejectable_nodes=WorkflowGraphNode.parse_rejectable_nodes(rejectable),
+    )
+
+
+def _graph(*nodes):
+    # 1 -> 2 -> 3 -> 4 (archive), 3 rejects to 1 via a reject link
+    links = [
+        (1, 2, False, "submit"),
+        (2, 3, False, "submit"),
+        (3, 4, False, "submit"),
+        (3, 1, True, "reject"),
+        (3, 99, True, "unknown node"),
+    ]
+    defaults = {
+        1: _node(1, is_start=True, is_reject=False),
+        2: _node(2),
+        3: _node(3),
+        4: _node(4, is_end=True, is_reject=False),
+    }
+    defaults.update({node.node_id: node for node in nodes})
+    return WorkflowGraph(51022, "1:1", defaults, links)
+
+
+def test_routing_queries():
+    graph = _graph()
+    assert graph.start_node.node_id == 1
+    assert [i.node_id for i in graph.archive_nodes] == [4]
+    assert graph.next_nodes(1) == (2,)
+    assert graph.reachable_nodes("1") == {2, 3, 4}
+    assert graph.is_reachable(2, 4)
+    assert not graph.is_reachable(4, 1)
+
+
+def test_reject_targets_by_link():
+    graph = _graph()
+    # reject links only, links to nodes outside the workflow are ignored
+    assert graph.reject_targets(3) == {1}
+    assert graph.reject_targets(2) == frozenset()
+    assert graph.can_reject("3", "1")
+    assert not graph.can_reject(3, 2)
+
+
+def test_reject_targets_free():
+    graph = _graph(_node(3, reject_type=OAWFRejectType.FREE))
+    assert graph.reject_targets(3) == {1, 2}
+
+
+def test_reject_targets_appoint():
+    graph = _graph(_node(3, reject_type=OAWFRejectType.APPOINT, rejectable="2,4,77,"))
+    # nodes outside the workflow are dropped
+    assert graph.reject_targets(3) == {2, 4}
+
+
+def test_reject_targets_of_non_rejectable_node():
+    graph = _graph(_node(3, reject_type=OAWFRejectType.FREE, is_reject=False))
+    assert graph.reject_targets(3) == frozenset()
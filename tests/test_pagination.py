@@ -0,0 +1,153 @@
+"""Tests for `drf_oa_workflow.pagination`."""
+
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.db import models
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from drf_oa_workflow.db.manager import WorkflowQuerySet
+from drf_oa_workflow.pagination import OaKeysetPagination
+from drf_oa_workflow.views import OaKeysetListView
+from drf_oa_workflow.views import OaWorkFlowView
+
+
+class _SeekQuerySet:
+    def __init__(self, rows):
+        self.rows = rows
+        self.seeks = []
+
+    def seek(self, fields, after=None, reverse=False):  # noqa: FBT002
+        self.seeks.append((after, reverse))
+        return self.rows
+
+
+def _row(*keys):
+    return SimpleNamespace(**{f"keyset_{i}": key for i, key in enumerate(keys)})
+
+
+def _request(cursor=None):
+    params = {}
+    if cursor is not None:
+        data = json.dumps({"k": cursor[0], "r": int(cursor[1])})
+        params["cursor"] = base64.urlsafe_b64encode(data.encode()).decode()
+    return Request(APIRequestFactory().get("/todo/", params))
+
+
+def _paginate(rows, cursor=None):
+    paginator = OaKeysetPagination()
+    paginator.keyset_fields = ("A", "REQUESTID")
+    queryset = _SeekQuerySet(rows)
+    page = paginator.paginate_queryset(queryset, _request(cursor))
+    return paginator, page, queryset
+
+
+def test_forward_page_links():
+    rows = [_row("d", i) for i in range(11)]
+    paginator, page, queryset = _paginate(rows)
+    assert page == rows[:10]
+    assert queryset.seeks == [(None, False)]
+    assert paginator.get_next_link()
+    assert paginator.get_previous_link() is None
+
+
+def test_backward_page_without_rows_has_no_next_page():
+    paginator, page, _ = _paginate([], cursor=(["d", 1], True))
+    assert page == []
+    assert paginator.get_next_link() is None
+
+
+def test_backward_page_is_returned_in_order():
+    rows = [_row("d", 3), _row("d", 4)]
+    paginator, page, queryset = _paginate(rows, cursor=(["d", 2], True))
+    assert queryset.seeks == [(["d", 2], True)]
+    assert [i.keyset_1 for i in page] == [4, 3]
+    assert paginator.get_next_link()
+    assert paginator.get_previous_link() is None
+
+
+def test_keyset_pagination_is_opt_in():
+    assert not hasattr(OaWorkFlowView, "pagination_class")
+    assert OaKeysetListView.pagination_class is OaKeysetPagination
+
+
+def test_seek_condition_compares_fields_lexicographically():
+    condition = WorkflowQuerySet._seek_condition(
+        ["a", "b", "c"], [1, 2, 3], reverse=False
+    )
+    assert str(condition) == (
+        "(AND: (OR: ('a__lte', 1), ('a__isnull', True)), "
+        "(OR: ('a__lt', 1), ('a__isnull', True), "
+        "(AND: (OR: ('b__lte', 2), ('b__isnull', True)), "
+        "(OR: ('b__lt', 2), ('b__isnull', True), "
+        "('c__lt', 3), ('c__isnull', True)))))"
+    )
+    reverse = WorkflowQuerySet._seek_condition(["a", "b"], [1, 2], reverse=True)
+    assert str(reverse) == "(AND: ('a__gte', 1), (OR: ('a__gt', 1), ('b__gt', 2)))"
+
+
+class KeysetRow(models.Model):
+    DATE = models.CharField(max_length=10, null=True)  # noqa: DJ001
+    TIME = models.CharField(max_length=8, null=True)  # noqa: DJ001
+    REQUESTID = models.IntegerField(primary_key=True)
+
+    objects = WorkflowQuerySet.as_manager()
+
+    class Meta:
+        app_label = "drf_oa_workflow"
+
+    def __str__(self):
+        return str(self.REQUESTID)
+
+
+KEYSET_FIELDS = ("DATE", "TIME", "REQUESTID")
+KEYSET_ROWS = [
+    ("2024-01-02", "08:00:00", 1),
+    ("2024-01-02", "08:00:00", 2),
+    ("2024-01-02", None, 3),
+    ("2024-01-01", "09:00:00", 4),
+    (None, None, 5),
+    (None, "10:00:00", 6),
+    ("2024-01-03", "07:00:00", 7),
+]
+
+
+@pytest.fixture()
+def _keyset_rows():
+    with connection.schema_editor() as editor:
+        editor.create_model(KeysetRow)
+    KeysetRow.objects.bulk_create(
+        KeysetRow(DATE=date, TIME=time, REQUESTID=request_id)
+        for date, time, request_id in KEYSET_ROWS
+    )
+    yield
+    with connection.schema_editor() as editor:
+        editor.delete_model(KeysetRow)
+
+
+def _sort_key(row):
+    # descending, NULL is the smallest value
+    return tuple((value is not None, value or "") for value in row)
+
+
+@pytest.mark.usefixtures("_keyset_rows")
+def test_seek_pages_include_rows_with_null_keys():
+    expected = [i[2] for i in sorted(KEYSET_ROWS, key=_sort_key, reverse=True)]
+
+    seen, after = [], None
+    while True:
+        page = list(KeysetRow.objects.seek(KEYSET_FIELDS, after=after)[:2])
+        if not page:
+            break
+        seen.extend(i.REQUESTID for i in page)
+        last = page[-1]
+        after = [last.keyset_0, last.keyset_1, last.keyset_2]
+    assert seen == expected
+
+    # paging back from the last row returns every earlier row
+    before = list(KeysetRow.objects.seek(KEYSET_FIELDS, after=after, reverse=True))
+    assert [i.REQUESTID for i in reversed(before)] == expected[:-1]
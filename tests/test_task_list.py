@@ -0,0 +1,45 @@
+"""Tests for `drf_oa_workflow.db.task_list`."""
+
+from drf_oa_workflow.api_example_data import HANDLED_LIST_DEMO
+from drf_oa_workflow.api_example_data import TODO_LIST_DEMO
+from drf_oa_workflow.db.task_list import DbTaskListProvider
+from drf_oa_workflow.utils import OaWorkFlow
+
+
+def test_api_data_has_the_same_keys_as_the_oa_api():
+    data = DbTaskListProvider.to_api_data(dict.fromkeys(DbTaskListProvider.FIELDS))
+    for demo in (TODO_LIST_DEMO[0], HANDLED_LIST_DEMO[0]):
+        assert set(data) == set(demo)
+        assert set(data["workflowBaseInfo"]) == set(demo["workflowBaseInfo"])
+    assert all(isinstance(v, str) for v in data.values() if not isinstance(v, dict))
+
+
+def test_supports_only_todo_and_handled_with_known_conditions():
+    assert DbTaskListProvider.supports("todo")
+    assert DbTaskListProvider.supports("handled", {"workflowTypes": "1,2"})
+    assert not DbTaskListProvider.supports("doing")
+    assert not DbTaskListProvider.supports("todo", {"requestname": "x"})
+
+
+def test_unsupported_lists_fall_back_to_the_oa_api(monkeypatch):
+    api_calls, db_calls = [], []
+    monkeypatch.setattr(
+        OaWorkFlow,
+        "_page_data",
+        lambda self, count_api, *args, **kwargs: api_calls.append(count_api)
+        or ([], 1, 0),
+    )
+    monkeypatch.setattr(
+        "drf_oa_workflow.utils.db_task_list_provider.page",
+        lambda list_type, *args, **kwargs: db_calls.append(list_type) or ([], 1, 0),
+    )
+    workflow = OaWorkFlow()
+    workflow.get_todo_list("1", 1, 10, source="db")
+    workflow.get_todo_list("1", 1, 10, conditions={"requestname": "x"}, source="db")
+    workflow.get_doing_list("1", 1, 10, source="db")
+
+    assert db_calls == ["todo"]
+    assert api_calls == [
+        OaWorkFlow.PAGE_DATA_APIS["todo"][0],
+        OaWorkFlow.PAGE_DATA_APIS["doing"][0],
+    ]
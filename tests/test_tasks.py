@@ -0,0 +1,192 @@
+"""Tests for `drf_oa_workflow.tasks`."""
+
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+
+pytest.importorskip("celery")
+
+from drf_oa_workflow.choices import OaUserStatus  # noqa: E402
+from drf_oa_workflow.models import LocalWorkflowBase  # noqa: E402
+from drf_oa_workflow.models import LocalWorkflowFlowNode  # noqa: E402
+from drf_oa_workflow.models import LocalWorkflowNodeBase  # noqa: E402
+from drf_oa_workflow.models import OaUserInfo  # noqa: E402
+from drf_oa_workflow.tasks import _delete_orphan_node_bases  # noqa: E402
+from drf_oa_workflow.tasks import _oa_user_id_ranges  # noqa: E402
+from drf_oa_workflow.tasks import _sync_oa_users  # noqa: E402
+
+LOCAL_MODELS = (LocalWorkflowNodeBase, LocalWorkflowFlowNode, OaUserInfo)
+ACTIVE = OaUserStatus.FULL_TIME
+
+
+@pytest.fixture()
+def _local_tables():
+    with connection.schema_editor() as editor:
+        for model in LOCAL_MODELS:
+            editor.create_model(model)
+    yield
+    with connection.schema_editor() as editor:
+        for model in reversed(LOCAL_MODELS):
+            editor.delete_model(model)
+
+
+def _oa_users(monkeypatch, rows):
+    """Replace the OA personnel table with ``{user_id: (code, dept, name, ...)}``."""
+
+    def values(chunk_size, start=None, end=None):
+        for user_id, user_values in rows.items():
+            if start is None or start <= user_id < end:
+                yield user_id, user_values
+
+    monkeypatch.setattr("drf_oa_workflow.tasks._oa_user_values", values)
+
+
+def _local_users():
+    return {
+        user.user_id: (user.staff_code_id, user.dept_id, user.name, user.status)
+        for user in OaUserInfo.objects.all()
+    }
+
+
+def _node_base(node_id):
+    return LocalWorkflowNodeBase(
+        ID=node_id, ISSTART="0", ISREJECT="0", ISREOPEN="0", ISEND="0"
+    )
+
+
+@pytest.mark.usefixtures("_local_tables")
+def test_orphan_node_bases_are_deleted():
+    LocalWorkflowNodeBase.objects.bulk_create([_node_base(i) for i in (1, 2, 3)])
+    LocalWorkflowFlowNode.objects.create(
+        NODEID_id=1,
+        WORKFLOWID=LocalWorkflowBase(ID=10),
+        NODEORDER=0,
+        ISSELECTREJECTNODE=0,
+    )
+
+    _delete_orphan_node_bases()
+
+    assert list(LocalWorkflowNodeBase.objects.values_list("ID", flat=True)) == [1]
+
+
+def _user_ids(monkeypatch, oa, local):
+    def model(low, high):
+        return SimpleNamespace(
+            objects=SimpleNamespace(aggregate=lambda **_: {"low": low, "high": high})
+        )
+
+    monkeypatch.setattr("drf_oa_workflow.tasks.HRMResource", model(*oa))
+    monkeypatch.setattr("drf_oa_workflow.tasks.OaUserInfo", model(*local))
+
+
+def _covered(ranges):
+    return [i for start, end in ranges for i in range(start, end)]
+
+
+def test_user_id_ranges_cover_oa_and_local_ids(monkeypatch):
+    _user_ids(monkeypatch, oa=(5, 20), local=(1, 12))
+    ranges = _oa_user_id_ranges(4)
+    assert ranges == [(1, 6), (6, 11), (11, 16), (16, 21)]
+    assert _covered(ranges) == list(range(1, 21))
+
+
+def test_user_id_ranges_edges(monkeypatch):
+    _user_ids(monkeypatch, oa=(None, None), local=(None, None))
+    assert _oa_user_id_ranges(4) == []
+
+    # no local users yet
+    _user_ids(monkeypatch, oa=(1, 10), local=(None, None))
+    assert _covered(_oa_user_id_ranges(3)) == list(range(1, 11))
+
+    # fewer ids than partitions: one id per range, no empty ranges
+    _user_ids(monkeypatch, oa=(7, 8), local=(None, None))
+    assert _oa_user_id_ranges(4) == [(7, 8), (8, 9)]
+
+    # a single id
+    _user_ids(monkeypatch, oa=(None, None), local=(3, 3))
+    assert _oa_user_id_ranges(4) == [(3, 4)]
+
+
+@pytest.mark.usefixtures("_local_tables")
+def test_incremental_user_sync(monkeypatch):
+    _oa_users(
+        monkeypatch,
+        {
+            1: ("A1", 10, "Alice", "Dept", ACTIVE),
+            2: ("B2", 10, "Bob", "Dept", ACTIVE),
+            3: ("C3", 20, "Carol", "Dept 2", ACTIVE),
+        },
+    )
+    assert _sync_oa_users(incremental=True) == {
+        "inserted": 3,
+        "updated": 0,
+        "unchanged": 0,
+        "deactivated": 0,
+    }
+
+    # Bob changes department, Carol leaves OA, Dave joins
+    _oa_users(
+        monkeypatch,
+        {
+            1: ("A1", 10, "Alice", "Dept", ACTIVE),
+            2: ("B2", 20, "Bob", "Dept 2", ACTIVE),
+            4: ("D4", 10, "Dave", "Dept", ACTIVE),
+        },
+    )
+    invalidated = []
+    monkeypatch.setattr(
+        "drf_oa_workflow.tasks.OaApi.invalidate_userinfo",
+        lambda *ids: invalidated.extend(ids),
+    )
+    assert _sync_oa_users(incremental=True, batch_size=1) == {
+        "inserted": 1,
+        "updated": 1,
+        "unchanged": 1,
+        "deactivated": 1,
+    }
+    assert _local_users() == {
+        1: ("A1", 10, "Alice", ACTIVE),
+        2: ("B2", 20, "Bob", ACTIVE),
+        3: ("C3", 20, "Carol", OaUserStatus.RESIGN),
+        4: ("D4", 10, "Dave", ACTIVE),
+    }
+    assert sorted(invalidated) == [2, 3]
+
+    # already deactivated users are not counted again
+    assert _sync_oa_users(incremental=True)["deactivated"] == 0
+
+
+@pytest.mark.usefixtures("_local_tables")
+def test_full_user_sync_rewrites_every_user(monkeypatch):
+    _oa_users(monkeypatch, {1: ("A1", 10, "Alice", "Dept", ACTIVE)})
+    _sync_oa_users(incremental=True)
+    OaUserInfo.objects.create(user_id=9, name="Gone", status=ACTIVE)
+
+    assert _sync_oa_users(incremental=False) == {
+        "inserted": 0,
+        "updated": 1,
+        "unchanged": 0,
+        "deactivated": 0,
+    }
+    assert _local_users()[9] == (None, None, "Gone", ACTIVE)
+
+
+@pytest.mark.usefixtures("_local_tables")
+def test_partitioned_user_sync_only_touches_its_range(monkeypatch):
+    _oa_users(
+        monkeypatch,
+        {1: ("A1", 10, "Alice", "Dept", ACTIVE), 5: ("E5", 10, "Eve", "Dept", ACTIVE)},
+    )
+    OaUserInfo.objects.create(user_id=2, name="Gone", status=ACTIVE)
+    OaUserInfo.objects.create(user_id=7, name="Other", status=ACTIVE)
+
+    stats = _sync_oa_users(0, 5, incremental=True)
+
+    assert stats["inserted"] == 1
+    assert stats["deactivated"] == 1
+    assert _local_users() == {
+        1: ("A1", 10, "Alice", ACTIVE),
+        2: (None, None, "Gone", OaUserStatus.RESIGN),
+        7: (None, None, "Other", ACTIVE),
+    }
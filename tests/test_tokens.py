@@ -0,0 +1,111 @@
+"""Tests for `drf_oa_workflow.tokens`."""
+
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.tokens import OaTokenManager
+
+EXPIRE = 3600
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class _Fetch:
+    def __init__(self, *tokens, delay=0.0, error=None):
+        self.tokens = iter(tokens)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, expire):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return next(self.tokens)
+
+
+def _store(token, expires_in):
+    cache.set(
+        OaTokenManager.CACHE_KEY,
+        {"token": token, "expires_at": time.time() + expires_in},
+        timeout=EXPIRE,
+    )
+
+
+def test_concurrent_refresh_fetches_once():
+    fetch = _Fetch("TOKEN-1", "TOKEN-2", delay=0.3)
+    results = []
+
+    def refresh():
+        results.append(OaTokenManager().refresh(fetch, expire=EXPIRE))
+
+    threads = [threading.Thread(target=refresh) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # the lock holder fetched, the others waited and reused its token
+    assert fetch.calls == 1
+    assert results == ["TOKEN-1"] * 3
+    assert cache.get(OaTokenManager.LOCK_KEY) is None
+
+
+def test_get_uses_the_cached_token_without_fetching():
+    _store("CACHED", EXPIRE)
+    fetch = _Fetch("NEW")
+    assert OaTokenManager().get(fetch, expire=EXPIRE) == "CACHED"
+    assert fetch.calls == 0
+
+
+def test_refresh_skips_fetch_when_the_stale_token_was_already_replaced():
+    _store("NEW", EXPIRE)
+    fetch = _Fetch("NEWER")
+    stale = "OLD"
+    assert OaTokenManager().refresh(fetch, expire=EXPIRE, stale_token=stale) == "NEW"
+    assert fetch.calls == 0
+
+    # the cached token is the stale one: fetch a new token
+    stale = "NEW"
+    assert OaTokenManager().refresh(fetch, expire=EXPIRE, stale_token=stale) == "NEWER"
+    assert fetch.calls == 1
+
+
+def test_expiring_token_is_used_while_another_process_refreshes():
+    # valid, but inside TOKEN_REFRESH_AHEAD
+    _store("EXPIRING", api_settings.TOKEN_REFRESH_AHEAD / 2)
+    cache.add(OaTokenManager.LOCK_KEY, "other process", timeout=EXPIRE)
+    fetch = _Fetch("NEW")
+
+    started = time.monotonic()
+    assert OaTokenManager().get(fetch, expire=EXPIRE) == "EXPIRING"
+    assert time.monotonic() - started < OaTokenManager.POLL_INTERVAL
+    assert fetch.calls == 0
+
+
+def test_failed_fetch_releases_the_lock():
+    fetch = _Fetch(error=RuntimeError("OA down"))
+    with pytest.raises(RuntimeError, match="OA down"):
+        OaTokenManager().refresh(fetch, expire=EXPIRE)
+    assert cache.get(OaTokenManager.LOCK_KEY) is None
+
+    assert OaTokenManager().refresh(_Fetch("TOKEN"), expire=EXPIRE) == "TOKEN"
+
+
+def test_waiter_fetches_itself_when_the_lock_holder_never_finishes(monkeypatch):
+    monkeypatch.setattr(api_settings, "TOKEN_LOCK_TIMEOUT", 0.3)
+    cache.add(OaTokenManager.LOCK_KEY, "crashed process", timeout=EXPIRE)
+    fetch = _Fetch("TOKEN")
+
+    assert OaTokenManager().refresh(fetch, expire=EXPIRE) == "TOKEN"
+    assert fetch.calls == 1
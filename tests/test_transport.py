@@ -0,0 +1,315 @@
+"""Tests for `drf_oa_workflow.transport`."""
+
+import asyncio
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+from rest_framework.exceptions import APIException
+
+from drf_oa_workflow.async_utils import AsyncSingleFlight
+from drf_oa_workflow.settings import api_settings
+from drf_oa_workflow.transport import CircuitBreaker
+from drf_oa_workflow.transport import MultipartStream
+from drf_oa_workflow.transport import PooledSessionFactory
+from drf_oa_workflow.transport import SingleFlight
+from drf_oa_workflow.utils import OaWorkFlow
+
+
+def _concurrently(*targets):
+    results = [None] * len(targets)
+
+    def run(index, target):
+        results[index] = target()
+
+    threads = [
+        threading.Thread(target=run, args=(i, target))
+        for i, target in enumerate(targets)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+
+def test_single_flight_callers_get_isolated_copies():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"data": {"url": "/x"}}
+
+    def leader():
+        return flight.do("key", fetch)
+
+    def follower():
+        started.wait(timeout=5)
+        threading.Timer(0.1, release.set).start()
+        return flight.do("key", fetch)
+
+    first, second = _concurrently(leader, follower)
+    assert len(calls) == 1
+    assert first == second
+    assert first is not second
+    first["data"]["url"] += "&a"
+    assert second["data"]["url"] == "/x"
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_async_single_flight_callers_get_isolated_copies():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"data": {"url": "/x"}}
+
+    async def main():
+        return await asyncio.gather(flight.do("key", fetch), flight.do("key", fetch))
+
+    first, second = asyncio.run(main())
+    assert len(calls) == 1
+    assert first is not second
+    first["data"]["url"] += "&a"
+    assert second["data"]["url"] == "/x"
+
+
+def test_concurrent_chart_urls_keep_each_staff_sso_token(monkeypatch):
+    shared = {"code": "SUCCESS", "data": {"chartUrl": "/x?requestid=1"}}
+
+    def fake_request(self, api, method, **kwargs):
+        # keep both requests in flight at the same time
+        time.sleep(0.2)
+        return shared
+
+    monkeypatch.setattr(OaWorkFlow, "_OaApi__request", fake_request)
+    monkeypatch.setattr(OaWorkFlow, "get_sso_token", lambda self, code: f"SSO-{code}")
+
+    url_a, url_b = _concurrently(
+        lambda: OaWorkFlow().get_chart_url("1", "A")["data"]["chartUrl"],
+        lambda: OaWorkFlow().get_chart_url("1", "B")["data"]["chartUrl"],
+    )
+    assert url_a == "/x?requestid=1&ssoToken=SSO-A"
+    assert url_b == "/x?requestid=1&ssoToken=SSO-B"
+    assert shared["data"]["chartUrl"] == "/x?requestid=1"
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("drf_oa_workflow.transport.time.monotonic", lambda: now[0])
+    return now
+
+
+def _open_breaker():
+    breaker = CircuitBreaker()
+    for _ in range(api_settings.CIRCUIT_BREAKER_FAILURES):
+        breaker.before_request()
+        breaker.record_failure()
+    return breaker
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker()
+    for _ in range(api_settings.CIRCUIT_BREAKER_FAILURES - 1):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # a success resets the count of consecutive failures
+    breaker.record_response(200)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker = _open_breaker()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(APIException):
+        breaker.before_request()
+
+
+def test_circuit_breaker_half_open_probe_closes_on_success(clock):
+    breaker = _open_breaker()
+    clock[0] += api_settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+
+    breaker.before_request()
+    # other requests still fail while the probe is in flight
+    with pytest.raises(APIException):
+        breaker.before_request()
+
+    breaker.record_response(200)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    breaker.before_request()
+
+
+def test_circuit_breaker_half_open_probe_reopens_on_failure(clock):
+    breaker = _open_breaker()
+    clock[0] += api_settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    breaker.before_request()
+
+    breaker.record_response(503)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(APIException):
+        breaker.before_request()
+
+    clock[0] += api_settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+    breaker.before_request()
+
+
+class _CookieHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        body = (self.headers.get("Cookie") or "").encode()
+        self.send_response(200)
+        self.send_header("Set-Cookie", f"JSESSIONID={self.path.strip('/')}; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def oa_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CookieHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_session_does_not_carry_cookies_between_calls(oa_server):
+    factory = PooledSessionFactory()
+    try:
+        first = factory.get_session().get(f"{oa_server}/userA", timeout=5)
+        second = factory.get_session().get(f"{oa_server}/userB", timeout=5)
+        explicit = factory.get_session().get(
+            f"{oa_server}/userC", cookies={"a": "1"}, timeout=5
+        )
+    finally:
+        factory.close()
+    assert first.cookies["JSESSIONID"] == "userA"
+    assert second.text == ""
+    # cookies passed explicitly to a single request are still sent
+    assert explicit.text == "a=1"
+
+
+def test_pooled_sessions_share_the_adapter_per_process():
+    factory = PooledSessionFactory()
+    try:
+        session = factory.get_session()
+        (other,) = _concurrently(factory.get_session)
+        assert session is factory.get_session()
+        assert other is not session
+        assert other.get_adapter("https://oa.test") is session.get_adapter(
+            "http://oa.test"
+        )
+    finally:
+        factory.close()
+
+
+def _body(stream):
+    return b"".join(stream)
+
+
+def _prepared_headers(stream):
+    return requests.Request("POST", "http://oa.test", data=stream).prepare().headers
+
+
+class _RawStream(io.RawIOBase):
+    """A readable stream without seek support, like a socket."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def test_multipart_stream_from_bytes():
+    stream = MultipartStream({"name": "a.txt"}, "file", b"content", "a.txt")
+    body = _body(stream)
+    assert stream.len == len(body)
+    assert b'name="file"; filename="a.txt"' in body
+    assert b"Content-Type: text/plain\r\n\r\ncontent\r\n" in body
+    assert _prepared_headers(stream)["Content-Length"] == str(len(body))
+
+
+def test_multipart_stream_from_seekable_file_can_be_resent(tmp_path):
+    source = io.BytesIO(b"skip-content")
+    source.seek(5)
+    stream = MultipartStream({}, "file", source, "a.bin")
+    first = _body(stream)
+    assert stream.len == len(first)
+    assert b"\r\n\r\ncontent\r\n" in first
+    # a retry, e.g. after the token expired, sends the same body
+    assert _body(stream) == first
+
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"from disk")
+    stream = MultipartStream({}, "file", path, "a.txt")
+    assert stream.len == len(_body(stream))
+
+
+@pytest.mark.parametrize("kind", ["pipe", "raw"])
+def test_multipart_stream_from_non_seekable_stream_is_chunked(kind):
+    if kind == "pipe":
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, "wb") as writer:
+            writer.write(b"piped")
+        source = os.fdopen(read_fd, "rb")
+    else:
+        source = _RawStream(b"piped")
+
+    with source:
+        stream = MultipartStream({}, "file", source, "a.bin")
+        assert not hasattr(stream, "len")
+        assert _prepared_headers(stream)["Transfer-Encoding"] == "chunked"
+        assert b"\r\n\r\npiped\r\n" in _body(stream)
+
+
+@pytest.mark.usefixtures("fake_token")
+def test_upload_files_keeps_input_order(monkeypatch):
+    def fake_post(self, api, post_data=None, headers=None, **kwargs):
+        name = _body(post_data).split(b'filename="')[1].split(b'"')[0]
+        # later files finish first
+        time.sleep(0.05 * (3 - int(name[1:])))
+        return {"data": {"fileid": name.decode()}}
+
+    monkeypatch.setattr(OaWorkFlow, "_post_oa", fake_post)
+    workflow = OaWorkFlow()
+    workflow.encrypt_userid = "encrypted"
+    results = workflow.upload_files(
+        "1", [(b"a", "f0"), (b"b", "f1"), (b"c", "f2")], concurrency=3
+    )
+    assert [(i["success"], i["result"]) for i in results] == [
+        (True, "f0"),
+        (True, "f1"),
+        (True, "f2"),
+    ]
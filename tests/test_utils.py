@@ -0,0 +1,226 @@
+"""Tests for `drf_oa_workflow.utils`."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+
+from drf_oa_workflow.async_utils import AsyncOaWorkFlow
+from drf_oa_workflow.utils import OaWorkFlow
+
+COUNT_API = "/count"
+DATA_API = "/data"
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _fake_post(calls):
+    def post(self, api, post_data=None, **kwargs):
+        calls.append(api)
+        return "3" if api == COUNT_API else [{"requestId": "1"}]
+
+    return post
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_page_data_skips_list_request_when_cached_count_is_exceeded(
+    monkeypatch, concurrent
+):
+    calls = []
+    monkeypatch.setattr(OaWorkFlow, "_post_oa", _fake_post(calls))
+    workflow = OaWorkFlow()
+
+    assert workflow._page_data(COUNT_API, DATA_API, "1", 1, 10, None, concurrent) == (
+        [{"requestId": "1"}],
+        1,
+        3,
+    )
+    assert sorted(calls) == [COUNT_API, DATA_API]
+
+    # the count is cached now, an out-of-range page needs no request at all
+    calls.clear()
+    assert workflow._page_data(COUNT_API, DATA_API, "1", 2, 10, None, concurrent) == (
+        [],
+        2,
+        3,
+    )
+    assert calls == []
+
+
+def test_async_page_data_skips_list_request_when_cached_count_is_exceeded(
+    monkeypatch,
+):
+    calls = []
+    post = _fake_post(calls)
+
+    async def fake_post(self, api, post_data=None, **kwargs):
+        return post(self, api, post_data=post_data, **kwargs)
+
+    monkeypatch.setattr(AsyncOaWorkFlow, "_post_oa", fake_post)
+    workflow = AsyncOaWorkFlow()
+
+    async def main():
+        await workflow._page_data(COUNT_API, DATA_API, "1", 1, 10, concurrent=True)
+        calls.clear()
+        return await workflow._page_data(
+            COUNT_API, DATA_API, "1", 2, 10, concurrent=True
+        )
+
+    assert asyncio.run(main()) == ([], 2, 3)
+    assert calls == []
+
+
+def _count_version(oa_user_id):
+    return cache.get(
+        OaWorkFlow.CACHE_PAGE_COUNT_VERSION_KEY.format(oa_user_id=oa_user_id)
+    )
+
+
+MUTATIONS = {
+    "submit": lambda wf: wf.submit({}),
+    "submit_new": lambda wf: wf.submit_new("51022", [{"fieldName": "a"}]),
+    "review": lambda wf: wf.review("100"),
+    "reject": lambda wf: wf.reject("100"),
+    "recover": lambda wf: wf.recover("100"),
+    "withdraw": lambda wf: wf.withdraw("100"),
+    "delete": lambda wf: wf.delete("100"),
+    "transmit": lambda wf: wf.transmit("100", 1, "2,3"),
+}
+
+
+@pytest.mark.parametrize("name", list(MUTATIONS))
+def test_mutations_invalidate_cached_page_counts(monkeypatch, name):
+    calls = []
+    post = _fake_post(calls)
+
+    def fake_post(self, api, post_data=None, **kwargs):
+        if api in (COUNT_API, DATA_API):
+            return post(self, api, post_data=post_data, **kwargs)
+        calls.append(api)
+        return {"code": "SUCCESS", "data": {"requestid": "100"}}
+
+    monkeypatch.setattr(OaWorkFlow, "_post_oa", fake_post)
+    workflow = OaWorkFlow()
+    workflow.oa_user_id = "1"
+    others = OaWorkFlow()
+    for oa_user_id in ("1", "2", "3", "4"):
+        others.oa_user_id = oa_user_id
+        others._page_data(COUNT_API, DATA_API, "1")
+    versions = {i: _count_version(i) for i in ("1", "2", "3", "4")}
+
+    MUTATIONS[name](workflow)
+
+    invalidated = {i for i, version in versions.items() if _count_version(i) != version}
+    assert invalidated == ({"1", "2", "3"} if name == "transmit" else {"1"})
+
+    # the next page recounts instead of using the stale total
+    calls.clear()
+    workflow._page_data(COUNT_API, DATA_API, "1")
+    assert calls == [COUNT_API, DATA_API]
+
+
+class _FakeOa:
+    """Stands in for OaApi.__request; request ids ending in "9" fail."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+        self.started = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, api, method, data=None, **kwargs):
+        request_id = data.get("requestId") or data.get("requestName")
+        with self.lock:
+            self.started.append((time.monotonic(), request_id))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delays.get(request_id, 0.01))
+            if request_id.endswith("9"):
+                raise APIException(f"{request_id} failed")
+            return {"code": "SUCCESS", "data": {"requestid": f"new-{request_id}"}}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture()
+def fake_oa(monkeypatch, fake_token):
+    fake = _FakeOa()
+    monkeypatch.setattr(OaWorkFlow, "_OaApi__request", fake)
+    return fake
+
+
+def _registered_workflow():
+    workflow = OaWorkFlow()
+    workflow.oa_user_id = "1"
+    workflow.encrypt_userid = "encrypted"
+    return workflow
+
+
+@pytest.mark.parametrize("method", ["batch_review", "batch_reject"])
+def test_batch_results_keep_input_order_and_capture_errors(fake_oa, method):
+    # earlier items take longer, so they finish last
+    fake_oa.delays = {"101": 0.15, "102": 0.1}
+    items = ["101", {"request_id": "102", "remark": "ok"}, "109", "103"]
+
+    results = getattr(_registered_workflow(), method)(
+        items, concurrency=2, rate_limit=0
+    )
+
+    assert [(i["request_id"], i["success"]) for i in results] == [
+        ("101", True),
+        ("102", True),
+        ("109", False),
+        ("103", True),
+    ]
+    assert results[2]["error"] == "109 failed"
+    assert results[2]["result"] is None
+    assert fake_oa.max_in_flight == 2  # noqa: PLR2004
+
+
+def test_batch_rate_limit_paces_requests(fake_oa):
+    rate = 20
+    _registered_workflow().batch_review(
+        [str(i) for i in range(100, 105)], concurrency=5, rate_limit=rate
+    )
+    starts = sorted(started for started, _ in fake_oa.started)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= 1 / rate * 0.8
+
+
+def test_batch_submit_new_resumes_and_reports_payload_errors(fake_oa):
+    submissions = [
+        {"main_data": [{"fieldName": "a"}], "title": f"T{i}"} for i in range(5)
+    ]
+    submissions[3]["main_data"] = []
+    submissions[4]["title"] = "T9"
+    progress = []
+
+    results = _registered_workflow().batch_submit_new(
+        iter(submissions),
+        workflow_id="51022",
+        start=2,
+        callback=lambda index, result: progress.append(index),
+    )
+
+    # the first two submissions were done before the interruption
+    # and the invalid submission never reaches OA
+    assert sorted(i for _, i in fake_oa.started) == ["T2", "T9"]
+    assert [(i["success"], i["request_id"]) for i in results] == [
+        (True, "new-T2"),
+        (False, None),
+        (False, None),
+    ]
+    assert results[1]["error"] == "需要提交流程的主表数据"
+    assert results[2]["error"] == "T9 failed"
+    assert sorted(progress) == [2, 3, 4]